@@ -13,4 +13,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DigitalLurker.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from place.realtime import like_stream  # noqa: E402 (needs the app registry populated above)
+
+STREAM_ROUTES = {
+    '/stream/likes/': like_stream,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] in ('http', 'websocket'):
+        stream = STREAM_ROUTES.get(scope['path'])
+        if stream is not None:
+            return await stream(scope, receive, send)
+
+    if scope['type'] == 'websocket':
+        await send({'type': 'websocket.close'})
+        return
+
+    return await django_application(scope, receive, send)
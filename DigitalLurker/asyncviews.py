@@ -0,0 +1,132 @@
+"""
+Helpers for the plain Django async views that serve hot read endpoints under ASGI.
+
+They produce the same payloads, status codes and pagination links as the DRF views they
+stand in for, so clients can not tell which of the two answered.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from DigitalLurker.db.replicas import aread_from_replica_unless_pinned, use_replica
+from DigitalLurker.renderers import dumps
+
+
+def json_response(data, status=200, headers=None):
+    if settings.API_JSON_BACKEND == 'orjson':
+        return HttpResponse(dumps(data), status=status, headers=headers, content_type='application/json')
+
+    return JsonResponse(data,
+                        status=status,
+                        safe=False,
+                        headers=headers,
+                        encoder=JSONEncoder,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def error_response(detail, status, headers=None):
+    return json_response({'detail': str(detail)}, status=status, headers=headers)
+
+
+class ErrorResponse(Exception):
+    """
+    Raised from async views to answer with `response`, like APIException in DRF views.
+    """
+    def __init__(self, response):
+        self.response = response
+
+
+async def authenticate(request, required=False):
+    """
+    Authenticates the request with the JWT from the Authorization header and sets request.user.
+    """
+    authentication = JWTAuthentication()
+    challenge = {'WWW-Authenticate': authentication.authenticate_header(request)}
+
+    try:
+        result = await sync_to_async(authentication.authenticate)(request)
+    except (AuthenticationFailed, InvalidToken) as e:
+        detail = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+        raise ErrorResponse(json_response(detail, status=401, headers=challenge))
+
+    if result is None:
+        if required:
+            raise ErrorResponse(error_response(NotAuthenticated.default_detail, status=401, headers=challenge))
+        await aread_from_replica_unless_pinned(None)
+        return None
+
+    request.user = result[0]
+    await aread_from_replica_unless_pinned(request.user)
+    return request.user
+
+
+def async_reads(sync_view, async_view):
+    """
+    Returns a view answering GET requests with `async_view` and everything else with the DRF view.
+    GET requests accepting MessagePack are left to the DRF view too, which negotiates the
+    format. Without ASYNC_READ_VIEWS the DRF view is returned as is.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return sync_view
+
+    call_sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET' and not (settings.API_MSGPACK and
+                                            'application/msgpack' in request.headers.get('Accept', '')):
+            with use_replica(False):
+                try:
+                    return await async_view(request, *args, **kwargs)
+                except ErrorResponse as e:
+                    return e.response
+        return await call_sync_view(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    view.sync_view = sync_view
+    return view
+
+
+async def paginate(request, queryset, serialize):
+    """
+    Async counterpart of PageNumberPagination. `serialize` receives the objects of the page
+    and returns their representation.
+    """
+    page_size = api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    pages = max(1, -(-count // page_size))
+
+    page_number = request.GET.get('page', 1)
+    if page_number == 'last':
+        page_number = pages
+
+    try:
+        page_number = int(page_number)
+    except ValueError:
+        page_number = 0
+
+    if not 1 <= page_number <= pages:
+        raise ErrorResponse(error_response(_('Invalid page.'), status=404))
+
+    offset = (page_number - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page_number + 1) if page_number < pages else None
+    if page_number == 1:
+        previous_url = None
+    elif page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+
+    return {'count': count,
+            'next': next_url,
+            'previous': previous_url,
+            'results': await serialize(objects)}
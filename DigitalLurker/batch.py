@@ -0,0 +1,174 @@
+"""
+Batch requests: several API calls sent in one request and answered together.
+
+Sub-requests are resolved with the URL configuration and passed to the same views as
+standalone requests, in process and without the middleware. They share the user the batch
+was authenticated as, so the token is checked once, and run one after another on the
+connection of the batch request. With `parallel`, consecutive GET sub-requests are run in
+threads instead, on connections of their own; other methods always run alone, in order.
+
+JSON bodies of the responses are embedded as they are, without decoding them again. Streaming
+and non-JSON responses, like exports and media files, are answered with a 400 instead of being
+read into memory.
+"""
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import resolve, Resolver404
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Headers of the batch request that sub-requests inherit.
+_INHERITED_HEADERS = ('HTTP_HOST', 'HTTP_ACCEPT_LANGUAGE', 'HTTP_USER_AGENT', 'HTTP_X_FORWARDED_FOR',
+                      'HTTP_X_FORWARDED_PROTO', 'HTTP_X_FORWARDED_HOST')
+# Headers a sub-request can not set, authentication and formats are the ones of the batch.
+_IGNORED_HEADERS = ('AUTHORIZATION', 'CONTENT_TYPE', 'CONTENT_LENGTH', 'ACCEPT')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.RegexField(r'^/', max_length=2048)
+    headers = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
+    body = serializers.JSONField(required=False, allow_null=True, default=None)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, requests):
+        if len(requests) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(_('At most %d requests can be batched.') % settings.BATCH_MAX_REQUESTS)
+        return requests
+
+
+def _environ(request, sub_request):
+    path, _, query = sub_request['path'].partition('?')
+    body = b'' if sub_request['body'] is None else json.dumps(sub_request['body']).encode()
+
+    environ = {key: value for key, value in request.META.items()
+               if key in _INHERITED_HEADERS or not (key.startswith(('HTTP_', 'CONTENT_', 'wsgi.')))}
+    environ.update({
+        'REQUEST_METHOD': sub_request['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json' if body else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in sub_request['headers'].items():
+        key = name.upper().replace('-', '_')
+        if key not in _IGNORED_HEADERS:
+            environ[f'HTTP_{key}'] = value
+    return environ
+
+
+def _error(status, detail):
+    return status, {'Content-Type': 'application/json'}, json.dumps({'detail': str(detail)}).encode()
+
+
+def dispatch(request, sub_request, batch_view):
+    """
+    Runs a validated sub-request as the user of the batch request and returns the status,
+    headers and content of its response.
+    """
+    environ = _environ(request, sub_request)
+    try:
+        match = resolve(environ['PATH_INFO'])
+    except Resolver404:
+        return _error(404, _('Not found.'))
+
+    if match.func is batch_view:
+        return _error(400, _('Batch requests can not be nested.'))
+
+    sub = WSGIRequest(environ)
+    # Authenticates DRF views with the user of the batch (see rest_framework.request.Request).
+    sub._force_auth_user = request.user if request.user.is_authenticated else None
+    sub._force_auth_token = request.auth
+
+    # Hot reads may be served by async views, their DRF view answers the same.
+    view = getattr(match.func, 'sync_view', match.func)
+    try:
+        if asyncio.iscoroutinefunction(view):
+            response = async_to_sync(view)(sub, *match.args, **match.kwargs)
+        else:
+            response = view(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            return _error(400, _('Streaming responses can not be batched.'))
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        content = response.content
+    except Http404:
+        # Raised by plain Django views, DRF views answer 404 themselves.
+        return _error(404, _('Not found.'))
+    except Exception:
+        logger.exception('Batched %s %s failed', sub_request['method'], sub_request['path'])
+        return _error(500, _('A server error occurred.'))
+
+    if content and not response.get('Content-Type', '').startswith('application/json'):
+        return _error(400, _('Only JSON responses can be batched.'))
+    return response.status_code, dict(response.items()), content
+
+
+def _dispatch_in_thread(request, sub_request, batch_view):
+    try:
+        return dispatch(request, sub_request, batch_view)
+    finally:
+        connections.close_all()
+
+
+def run_batch(request, sub_requests, parallel, batch_view):
+    """
+    Returns the (status, headers, content) of every sub-request, in order.
+    """
+    results = [None] * len(sub_requests)
+    reads = []
+
+    def run_reads():
+        if len(reads) > 1:
+            with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) as executor:
+                futures = {index: executor.submit(_dispatch_in_thread, request, sub_requests[index], batch_view)
+                           for index in reads}
+            for index, future in futures.items():
+                results[index] = future.result()
+        else:
+            for index in reads:
+                results[index] = dispatch(request, sub_requests[index], batch_view)
+        reads.clear()
+
+    for index, sub_request in enumerate(sub_requests):
+        if parallel and sub_request['method'] in SAFE_METHODS:
+            reads.append(index)
+            continue
+
+        run_reads()
+        results[index] = dispatch(request, sub_request, batch_view)
+    run_reads()
+
+    return results
+
+
+def encode_results(results):
+    """
+    Returns the JSON of the batch response, with the JSON contents embedded as they are.
+    """
+    parts = []
+    for status, headers, content in results:
+        body = content or b'null'
+        head = json.dumps({'status': status, 'headers': headers}, ensure_ascii=False, separators=(',', ':'))
+        parts.append(head[:-1].encode() + b',"body":' + body + b'}')
+    return b'{"responses":[' + b','.join(parts) + b']}'
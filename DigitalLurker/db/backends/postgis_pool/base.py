@@ -0,0 +1,54 @@
+"""
+PostGIS backend that takes its connections from an in-process pool instead of opening
+a new one for every request. Closing the connection at the end of a request, which Django
+does with CONN_MAX_AGE = 0, returns it to the pool.
+
+Pool options are read from the POOL key of the database settings:
+MAX_SIZE, TIMEOUT, MAX_LIFETIME and CHECK_INTERVAL (all in seconds except MAX_SIZE).
+"""
+from django.contrib.gis.db.backends.postgis.base import DatabaseWrapper as PostGISDatabaseWrapper
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgreSQLDatabaseCreation
+
+from DigitalLurker.db.pool import get_pool, close_pools
+
+
+class DatabaseCreation(PostgreSQLDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use.
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+
+        return self.pool(conn_params).getconn()
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        if self.alias == NO_DB_ALIAS:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            # A connection closed inside an atomic block is still referenced by this wrapper.
+            self.pool(self.get_connection_params()).putconn(self.connection,
+                                                            discard=self.in_atomic_block or self.errors_occurred)
+
+    def pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        key = (self.alias, conn_params.get('dbname'), conn_params.get('host'), conn_params.get('port'),
+               conn_params.get('user'))
+
+        return get_pool(key,
+                        lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                        max_size=options.get('MAX_SIZE', 10),
+                        timeout=options.get('TIMEOUT', 10),
+                        max_lifetime=options.get('MAX_LIFETIME', 30 * 60),
+                        check_interval=options.get('CHECK_INTERVAL', 30))
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Idle connections are handed out most recently used first. A connection that sat idle
+    for longer than `check_interval` seconds is pinged before reuse, and connections older
+    than `max_lifetime` seconds are replaced.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=10, max_lifetime=30 * 60, check_interval=30):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0, 'waited': 0, 'timeouts': 0}
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection, returned_at = self._idle.pop()
+                    if self._is_reusable(connection, returned_at):
+                        self._stats['reused'] += 1
+                        return connection
+                    self._discard(connection)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection available within {self.timeout} seconds.')
+
+                self._stats['waited'] += 1
+                self._condition.wait(remaining)
+
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+            self._stats['created'] += 1
+        return connection
+
+    def putconn(self, connection, discard=False):
+        with self._condition:
+            if discard or self._closed or getattr(connection, 'closed', False) or not self._reset(connection):
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._discard(connection)
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats,
+                        size=self._size,
+                        idle=len(self._idle),
+                        in_use=self._size - len(self._idle),
+                        max_size=self.max_size)
+
+    def _is_reusable(self, connection, returned_at):
+        if getattr(connection, 'closed', False):
+            return False
+
+        if time.monotonic() - self._created_at.get(id(connection), 0) > self.max_lifetime:
+            return False
+
+        if time.monotonic() - returned_at > self.check_interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except Exception:
+                return False
+
+        return True
+
+    def _reset(self, connection):
+        """
+        Rolls back whatever the previous user left open. Returns False when that failed.
+        """
+        try:
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        self._created_at.pop(id(connection), None)
+        self._size -= 1
+        self._stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def get_pool(key, connect, **options):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def pool_stats():
+    with _pools_lock:
+        return {key[0]: pool.stats() for key, pool in _pools.items()}
@@ -0,0 +1,140 @@
+"""
+Read-replica routing.
+
+Safe requests of views using ReplicaReadMixin read from a healthy replica. A user who just
+wrote something is pinned to the primary for REPLICA_PIN_SECONDS, so they always see their
+own writes. Pins are kept in the default cache, which has to be shared between processes
+for pinning to work across workers.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DatabaseError, DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+_health = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def healthy_replicas():
+    """
+    Returns the replicas that answered their last health check. Each replica is checked
+    at most once per REPLICA_HEALTH_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    healthy = []
+
+    for alias in replica_aliases():
+        is_healthy, checked_at = _health.get(alias, (False, None))
+        if checked_at is None or now - checked_at > settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            is_healthy = _check(alias)
+            _health[alias] = (is_healthy, now)
+        if is_healthy:
+            healthy.append(alias)
+
+    return healthy
+
+
+def _check(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        connection.close()
+        return False
+    return True
+
+
+def choose_replica():
+    replicas = healthy_replicas()
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+def reads_from_replica():
+    return _read_from_replica.get()
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(_pin_key(user)) is not None
+
+
+async def aread_from_replica_unless_pinned(user):
+    """
+    Turns replica reads on for the rest of the current context if the user has no recent writes.
+    """
+    if not replica_aliases():
+        return
+    if user is None or not user.is_authenticated or await cache.aget(_pin_key(user)) is None:
+        _read_from_replica.set(True)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a replica while replica reads are turned on for the current context,
+    everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get():
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests of a view from a replica and pins users to the primary after
+    a successful write.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if request.method in SAFE_METHODS and replica_aliases() and not is_pinned(request.user):
+            self._replica_token = _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_from_replica.reset(token)
+            self._replica_token = None
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+
+        return super().finalize_response(request, response, *args, **kwargs)
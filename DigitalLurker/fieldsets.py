@@ -0,0 +1,188 @@
+"""
+Sparse fieldsets, selected with the ?fields= and ?expand= query parameters of GET requests.
+
+`fields` is a comma separated list of the fields to return, fields of embedded objects are
+selected with a dot, e.g. ?fields=image,like_count,owner.username. Without it every field is
+returned, with related objects embedded. A related object listed in `fields` on its own is
+returned as its public_id, unless it is also listed in `expand`, which embeds it with all of
+its fields. Related objects only listed in `expand` are embedded in addition to `fields`.
+
+Fields that are not selected are not computed, and where a representation is built from
+values() rows, their columns are not queried.
+"""
+from functools import cache, cached_property
+
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+class Fieldset:
+    """
+    The fields of a representation to return. `fields` maps the selected names to None for
+    plain fields and related objects collapsed to their public_id, or to the Fieldset of an
+    embedded object. Without `fields` everything is returned.
+    """
+    def __init__(self, fields=None):
+        self.fields = fields
+
+    @property
+    def sparse(self):
+        return self.fields is not None
+
+    def __contains__(self, name):
+        return self.fields is None or name in self.fields
+
+    def nested(self, name):
+        """
+        Returns the Fieldset of an embedded object, None if it is collapsed to its public_id.
+        """
+        if self.fields is None:
+            return ALL
+        return self.fields[name]
+
+    def add(self, path):
+        name, *rest = path
+        if not rest:
+            self.fields.setdefault(name, None)
+            return
+
+        nested = self.fields.get(name)
+        if nested is None:
+            nested = self.fields[name] = Fieldset({})
+        if nested.sparse:
+            nested.add(rest)
+
+    def expand(self, path):
+        name, *rest = path
+        if not rest:
+            # An explicit selection of nested fields wins over the expansion.
+            if self.fields.get(name) is None:
+                self.fields[name] = ALL
+            return
+
+        nested = self.fields.get(name)
+        if nested is None:
+            nested = self.fields[name] = Fieldset({})
+        if nested.sparse:
+            nested.expand(rest)
+
+    def validate(self, available, prefix=''):
+        """
+        Raises ValidationError for selected fields missing from `available`, a dict mapping
+        the field names to the same kind of dict for embedded objects, or to None.
+        """
+        if not self.sparse:
+            return
+
+        for name, nested in self.fields.items():
+            if name not in available:
+                raise ValidationError({'fields': [_('Unknown field: %s.') % f'{prefix}{name}']})
+            if nested is not None:
+                if available[name] is None:
+                    raise ValidationError({'fields': [_('%s has no fields to select.') % f'{prefix}{name}']})
+                nested.validate(available[name], f'{prefix}{name}.')
+
+    def select(self, data):
+        """
+        Returns the selected part of a full representation.
+        """
+        if not self.sparse:
+            return data
+
+        selected = {}
+        for name, value in data.items():
+            if name not in self.fields:
+                continue
+            nested = self.fields[name]
+            if isinstance(value, dict):
+                value = value['public_id'] if nested is None else nested.select(value)
+            selected[name] = value
+        return selected
+
+
+ALL = Fieldset()
+
+
+def _paths(value):
+    if not value:
+        return []
+    return [path.strip().split('.') for path in value.split(',') if path.strip()]
+
+
+def parse_fieldset(query_params):
+    """
+    Returns the Fieldset of the ?fields= and ?expand= query parameters.
+    """
+    paths = _paths(query_params.get('fields'))
+    if not paths:
+        # Without a selection related objects are embedded already.
+        return ALL
+
+    fieldset = Fieldset({})
+    for path in paths:
+        fieldset.add(path)
+    for path in _paths(query_params.get('expand')):
+        fieldset.expand(path)
+    return fieldset
+
+
+def _available(serializer):
+    return {name: _available(field) if isinstance(field, serializers.Serializer) else None
+            for name, field in serializer.fields.items() if not field.write_only}
+
+
+@cache
+def serializer_fields(serializer_class):
+    """
+    Returns the fields a Fieldset can select from the representation of `serializer_class`.
+    """
+    return _available(serializer_class())
+
+
+def _restrict(serializer, fieldset):
+    for name, field in list(serializer.fields.items()):
+        if field.write_only:
+            continue
+        if name not in fieldset.fields:
+            del serializer.fields[name]
+        elif isinstance(field, serializers.Serializer):
+            nested = fieldset.fields[name]
+            if nested is None:
+                serializer.fields[name] = serializers.UUIDField(source=f'{field.source}.public_id', read_only=True)
+            elif nested.sparse:
+                _restrict(field, nested)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that only returns the fields of the `fieldset` keyword argument. Fields
+    that are not selected are removed before serializing, so their methods are never called.
+    """
+    def __init__(self, *args, fieldset=ALL, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset.sparse:
+            fieldset.validate(_available(self))
+            _restrict(self, fieldset)
+
+
+class SparseFieldsetViewMixin:
+    """
+    View mixin passing the Fieldset of the query parameters of GET requests to serializers
+    with SparseFieldsetMixin. Views building representations without the serializer use
+    `fieldset`, which is validated against the fields of the serializer.
+    """
+    @cached_property
+    def fieldset(self):
+        serializer_class = self.get_serializer_class()
+        if self.request.method != 'GET' or not issubclass(serializer_class, SparseFieldsetMixin):
+            return ALL
+
+        fieldset = parse_fieldset(self.request.query_params)
+        fieldset.validate(serializer_fields(serializer_class))
+        return fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), SparseFieldsetMixin):
+            kwargs.setdefault('fieldset', self.fieldset)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,110 @@
+"""
+Fast renderers and parsers for API payloads, enabled with API_JSON_BACKEND and API_MSGPACK.
+
+ORJSONRenderer produces the same bytes as DRF's JSONRenderer, apart from float exponents
+(1e300 instead of 1e+300), with orjson doing the encoding.
+Types orjson does not know, or formats differently (dates and times), go through the same
+conversions as DRF's JSONEncoder, and GEOS geometries are encoded as GeoJSON geometries.
+MessagePackRenderer and MessagePackParser handle application/msgpack with the same
+conversions; they need the optional msgpack package.
+"""
+import decimal
+import uuid
+
+import orjson
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    """
+    Converts what the encoders do not handle natively, like DRF's JSONEncoder does.
+    """
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Point):
+        return {'type': 'Point', 'coordinates': list(obj.coords)}
+    if isinstance(obj, GEOSGeometry):
+        return orjson.loads(obj.json)
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """
+    Returns the compact JSON of `data`, like DRF's JSONRenderer writes it.
+    """
+    content = orjson.dumps(data, default=default, option=_OPTIONS)
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        # JSONRenderer escapes line and paragraph separators to stay a JavaScript subset.
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # orjson only writes compact UTF-8 or indents by two spaces, other output, e.g. for
+        # the browsable API or "; indent=" media types, is left to the standard library.
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None \
+                or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(parsers.JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        try:
+            content = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def _require_msgpack():
+    if msgpack is None:
+        raise ImproperlyConfigured('API_MSGPACK needs the msgpack package.')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        _require_msgpack()
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        _require_msgpack()
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     'drf_yasg',
     'corsheaders',
 
+    'jobs',
     'user',
     'place'
 ]
@@ -71,12 +72,31 @@ REST_FRAMEWORK = {
     ],
 }
 
+# API_JSON_BACKEND=orjson encodes and parses JSON with orjson, with the same output as the
+# standard library. API_MSGPACK adds application/msgpack, which needs the msgpack package.
+API_JSON_BACKEND = os.getenv('API_JSON_BACKEND') or 'json'
+API_MSGPACK = os.getenv('API_MSGPACK', 'False').lower() in ('true', '1', 't')
+
+if API_JSON_BACKEND == 'orjson' or API_MSGPACK:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+if API_JSON_BACKEND == 'orjson':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0] = 'DigitalLurker.renderers.ORJSONRenderer'
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'][0] = 'DigitalLurker.renderers.ORJSONParser'
+if API_MSGPACK:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('DigitalLurker.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('DigitalLurker.renderers.MessagePackParser')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=15) if DEBUG else timedelta(minutes=15),
     'USER_ID_FIELD': 'public_id'
 }
 
 MIDDLEWARE = [
+    'DigitalLurker.timing.RequestTimingMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -113,24 +133,151 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'DigitalLurker.wsgi.application'
 
+# 'wsgi' runs gunicorn with sync workers, 'asgi' with uvicorn workers on DigitalLurker.asgi (see gunicorn.conf.py).
+SERVER_MODE = os.getenv('SERVER_MODE') or 'wsgi'
+
+# Serve the hot read endpoints (place retrieve and search, photo list, like state) with async views.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', str(SERVER_MODE == 'asgi')).lower() in ('true', '1', 't')
+
+# Like count streaming (/stream/likes/, ASGI only): seconds changes of a photo are coalesced for,
+# seconds between keep-alive comments and the number of public_ids one connection may follow.
+LIKE_STREAM_INTERVAL = float(os.getenv('LIKE_STREAM_INTERVAL', 1))
+LIKE_STREAM_HEARTBEAT = float(os.getenv('LIKE_STREAM_HEARTBEAT', 15))
+LIKE_STREAM_MAX_TOPICS = int(os.getenv('LIKE_STREAM_MAX_TOPICS', 200))
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOL takes connections from an in-process pool (DigitalLurker.db.backends.postgis_pool) and
+# returns them at the end of every request, which is what ASGI workers need. Otherwise connections
+# are kept open per thread for DB_CONN_MAX_AGE seconds and checked before reuse.
+DB_POOL = os.getenv('DB_POOL', str(SERVER_MODE == 'asgi')).lower() in ('true', '1', 't')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.contrib.gis.db.backends.postgis',
+        'ENGINE': 'DigitalLurker.db.backends.postgis_pool' if DB_POOL else 'django.contrib.gis.db.backends.postgis',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 't'),
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', 30 * 60)),
+            'CHECK_INTERVAL': int(os.getenv('DB_POOL_CHECK_INTERVAL', 30)),
+        },
     }
 }
 
+# Read replicas, comma separated "host[:port]" entries sharing the credentials of the primary.
+# Safe requests of the place, photo and user endpoints read from a healthy replica, users are
+# pinned to the primary for REPLICA_PIN_SECONDS after a write (see DigitalLurker.db.replicas).
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    replica_host, _sep, replica_port = replica.strip().partition(':')
+    DATABASES[f'replica_{index}'] = dict(DATABASES['default'],
+                                         HOST=replica_host,
+                                         PORT=replica_port or DATABASES['default']['PORT'],
+                                         TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['DigitalLurker.db.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_HEALTH_CHECK_INTERVAL', 5))
+
 AUTH_USER_MODEL = 'user.User'
 
 
+# Cache
+# Local memory by default, which is per process. Deployments running several workers should
+# point CACHE_BACKEND at a shared cache, e.g. django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://host:6379, so invalidations and replica pins reach every worker.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        'OPTIONS': {'MAX_ENTRIES': 10000} if CACHE_BACKEND.endswith('LocMemCache') else {},
+    }
+}
+
+# Seconds cached place and photo representations are kept for (see place.caching).
+OBJECT_CACHE_TIMEOUT = int(os.getenv('OBJECT_CACHE_TIMEOUT', 600))
+
+# Most sub-requests of a /batch/ request, and threads running its GET requests with `parallel`.
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS') or 20)
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS') or 4)
+
+# Default decimals of locations returned as [longitude, latitude] with ?location=coordinates
+# (see place.compact), 6 decimals are about 10 cm.
+LOCATION_PRECISION = int(os.getenv('LOCATION_PRECISION') or 6)
+
+# Nearby photo feed (/places/photos/nearby/, see place.nearby): default and largest radius in
+# meters, photos per page, geohash characters of the cells sharing a feed (6 are about 1 km) and
+# seconds pages of a cell are cached for.
+NEARBY_PHOTOS_RADIUS = int(os.getenv('NEARBY_PHOTOS_RADIUS') or 5000)
+NEARBY_PHOTOS_MAX_RADIUS = int(os.getenv('NEARBY_PHOTOS_MAX_RADIUS') or 50000)
+NEARBY_PHOTOS_PAGE_SIZE = int(os.getenv('NEARBY_PHOTOS_PAGE_SIZE') or 20)
+NEARBY_PHOTOS_BUCKET_PRECISION = int(os.getenv('NEARBY_PHOTOS_BUCKET_PRECISION') or 6)
+NEARBY_PHOTOS_CACHE_TIMEOUT = int(os.getenv('NEARBY_PHOTOS_CACHE_TIMEOUT') or 30)
+
+# Photos per page of the photos of the current user (/places/photos/mine/, see place.my_photos).
+MY_PHOTOS_PAGE_SIZE = int(os.getenv('MY_PHOTOS_PAGE_SIZE') or 30)
+
+# Nearest places stored for every place (/places/<public_id>/neighbours/, see place.neighbours),
+# and how many times as many candidates the nearest in degrees are ranked on the sphere.
+PLACE_NEIGHBOURS = int(os.getenv('PLACE_NEIGHBOURS') or 10)
+PLACE_NEIGHBOUR_CANDIDATES = int(os.getenv('PLACE_NEIGHBOUR_CANDIDATES') or 4)
+
+# Seconds after which a like counts half as much for trending photos (see place.trending), and
+# after which the landmark of the scores is moved to the present by a background job.
+TRENDING_HALF_LIFE = int(os.getenv('TRENDING_HALF_LIFE') or 6 * 60 * 60)
+TRENDING_RESCALE_INTERVAL = int(os.getenv('TRENDING_RESCALE_INTERVAL') or 24 * 60 * 60)
+
+# Place sync (/places/sync/): changes per page, seconds changes are held back for so transactions
+# still in flight can not be skipped, and days tombstones of deleted places are kept for.
+PLACE_SYNC_PAGE_SIZE = int(os.getenv('PLACE_SYNC_PAGE_SIZE', 500))
+PLACE_SYNC_DELAY = int(os.getenv('PLACE_SYNC_DELAY', 5))
+PLACE_TOMBSTONE_RETENTION_DAYS = int(os.getenv('PLACE_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+# Background jobs
+# Seconds between polls of an idle worker, base and maximum retry delay, and how long a running
+# job may go without a heartbeat (sent every third of it) before it is considered abandoned by a
+# dead worker.
+
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_MAX_RETRY_DELAY = int(os.getenv('JOBS_MAX_RETRY_DELAY', 60 * 60))
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 30 * 60))
+
+
+# Request timing (see DigitalLurker.timing)
+# Share of the requests that are timed, from 0 (off) to 1 (all), the number of queries and
+# milliseconds above which a request is logged as a warning, and how many of its most repeated
+# statements are logged with it.
+
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv('REQUEST_TIMING_SAMPLE_RATE') or 0)
+REQUEST_TIMING_QUERY_BUDGET = int(os.getenv('REQUEST_TIMING_QUERY_BUDGET') or 20)
+REQUEST_TIMING_LATENCY_BUDGET = float(os.getenv('REQUEST_TIMING_LATENCY_BUDGET') or 500)
+REQUEST_TIMING_TOP_QUERIES = int(os.getenv('REQUEST_TIMING_TOP_QUERIES') or 5)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'DigitalLurker.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -174,6 +321,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# How media files are delivered: 'django' streams them in-process, 'x-accel-redirect' (nginx)
+# and 'x-sendfile' (apache, lighttpd) only send headers and let the front proxy deliver the body.
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE') or 'django'
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 60 * 60 * 24))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
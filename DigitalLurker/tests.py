@@ -0,0 +1,437 @@
+import datetime
+import decimal
+import io
+import json
+import os
+import runpy
+import tempfile
+import unittest
+import uuid
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.views import APIView
+
+from DigitalLurker.db import replicas
+from DigitalLurker.db.pool import ConnectionPool, PoolTimeout
+from DigitalLurker.media import serve_media
+from place.models import Place, PlacePhoto
+from DigitalLurker.renderers import ORJSONRenderer, ORJSONParser, MessagePackRenderer, MessagePackParser, msgpack
+
+
+class ServeMediaTestCase(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        os.makedirs(os.path.join(self.media_root.name, 'place_photos'))
+        self.path = 'place_photos/photo.png'
+        with open(os.path.join(self.media_root.name, self.path), 'wb') as file:
+            file.write(b'0123456789')
+
+        self.factory = RequestFactory()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_SERVE_MODE='django')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_serve_whole_file(self):
+        response = serve_media(self.factory.get(f'/media/{self.path}'), self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+
+    def test_missing_file(self):
+        from django.http import Http404
+
+        with self.assertRaises(Http404):
+            serve_media(self.factory.get('/media/missing.png'), 'missing.png')
+        with self.assertRaises(Http404):
+            serve_media(self.factory.get('/media/../settings.py'), '../settings.py')
+
+    def test_range(self):
+        response = serve_media(self.factory.get(f'/media/{self.path}', HTTP_RANGE='bytes=2-5'), self.path)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        response = serve_media(self.factory.get(f'/media/{self.path}', HTTP_RANGE='bytes=-3'), self.path)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = serve_media(self.factory.get(f'/media/{self.path}', HTTP_RANGE='bytes=20-'), self.path)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_conditional_requests(self):
+        response = serve_media(self.factory.get(f'/media/{self.path}'), self.path)
+
+        response = serve_media(self.factory.get(f'/media/{self.path}', HTTP_IF_NONE_MATCH=response['ETag']),
+                               self.path)
+        self.assertEqual(response.status_code, 304)
+
+        modified = os.stat(os.path.join(self.media_root.name, self.path)).st_mtime
+        response = serve_media(self.factory.get(f'/media/{self.path}',
+                                                HTTP_IF_MODIFIED_SINCE=http_date(modified + 60)),
+                               self.path)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = serve_media(self.factory.get(f'/media/{self.path}'), self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.path}')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        response = serve_media(self.factory.get(f'/media/{self.path}'), self.path)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root.name, self.path))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self):
+        if self.closed:
+            raise ConnectionError()
+        return nullcontext(self)
+
+    def execute(self, sql):
+        pass
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def test_reuse(self):
+        pool = ConnectionPool(FakeConnection, max_size=2)
+
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(connection.rollbacks, 1)
+
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_timeout(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.01)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_discard_broken_and_old_connections(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, check_interval=0)
+
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.closed = True
+        self.assertIsNot(pool.getconn(), connection)
+
+        pool = ConnectionPool(FakeConnection, max_size=1, max_lifetime=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_close(self):
+        pool = ConnectionPool(FakeConnection)
+        idle, in_use = pool.getconn(), pool.getconn()
+        pool.putconn(idle)
+
+        pool.close()
+        self.assertTrue(idle.closed)
+
+        pool.putconn(in_use)
+        self.assertTrue(in_use.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class ReplicaView(replicas.ReplicaReadMixin, APIView):
+    permission_classes = []
+
+    def get(self, request):
+        return Response({'replica': replicas.reads_from_replica()})
+
+    def post(self, request):
+        return Response({'replica': replicas.reads_from_replica()})
+
+
+@override_settings(REPLICA_HEALTH_CHECK_INTERVAL=60, REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        replicas._health.clear()
+        self.addCleanup(replicas._health.clear)
+
+        patcher = mock.patch.object(replicas, 'replica_aliases', return_value=['replica_1', 'replica_2'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.check = mock.patch.object(replicas, '_check', return_value=True).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.router = replicas.ReplicaRouter()
+        self.factory = APIRequestFactory()
+        self.user = SimpleNamespace(pk=1, is_authenticated=True)
+
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+        with replicas.use_replica():
+            self.assertIn(self.router.db_for_read(None), ['replica_1', 'replica_2'])
+            self.assertEqual(self.router.db_for_write(None), 'default')
+
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'place'))
+
+    def test_failover(self):
+        self.check.side_effect = lambda alias: alias == 'replica_2'
+
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(None), 'replica_2')
+            self.assertEqual(self.router.db_for_read(None), 'replica_2')
+        # Health is checked once per interval.
+        self.assertEqual(self.check.call_count, 2)
+
+        self.check.side_effect = None
+        self.check.return_value = False
+        replicas._health.clear()
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_safe_requests_read_from_replica(self):
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(ReplicaView.as_view()(request).data, {'replica': True})
+        self.assertFalse(replicas.reads_from_replica())
+
+        request = self.factory.post('/')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(ReplicaView.as_view()(request).data, {'replica': False})
+
+    def test_writer_is_pinned_to_primary(self):
+        request = self.factory.post('/')
+        force_authenticate(request, user=self.user)
+        ReplicaView.as_view()(request)
+        self.assertTrue(replicas.is_pinned(self.user))
+
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(ReplicaView.as_view()(request).data, {'replica': False})
+
+        request = self.factory.get('/')
+        force_authenticate(request, user=SimpleNamespace(pk=2, is_authenticated=True))
+        self.assertEqual(ReplicaView.as_view()(request).data, {'replica': True})
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        replicas.pin_to_primary(self.user)
+        self.assertFalse(replicas.is_pinned(self.user))
+
+    def test_replica_settings(self):
+        with mock.patch.dict(os.environ, {'DB_REPLICA_HOSTS': 'replica-a, replica-b:5433', 'DB_PORT': '5432'}):
+            settings = runpy.run_path(os.path.join(os.path.dirname(__file__), 'settings.py'))
+
+        self.assertEqual([(settings['DATABASES'][alias]['HOST'], settings['DATABASES'][alias]['PORT'])
+                          for alias in ['replica_1', 'replica_2']], [('replica-a', '5432'), ('replica-b', '5433')])
+        self.assertEqual(str(dict(settings['LANGUAGES'])['en']), 'English')
+
+
+class RenderersTestCase(SimpleTestCase):
+    data = {'public_id': uuid.UUID('5ea21733-ed7d-48d3-bee7-52da0a342eaa'),
+            'experience': decimal.Decimal('1.25'),
+            'updated_at': datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc),
+            'date_of_birth': datetime.date(2001, 1, 1),
+            'name': 'Zoë\u2028',
+            'errors': [ErrorDetail('Invalid.')],
+            'distance': 12,
+            'nested': {'liked': True, 'description': None}}
+
+    def test_orjson_matches_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(ORJSONRenderer().render(self.data, 'application/json; indent=4'),
+                         JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    def test_geometries(self):
+        self.assertEqual(ORJSONRenderer().render({'location': Point(1.5, 2, srid=4326)}),
+                         b'{"location":{"type":"Point","coordinates":[1.5,2.0]}}')
+
+    def test_orjson_parser(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"name":"Zoë"}'.encode())), {'name': 'Zoë'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"name":'))
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_round_trip(self):
+        content = MessagePackRenderer().render(self.data)
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(content)),
+                         json.loads(JSONRenderer().render(self.data)))
+
+
+class BatchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='user@user.com',
+                                                         username='testuser',
+                                                         password='testpass',
+                                                         date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.user, experience=5)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def batch(self, requests, parallel=False):
+        response = self.client.post('/batch/', {'requests': requests, 'parallel': parallel}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)['responses']
+
+    def test_screen(self):
+        photos = f'/places/{self.place.public_id}/photos/'
+        responses = self.batch([
+            {'path': f'/places/{self.place.public_id}/', 'headers': {'Point': 'POINT(1 3)'}},
+            {'path': f'{photos}?fields=title'},
+            {'path': f'{photos}{self.photo.public_id}/likes/'},
+            {'method': 'POST', 'path': f'{photos}{self.photo.public_id}/likes/'},
+            {'path': '/users/'},
+        ])
+
+        self.assertEqual([response['status'] for response in responses], [200, 200, 200, 201, 200])
+        self.assertGreater(responses[0]['body']['distance'], 0)
+        self.assertEqual(responses[1]['body']['results'], [{'title': 'title'}])
+        self.assertEqual(responses[2]['body'], {'exists': False})
+        self.assertEqual(responses[4]['body']['username'], 'testuser')
+        self.assertIn('ETag', responses[0]['headers'])
+
+    def test_permissions_and_errors(self):
+        self.client.credentials()
+        responses = self.batch([{'path': '/users/'}, {'path': '/nowhere/'}, {'path': '/batch/'},
+                                {'path': '/media/missing.png'}])
+        self.assertEqual([response['status'] for response in responses], [401, 404, 400, 404])
+
+        response = self.client.post('/batch/', {'requests': [{'path': 'users/'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_streaming_responses(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(is_staff=True)
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, MEDIA_SERVE_MODE='django'):
+            with open(os.path.join(media_root, 'photo.png'), 'wb') as file:
+                file.write(b'\x89PNG')
+            responses = self.batch([{'path': '/places/export/'}, {'path': '/media/photo.png'}])
+
+        self.assertEqual([response['status'] for response in responses], [400, 400])
+        self.assertEqual(responses[1]['body'], {'detail': 'Streaming responses can not be batched.'})
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_limit(self):
+        response = self.client.post('/batch/', {'requests': [{'path': '/users/'}] * 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ParallelBatchTestCase(TransactionTestCase):
+    # Parallel reads run in threads on connections of their own, they only see committed rows.
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='user@user.com',
+                                                         username='testuser',
+                                                         password='testpass',
+                                                         date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.user, experience=5)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    @override_settings(BATCH_MAX_WORKERS=3)
+    def test_parallel(self):
+        photos = f'/places/{self.place.public_id}/photos/'
+        likes = f'{photos}{self.photo.public_id}/likes/'
+        response = self.client.post('/batch/', {'parallel': True, 'requests': [
+            {'path': f'/places/{self.place.public_id}/'},
+            {'path': f'{photos}?fields=title'},
+            {'path': likes},
+            {'method': 'POST', 'path': likes},
+            {'path': likes},
+            {'path': '/users/'},
+            {'path': '/nowhere/'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = json.loads(response.content)['responses']
+
+        self.assertEqual([response['status'] for response in responses], [200, 200, 200, 201, 200, 200, 404])
+        self.assertEqual(responses[0]['body']['name'], 'Test Place')
+        self.assertEqual(responses[1]['body']['results'], [{'title': 'title'}])
+        # Reads are not reordered across the write between them.
+        self.assertEqual(responses[2]['body'], {'exists': False})
+        self.assertEqual(responses[4]['body'], {'exists': True})
+        self.assertEqual(responses[5]['body']['username'], 'testuser')
+
+
+class RequestTimingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='user@user.com',
+                                                         username='testuser',
+                                                         password='testpass',
+                                                         date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.user, experience=5)
+        PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_sampled(self):
+        response = self.client.get(f'/places/{self.place.public_id}/photos/')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled(self):
+        with self.assertLogs('DigitalLurker.timing', 'INFO') as logs:
+            response = self.client.get(f'/places/{self.place.public_id}/photos/')
+
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['db', 'view', 'serialize', 'render', 'total'])
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        level, record = logs.records[0].levelname, json.loads(logs.records[0].getMessage())
+        self.assertEqual(level, 'INFO')
+        self.assertEqual(record['path'], f'/places/{self.place.public_id}/photos/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['view_ms'])
+        self.assertNotIn('over_budget', record)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_QUERY_BUDGET=1)
+    def test_over_budget(self):
+        with self.assertLogs('DigitalLurker.timing', 'WARNING') as logs:
+            self.client.get('/users/')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['over_budget'], ['queries'])
+        # The experience of the user is computed for both experience fields.
+        duplicate, = record['duplicate_queries']
+        self.assertEqual(duplicate['count'], 2)
+        self.assertIn('place_place', duplicate['sql'])
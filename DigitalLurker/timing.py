@@ -0,0 +1,233 @@
+"""
+Per-request performance instrumentation, enabled with REQUEST_TIMING_SAMPLE_RATE.
+
+RequestTimingMiddleware times a sample of the requests: the number and duration of their SQL
+queries on every connection, the time spent in the view, in serializers and representations
+and in rendering, and the total. Sampled responses get a Server-Timing header, e.g.
+`db;dur=12.1;desc="8 queries", view;dur=20.3, serialize;dur=4.2, render;dur=1.0, total;dur=23.9`,
+and every sampled request is logged as one JSON line on the DigitalLurker.timing logger.
+Requests with more than REQUEST_TIMING_QUERY_BUDGET queries or slower than
+REQUEST_TIMING_LATENCY_BUDGET milliseconds are logged as warnings, with the
+REQUEST_TIMING_TOP_QUERIES statements that ran most often. Statements are compared without
+their parameters, so a query repeated for every row of a list (N+1) stands out.
+
+Queries are counted by a wrapper every connection gets when it is opened. For requests that
+are not sampled it only reads a context variable, so the middleware can stay on in production.
+"""
+import json
+import logging
+import random
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    The measurements of one request. Times are in seconds.
+    """
+    def __init__(self):
+        self.started = perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+        self.times = Counter()
+        self._depth = Counter()
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.query_time += duration
+        self.statements[sql] += 1
+
+    @contextmanager
+    def measure(self, name):
+        # Only the outermost of nested measurements counts, e.g. an embedded serializer.
+        self._depth[name] += 1
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] -= 1
+            if not self._depth[name]:
+                self.times[name] += perf_counter() - started
+
+    def durations(self, finished):
+        """
+        Returns the durations of the parts of the request in milliseconds, in the order of
+        the Server-Timing header.
+        """
+        view_started = self.view_started or self.started
+        view_finished = self.view_finished or finished
+        durations = {'db': self.query_time,
+                     'view': view_finished - view_started,
+                     'serialize': self.times['serialize']}
+        if self.view_finished is not None:
+            durations['render'] = finished - self.view_finished
+        durations['total'] = finished - self.started
+        return {name: round(duration * 1000, 1) for name, duration in durations.items()}
+
+    def duplicates(self):
+        return [{'sql': sql, 'count': count}
+                for sql, count in self.statements.most_common(settings.REQUEST_TIMING_TOP_QUERIES) if count > 1]
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.record_query(sql, perf_counter() - started)
+
+
+def _install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    _install(connection)
+
+
+@contextmanager
+def measure(name):
+    """
+    Adds the time spent in the block to `name` of the current request, if it is timed.
+    """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+
+    with timing.measure(name):
+        yield
+
+
+def timed(name):
+    """
+    Decorator adding the time spent in the function to `name` of the current request.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin counting the time spent building representations as `serialize`.
+    """
+    def to_representation(self, instance):
+        with measure('serialize'):
+            return super().to_representation(instance)
+
+
+def server_timing(durations, queries):
+    return ', '.join(f'{name};dur={duration};desc="{queries} queries"' if name == 'db' else f'{name};dur={duration}'
+                     for name, duration in durations.items())
+
+
+class RequestTimingMiddleware:
+    """
+    Times a sample of the requests, see the module docstring. It has to be the first
+    middleware for the total to cover the others.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_on_connect, dispatch_uid='request_timing')
+        # Connections opened before the middleware was loaded.
+        for connection in connections.all():
+            _install(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self._sampled():
+            return self.get_response(request)
+
+        token = _current.set(RequestTiming())
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        token = _current.set(RequestTiming())
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response)
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def _sampled():
+        rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called when the view returned a response that is rendered next, like DRF's.
+        timing = _current.get()
+        if timing is not None:
+            timing.view_finished = perf_counter()
+        return response
+
+    def _finish(self, request, response):
+        timing = _current.get()
+        durations = timing.durations(perf_counter())
+        response['Server-Timing'] = server_timing(durations, timing.queries)
+
+        over_budget = []
+        if timing.queries > settings.REQUEST_TIMING_QUERY_BUDGET:
+            over_budget.append('queries')
+        if durations['total'] > settings.REQUEST_TIMING_LATENCY_BUDGET:
+            over_budget.append('latency')
+
+        record = {'method': request.method,
+                  'path': request.path,
+                  'status': response.status_code,
+                  'queries': timing.queries,
+                  **{f'{name}_ms': duration for name, duration in durations.items()}}
+        if over_budget:
+            record['over_budget'] = over_budget
+            record['duplicate_queries'] = timing.duplicates()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
@@ -14,7 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
+import re
+
 from django.contrib import admin
 from django.urls import path, re_path, include
 from rest_framework import permissions
@@ -23,6 +24,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from DigitalLurker import settings
+from DigitalLurker.media import serve_media
+from DigitalLurker.views import database_stats, batch
 
 urlpatterns = [
     path('auth/token/', TokenObtainPairView.as_view()),
@@ -30,9 +33,13 @@ urlpatterns = [
     path('auth/token/refresh/', TokenRefreshView.as_view()),
     path('users/', include('user.urls')),
     path('places/', include('place.urls')),
+    path('health/database/', database_stats),
+    path('batch/', batch),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+]
 
 if settings.DEBUG:
     schema_view = get_schema_view(
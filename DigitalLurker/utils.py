@@ -13,3 +13,18 @@ def uuid_upload_to(path):
         return os.path.join(path, f'{str(uuid4())}.{extension}')
 
     return uuid_filename
+
+
+class MaintainedFieldsMixin:
+    """
+    Model mixin leaving the fields named in `maintained_fields` out when an existing row is
+    saved. They are only changed with queryset updates, e.g. counters, so the values of a
+    loaded instance may be outdated and must not overwrite them.
+    """
+    maintained_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and not force_insert and not self._state.adding:
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name not in self.maintained_fields]
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
@@ -0,0 +1,37 @@
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework.response import Response
+
+from DigitalLurker.batch import BatchSerializer, run_batch, encode_results
+from DigitalLurker.db.pool import pool_stats
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_stats(request):
+    """
+    Shows the connection settings of every database and, for pooled ones, the pool statistics.
+    """
+    pools = pool_stats()
+    return Response({alias: {'engine': connections.settings[alias]['ENGINE'],
+                             'conn_max_age': connections.settings[alias]['CONN_MAX_AGE'],
+                             'conn_health_checks': connections.settings[alias]['CONN_HEALTH_CHECKS'],
+                             'pool': pools.get(alias)}
+                     for alias in connections.settings})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch(request):
+    """
+    Runs the sub-requests in `requests`, each with a method, a path with an optional query,
+    optional headers and an optional JSON body, as the authenticated user and returns their
+    responses in order. With `parallel`, consecutive GET requests run concurrently.
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    results = run_batch(request, serializer.validated_data['requests'], serializer.validated_data['parallel'], batch)
+    return HttpResponse(encode_results(results), content_type='application/json')
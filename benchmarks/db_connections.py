@@ -0,0 +1,80 @@
+"""
+Load test for the per-request database connection overhead.
+
+    python benchmarks/db_connections.py -n 2000
+
+Runs the same simulated requests (request_started, one query, request_finished) under three
+configurations: a new connection per request (CONN_MAX_AGE=0), persistent connections and
+the in-process pool. Every request runs in a fresh thread, like sync views under ASGI do.
+The report shows the time per request and how many backend connections were opened.
+Needs the same DB_* environment as the project.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+MODES = {
+    'per request': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+def simulate(requests):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DigitalLurker.settings')
+
+    import django
+    django.setup()
+
+    from django.core.signals import request_started, request_finished
+    from django.db import connection
+
+    from DigitalLurker.db.pool import pool_stats
+
+    backend_pids = set()
+
+    def handle_request():
+        request_started.send(sender=None)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                backend_pids.add(cursor.fetchone()[0])
+        finally:
+            request_finished.send(sender=None)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        thread = threading.Thread(target=handle_request)
+        thread.start()
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f'{elapsed / requests * 1000:.2f} {len(backend_pids)} {pool_stats().get("default")}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    parser.add_argument('--simulate', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(args.requests)
+        return
+
+    print(f'{"mode":<12} {"ms/request":>10} {"connections":>12}')
+    for mode, env in MODES.items():
+        output = subprocess.run([sys.executable, __file__, '--simulate', '-n', str(args.requests)],
+                                env=dict(os.environ, **env),
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout.split(maxsplit=2)
+        print(f'{mode:<12} {float(output[0]):>10.2f} {output[1]:>12}  {output[2].strip()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Minimal keep-alive HTTP load generator used to compare deployment modes.
+
+    SERVER_MODE=wsgi ./entrypoint.sh   # or SERVER_MODE=asgi
+    python benchmarks/http_load.py http://localhost:8000/places/<public_id>/ -c 500 -n 50000
+
+Prints throughput, latency percentiles and the number of failed requests. Run it against
+both SERVER_MODE=wsgi and SERVER_MODE=asgi with the same worker count to compare them.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server.')
+
+    version, status = status_line.split()[:2]
+    status = int(status)
+    length = None
+    chunked = False
+    keep_alive = version == b'HTTP/1.1'
+
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep_alive = False
+
+    return status, keep_alive
+
+
+async def _client(url, headers, queue, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+               + ''.join(f'{header}\r\n' for header in headers)
+               + '\r\n').encode()
+    reader = writer = None
+
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+
+            started = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+
+            if status >= 400:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(repr(e))
+            if writer is not None:
+                writer.close()
+            writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, concurrency, requests, headers):
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(url, headers, queue, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'{len(latencies)} requests in {elapsed:.2f}s, concurrency {concurrency}')
+    print(f'throughput: {len(latencies) / elapsed:.1f} req/s')
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f'latency ms: p50 {quantiles[49] * 1000:.1f}  p95 {quantiles[94] * 1000:.1f}  '
+              f'p99 {quantiles[98] * 1000:.1f}  max {latencies[-1] * 1000:.1f}')
+    print(f'errors: {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('-c', '--concurrency', type=int, default=100)
+    parser.add_argument('-n', '--requests', type=int, default=10000)
+    parser.add_argument('-H', '--header', action='append', default=[],
+                        help='Extra request header, e.g. "Authorization: Bearer <token>".')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.concurrency, args.requests, args.header))
+
+
+if __name__ == '__main__':
+    main()
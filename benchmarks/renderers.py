@@ -0,0 +1,101 @@
+"""
+Benchmark of the API renderers on the shapes of real responses.
+
+    python benchmarks/renderers.py -r 200
+
+Renders a page of the place search, a page of a photo list, a page of the place sync and a
+batch of raw values() rows (UUIDs, datetimes, Decimals) with DRF's JSONRenderer, the orjson
+renderer and, when msgpack is installed, the MessagePack renderer, and prints the time per
+response and the size of the output. The payloads are generated, so no database is needed.
+"""
+import argparse
+import datetime
+import decimal
+import os
+import random
+import sys
+import time
+import uuid
+
+
+def place(index):
+    return {'public_id': str(uuid.uuid4()),
+            'name': f'Place {index}',
+            'main_image': 'http://localhost:8000/media/defaults/places/default.png',
+            'location': f'SRID=4326;POINT ({random.uniform(-180, 180)} {random.uniform(-90, 90)})',
+            'distance': random.randint(0, 20000000),
+            'experience': random.randint(1, 100),
+            'description': 'Łódź — a place with a description of a typical length. ' * 2}
+
+
+def photo(index):
+    return {'public_id': str(uuid.uuid4()),
+            'owner': {'public_id': str(uuid.uuid4()),
+                      'username': f'user{index}',
+                      'email': f'user{index}@example.com',
+                      'first_name': 'Zoë',
+                      'last_name': 'Kowalska',
+                      'date_of_birth': '1990-01-01',
+                      'pfp': 'http://localhost:8000/media/defaults/pfps/default.png',
+                      'total_experience': 120,
+                      'experience_level': 6},
+            'place': place(index),
+            'image': f'http://localhost:8000/media/place_photos/{uuid.uuid4()}.jpg',
+            'title': f'Photo {index}',
+            'liked': index % 3 == 0,
+            'like_count': random.randint(0, 1000),
+            'description': 'A photo.'}
+
+
+def row(index):
+    return {'public_id': uuid.uuid4(),
+            'name': f'Place {index}',
+            'experience': decimal.Decimal(random.randint(1, 10000)) / 100,
+            'updated_at': datetime.datetime.now(datetime.timezone.utc),
+            'is_active': True}
+
+
+def page(results):
+    return {'count': 1000, 'next': 'http://localhost:8000/places/search/?page=3',
+            'previous': 'http://localhost:8000/places/search/?page=1', 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DigitalLurker.settings')
+
+    import django
+    django.setup()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from DigitalLurker.renderers import ORJSONRenderer, MessagePackRenderer, msgpack
+
+    random.seed(0)
+    payloads = {
+        'place search': page([place(index) for index in range(10)]),
+        'photo list': page([photo(index) for index in range(10)]),
+        'place sync': {'next': None, 'since': 'cursor', 'changed': [place(index) for index in range(500)],
+                       'removed': [str(uuid.uuid4()) for _ in range(50)]},
+        'values rows': [row(index) for index in range(500)],
+    }
+    renderers = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+    if msgpack is not None:
+        renderers['msgpack'] = MessagePackRenderer()
+
+    print(f'{"payload":<14} {"renderer":<8} {"us/response":>12} {"bytes":>9}')
+    for name, data in payloads.items():
+        for renderer_name, renderer in renderers.items():
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                content = renderer.render(data)
+            elapsed = (time.perf_counter() - started) / args.repeat
+            print(f'{name:<14} {renderer_name:<8} {elapsed * 1000000:>12.1f} {len(content):>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark of the place search and photo list representations.
+
+    python benchmarks/serializers.py -n 200 -r 20
+
+Renders the first N places and photos of the database with PlaceSerializer and
+PlacePhotoSerializer and with the values() based builders of place.representations, and
+prints the time per row and the number of queries of both. The rendered JSON is compared too,
+a mismatch means the builders drifted from the serializers. Needs the same DB_* environment
+as the project and some data, e.g. from importplaces.
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def measure(build, repeat):
+    from django.db import connection, reset_queries
+    from rest_framework.renderers import JSONRenderer
+
+    reset_queries()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        content = JSONRenderer().render(build())
+    elapsed = time.perf_counter() - started
+    return elapsed / repeat, len(connection.queries) // repeat, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--rows', type=int, default=100)
+    parser.add_argument('-r', '--repeat', type=int, default=10)
+    parser.add_argument('--point', default='POINT(19.94 50.06)', help='Point header to compute distances to.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DigitalLurker.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from place.models import Place, PlacePhoto
+    from place.representations import place_rows, place_data, place_photo_rows, place_photo_data
+    from place.serializers import PlaceSerializer, PlacePhotoSerializer
+
+    # Queries are only recorded with DEBUG on.
+    settings.DEBUG = True
+
+    request = Request(APIRequestFactory().get('/places/search/', HTTP_POINT=args.point))
+    request.user = get_user_model().objects.order_by('id').first()
+
+    places = Place.objects.order_by('id')[:args.rows]
+    photos = PlacePhoto.objects.order_by('id')[:args.rows]
+    cases = {
+        'places': (lambda: PlaceSerializer(places, many=True, context={'request': request}).data,
+                   lambda: place_data(place_rows(places), request)),
+        'photos': (lambda: PlacePhotoSerializer(photos, many=True, context={'request': request}).data,
+                   lambda: place_photo_data(place_photo_rows(photos), request)),
+    }
+
+    print(f'{"list":<8} {"rows":>5} {"serializer ms/row":>18} {"queries":>8} {"lean ms/row":>12} {"queries":>8}')
+    for name, (serializer, lean) in cases.items():
+        rows = len(lean())
+        if not rows:
+            print(f'{name:<8} {0:>5}  no rows to render')
+            continue
+
+        serializer_time, serializer_queries, expected = measure(serializer, args.repeat)
+        lean_time, lean_queries, content = measure(lean, args.repeat)
+        print(f'{name:<8} {rows:>5} {serializer_time / rows * 1000:>18.3f} {serializer_queries:>8} '
+              f'{lean_time / rows * 1000:>12.3f} {lean_queries:>8}'
+              f'{"" if content == expected else "  OUTPUT DIFFERS"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,7 @@
 #!/bin/sh
 
-gunicorn --bind 0.0.0.0:8000 DigitalLurker.wsgi:application
+if [ "${RUN_JOB_WORKER:-true}" = "true" ]; then
+  (while true; do python3 manage.py runjobs; sleep 5; done) &
+fi
+
+gunicorn --config gunicorn.conf.py
@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# Same environment as the settings, SERVER_MODE is usually set in .env.
+load_dotenv()
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+
+if os.getenv('SERVER_MODE') == 'asgi':
+    # One event loop per worker handles many concurrent requests and long-lived streams.
+    wsgi_app = 'DigitalLurker.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'DigitalLurker.wsgi:application'
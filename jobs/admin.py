@@ -0,0 +1,18 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['name', 'payload', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at',
+                       'finished_at']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.STATUS_RUNNING).update(status=Job.STATUS_QUEUED, run_at=timezone.now(),
+                                                            attempts=0)
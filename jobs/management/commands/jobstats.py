@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.queue import queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows the depth of the job queue per job name.'
+
+    def handle(self, *args, **options):
+        stats = queue_stats()
+        if not stats:
+            self.stdout.write('The queue is empty.')
+            return
+
+        self.stdout.write(f'{"name":<40} {"queued":>8} {"running":>8} {"failed":>8} {"waiting":>10}')
+        for name, row in sorted(stats.items()):
+            self.stdout.write(f'{name:<40} '
+                              f'{row.get(Job.STATUS_QUEUED, 0):>8} '
+                              f'{row.get(Job.STATUS_RUNNING, 0):>8} '
+                              f'{row.get(Job.STATUS_FAILED, 0):>8} '
+                              f'{row.get("waiting_seconds", 0):>9.0f}s')
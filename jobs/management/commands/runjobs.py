@@ -0,0 +1,28 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Runs a worker that processes jobs from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as no job is due instead of waiting for new ones.')
+        parser.add_argument('--name', action='append', dest='names',
+                            help='Only process jobs with this name. Can be given multiple times.')
+
+    def handle(self, *args, **options):
+        worker = Worker(names=options['names'])
+
+        def stop(signum, frame):
+            worker.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Worker {worker.name} started.')
+        worker.run(once=options['once'])
+        self.stdout.write(f'Worker {worker.name} stopped.')
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from jobs.models import Job
+
+registry = {}
+
+
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    func: Callable
+    max_attempts: int = 5
+    concurrency: Optional[int] = None
+
+    def enqueue(self, run_at=None, **payload):
+        return enqueue(self.name, run_at=run_at, **payload)
+
+
+def job(name, max_attempts=5, concurrency=None):
+    """
+    Registers the decorated function as the handler of jobs called `name`.
+
+    `concurrency` limits how many jobs of this type run at once across all workers.
+    The payload passed to `enqueue` is handed to the function as keyword arguments,
+    so it has to be JSON serializable.
+    """
+    def decorator(func):
+        job_type = JobType(name=name, func=func, max_attempts=max_attempts, concurrency=concurrency)
+        registry[name] = job_type
+        func.enqueue = job_type.enqueue
+        return func
+
+    return decorator
+
+
+def enqueue(name, run_at=None, **payload):
+    """
+    Adds a job to the queue. When called inside a transaction the job only becomes
+    visible to workers once the transaction commits.
+    """
+    job_type = registry.get(name)
+    return Job.objects.create(name=name,
+                              payload=payload,
+                              run_at=run_at or timezone.now(),
+                              max_attempts=job_type.max_attempts if job_type else 5)
+
+
+def queue_stats():
+    """
+    Returns the number of jobs per name and status, with the age in seconds
+    of the oldest job that is due but still waiting.
+    """
+    now = timezone.now()
+    stats = {}
+
+    for row in Job.objects.exclude(status=Job.STATUS_DONE).values('name', 'status').annotate(count=Count('id')):
+        stats.setdefault(row['name'], {})[row['status']] = row['count']
+
+    oldest = (Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now)
+              .values('name')
+              .annotate(oldest=Min('run_at')))
+    for row in oldest:
+        stats.setdefault(row['name'], {})['waiting_seconds'] = (now - row['oldest']).total_seconds()
+
+    return stats
@@ -0,0 +1,133 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import job, enqueue, queue_stats
+from jobs.worker import Worker
+
+calls = []
+
+
+@job('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@job('tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@job('tests.limited', concurrency=1)
+def limited():
+    pass
+
+
+@job('tests.slow')
+def slow():
+    # Outlives the lock timeout of the test, while another worker looks for stale jobs.
+    time.sleep(0.5)
+    Worker(name='other-worker').requeue_stale()
+    calls.append(Job.objects.get(name='tests.slow').status)
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(name='test-worker')
+
+    def test_run_job(self):
+        record.enqueue(value=1)
+        enqueue('tests.record', value=2)
+
+        self.worker.run(once=True)
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_DONE).count(), 2)
+
+    def test_future_job_is_not_run(self):
+        record.enqueue(run_at=timezone.now() + timedelta(hours=1), value=1)
+
+        self.worker.run(once=True)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_QUEUED)
+
+    def test_retry_with_backoff(self):
+        queued = explode.enqueue()
+
+        self.worker.run(once=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.STATUS_QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('boom', queued.last_error)
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        self.worker.run(once=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.STATUS_FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_unknown_job_fails(self):
+        enqueue('tests.unknown')
+
+        self.worker.run(once=True)
+
+        self.assertEqual(Job.objects.get().status, Job.STATUS_FAILED)
+
+    def test_concurrency_limit(self):
+        limited.enqueue()
+        limited.enqueue()
+        record.enqueue(value=1)
+
+        first = self.worker.claim()
+        self.assertEqual(first.name, 'tests.limited')
+
+        second = self.worker.claim()
+        self.assertEqual(second.name, 'tests.record')
+        self.assertIsNone(self.worker.claim())
+
+    def test_requeue_stale(self):
+        record.enqueue(value=1)
+        claimed = self.worker.claim()
+        Job.objects.filter(pk=claimed.pk).update(locked_at=timezone.now() - timedelta(days=1))
+
+        self.worker.requeue_stale()
+
+        self.assertEqual(Job.objects.get().status, Job.STATUS_QUEUED)
+
+    def test_queue_stats(self):
+        record.enqueue(value=1)
+        record.enqueue(value=2)
+        explode.enqueue()
+
+        stats = queue_stats()
+        self.assertEqual(stats['tests.record'][Job.STATUS_QUEUED], 2)
+        self.assertEqual(stats['tests.explode'][Job.STATUS_QUEUED], 1)
+
+        out = StringIO()
+        call_command('jobstats', stdout=out)
+        self.assertIn('tests.record', out.getvalue())
+
+
+class HeartbeatTestCase(TransactionTestCase):
+    # The heartbeat runs in a thread on a connection of its own, it only sees committed rows.
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(JOBS_LOCK_TIMEOUT=0.3)
+    def test_long_job_is_not_requeued(self):
+        slow.enqueue()
+
+        Worker(name='test-worker').run(once=True)
+
+        self.assertEqual(calls, [Job.STATUS_RUNNING])
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, Job.STATUS_DONE)
+        self.assertEqual(queued.attempts, 1)
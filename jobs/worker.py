@@ -0,0 +1,175 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import registry
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter: roughly 10s, 20s, 40s, ... capped at JOBS_MAX_RETRY_DELAY.
+    """
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1), settings.JOBS_MAX_RETRY_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class Heartbeat:
+    """
+    Refreshes the lock of a running job every JOBS_LOCK_TIMEOUT / 3 seconds from a thread, so
+    jobs running longer than the timeout are not taken for lost and requeued.
+    """
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, name=f'heartbeat-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def _beat(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_LOCK_TIMEOUT / 3):
+                Job.objects.filter(pk=self.job.pk, status=Job.STATUS_RUNNING,
+                                   locked_by=self.job.locked_by).update(locked_at=timezone.now())
+        except Exception:
+            logger.exception('Heartbeat of job %s failed.', self.job)
+        finally:
+            # The thread has a connection of its own.
+            connections.close_all()
+
+
+class Worker:
+    def __init__(self, name=None, names=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.names = names
+        self.stopping = False
+
+    def run(self, once=False):
+        """
+        Processes jobs until stopped. With `once` it returns as soon as no job is due.
+        """
+        last_recovery = 0
+
+        while not self.stopping:
+            if time.monotonic() - last_recovery > settings.JOBS_LOCK_TIMEOUT / 2:
+                self.requeue_stale()
+                last_recovery = time.monotonic()
+
+            job = self.claim()
+            if job is None:
+                if once:
+                    return
+                close_old_connections()
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+                continue
+
+            self.execute(job)
+            close_old_connections()
+
+    def claim(self):
+        """
+        Locks the next due job with SELECT ... FOR UPDATE SKIP LOCKED and marks it as running.
+        Job types with a concurrency limit take an advisory lock on their name while counting
+        running jobs, so the limit holds across workers.
+        """
+        saturated = set()
+
+        with transaction.atomic():
+            while True:
+                queryset = Job.objects.select_for_update(skip_locked=True).filter(status=Job.STATUS_QUEUED,
+                                                                                  run_at__lte=timezone.now())
+                if self.names is not None:
+                    queryset = queryset.filter(name__in=self.names)
+                if saturated:
+                    queryset = queryset.exclude(name__in=saturated)
+
+                job = queryset.order_by('run_at', 'id').first()
+                if job is None:
+                    return None
+
+                job_type = registry.get(job.name)
+                if job_type is not None and job_type.concurrency is not None and not self._has_slot(job_type):
+                    saturated.add(job.name)
+                    continue
+
+                job.status = Job.STATUS_RUNNING
+                job.attempts += 1
+                job.locked_by = self.name
+                job.locked_at = timezone.now()
+                job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at'])
+                return job
+
+    def _has_slot(self, job_type):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'jobs:{job_type.name}'])
+
+        running = Job.objects.filter(name=job_type.name, status=Job.STATUS_RUNNING).count()
+        return running < job_type.concurrency
+
+    def execute(self, job):
+        job_type = registry.get(job.name)
+
+        try:
+            if job_type is None:
+                raise LookupError(f'No handler registered for job {job.name!r}.')
+            with Heartbeat(job):
+                job_type.func(**job.payload)
+        except Exception:
+            self._fail(job, traceback.format_exc())
+            return
+
+        job.status = Job.STATUS_DONE
+        job.finished_at = timezone.now()
+        job.locked_by = ''
+        job.last_error = ''
+        job.save(update_fields=['status', 'finished_at', 'locked_by', 'last_error'])
+
+    def _fail(self, job, error):
+        if job.attempts < job.max_attempts and job.name in registry:
+            job.status = Job.STATUS_QUEUED
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+            logger.warning('Job %s failed, retrying at %s.\n%s', job, job.run_at, error)
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+            logger.error('Job %s failed permanently.\n%s', job, error)
+
+        job.locked_by = ''
+        job.last_error = error
+        job.save(update_fields=['status', 'run_at', 'finished_at', 'locked_by', 'last_error'])
+
+    def requeue_stale(self):
+        """
+        Puts back jobs whose worker died while running them, running jobs refresh their lock
+        with a heartbeat.
+        """
+        now = timezone.now()
+        stale = Job.objects.filter(status=Job.STATUS_RUNNING,
+                                   locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT))
+
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(status=Job.STATUS_FAILED,
+                                                                      locked_by='',
+                                                                      finished_at=now,
+                                                                      last_error='Worker lost while running the job.')
+        requeued = stale.update(status=Job.STATUS_QUEUED, locked_by='')
+
+        if failed or requeued:
+            logger.warning('Requeued %d and failed %d stale jobs.', requeued, failed)
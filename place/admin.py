@@ -1,8 +1,29 @@
 from django.contrib import admin
 
-from place.models import PlacePhoto, Place, PlacePhotoLike
+from place.models import PlacePhoto, Place, PlacePhotoLike, DeletionTask, PlaceImport
 
 # Register your models here.
 admin.site.register(Place)
 admin.site.register(PlacePhoto)
 admin.site.register(PlacePhotoLike)
+
+
+@admin.register(DeletionTask)
+class DeletionTaskAdmin(admin.ModelAdmin):
+    list_display = ['target_type', 'target_id', 'status', 'progress', 'deleted_rows', 'total_rows',
+                    'created_at', 'finished_at']
+    list_filter = ['target_type', 'status']
+    readonly_fields = ['target_type', 'target_id', 'status', 'progress', 'deleted_rows', 'total_rows',
+                       'error', 'created_at', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PlaceImport)
+class PlaceImportAdmin(admin.ModelAdmin):
+    list_display = ['file', 'input_format', 'status', 'created_count', 'updated_count', 'failed_count',
+                    'added_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'input_format']
+    readonly_fields = ['status', 'created_count', 'updated_count', 'failed_count', 'errors', 'error',
+                       'created_at', 'started_at', 'finished_at']
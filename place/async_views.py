@@ -0,0 +1,135 @@
+from asgiref.sync import sync_to_async
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.measure import Distance
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import APIException
+
+from DigitalLurker.asyncviews import authenticate, json_response, error_response, paginate, ErrorResponse
+from DigitalLurker.fieldsets import parse_fieldset, serializer_fields
+from .caching import get_place_data, place_etag, place_photos_etag, not_modified, set_validators
+from .compact import location_precision, place_table
+from .models import Place, PlacePhoto, PlacePhotoLike
+from .representations import place_rows, place_data, place_photo_rows, place_photo_data
+from .serializers import PlaceSerializer, PlacePhotoSerializer
+
+
+async def place_retrieve(request, public_id):
+    """
+    Async version of PlaceViewSet.retrieve.
+    """
+    await authenticate(request)
+    fieldset, precision = _fieldset(request, PlaceSerializer), _query_option(location_precision, request)
+
+    etag = await sync_to_async(place_etag)(public_id, request)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    try:
+        result = await sync_to_async(get_place_data)(public_id, request, fieldset, precision)
+    except APIException as e:
+        return _exception_response(e)
+    if result is None:
+        return error_response(_('Not found.'), status=404)
+
+    data, updated_at = result
+    return not_modified(request, etag, updated_at) or set_validators(json_response(data), etag, updated_at)
+
+
+async def place_list(request):
+    """
+    Async version of PlaceViewSet.list, filtered by ?q= and ?range= with the Point header.
+    """
+    user = await authenticate(request, required=True)
+    if not user.is_staff:
+        return error_response(_('You do not have permission to perform this action.'), status=403)
+    fieldset, precision = _fieldset(request, PlaceSerializer), _query_option(location_precision, request)
+
+    queryset = Place.objects.all().order_by('id')
+
+    place_range = request.GET.get('range')
+    if place_range is not None:
+        point = request.headers.get('Point')
+        if point is None:
+            return json_response({'msg': 'Point header is missing.'}, status=400)
+
+        location = GEOSGeometry(point)
+        queryset = queryset.filter(location__distance_lt=(location, Distance(m=place_range)))
+
+    for term in request.GET.get('q', '').replace('\x00', '').replace(',', ' ').split():
+        queryset = queryset.filter(name__icontains=term)
+
+    async def serialize(places):
+        return await _represent(place_data, places, request, fieldset, precision)
+
+    return json_response(await paginate(request, place_rows(queryset, fieldset), serialize))
+
+
+async def place_photo_list(request, place_public_id):
+    """
+    Async version of PlacePhotoViewSet.list.
+    """
+    await authenticate(request)
+    fieldset, precision = _fieldset(request, PlacePhotoSerializer), _query_option(location_precision, request)
+    places = {} if _query_option(place_table, request) else None
+
+    etag = await sync_to_async(place_photos_etag)(place_public_id, request)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    place = await Place.objects.filter(public_id=place_public_id).afirst()
+    if place is None:
+        return error_response(_('Not found.'), status=404)
+
+    queryset = PlacePhoto.objects.filter(place__id=place.id).order_by('id')
+    for term in request.GET.get('q', '').replace('\x00', '').replace(',', ' ').split():
+        queryset = queryset.filter(title__icontains=term)
+
+    async def serialize(photos):
+        return await _represent(place_photo_data, photos, request, fieldset, precision, places)
+
+    data = await paginate(request, place_photo_rows(queryset, fieldset), serialize)
+    if places is not None:
+        data['places'] = list(places.values())
+    return set_validators(json_response(data), etag)
+
+
+async def place_photo_like_retrieve(request, place_public_id, photo_public_id):
+    """
+    Async version of PlacePhotoLikeViewSet.retrieve.
+    """
+    user = await authenticate(request, required=True)
+
+    exists = await PlacePhotoLike.objects.filter(owner=user, place_photo__public_id=photo_public_id).aexists()
+    return json_response({'exists': exists})
+
+
+def _fieldset(request, serializer_class):
+    try:
+        fieldset = parse_fieldset(request.GET)
+        fieldset.validate(serializer_fields(serializer_class))
+    except APIException as e:
+        raise ErrorResponse(_exception_response(e))
+    return fieldset
+
+
+def _query_option(parse, request):
+    try:
+        return parse(request.GET)
+    except APIException as e:
+        raise ErrorResponse(_exception_response(e))
+
+
+async def _represent(build, rows, request, *args):
+    # The representations query likes and experience with the sync ORM, so they are built
+    # in a worker thread.
+    try:
+        return await sync_to_async(build)(rows, request, *args)
+    except APIException as e:
+        raise ErrorResponse(_exception_response(e))
+
+
+def _exception_response(exception):
+    detail = exception.detail if isinstance(exception.detail, (dict, list)) else {'detail': exception.detail}
+    return json_response(detail, status=exception.status_code)
@@ -0,0 +1,258 @@
+"""
+Bulk import of places from CSV, GeoJSON or NDJSON files.
+
+Files are read as a stream, rows are validated and written in batches, each batch with a
+single INSERT ... ON CONFLICT in its own transaction. Rows carrying an external_id update the
+place imported with the same key before, other rows always create a place. Invalid rows are
+reported with their number and skipped, the rest of their batch is still imported.
+"""
+import codecs
+import csv
+import json
+import re
+from itertools import islice
+
+from django.contrib.gis.db.models.functions import GeoHash
+from django.contrib.gis.geos import Point
+from django.core.files.storage import default_storage
+from django.db import transaction, DatabaseError
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from jobs.queue import enqueue
+
+from .caching import bump_version
+from .models import Place, PlacePhoto, PlaceImport
+from .serializers import PlaceImportRowSerializer
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+READ_SIZE = 64 * 1024
+
+_UPDATE_FIELDS = ['name', 'description', 'experience', 'location', 'is_active', 'updated_at']
+_whitespace = re.compile(r'[\s,]*')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class InvalidRow:
+    def __init__(self, message):
+        self.message = message
+
+
+def _from_feature(feature):
+    if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+        return InvalidRow('Not a GeoJSON feature.')
+
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') != 'Point' or len(geometry.get('coordinates') or []) < 2:
+        return InvalidRow('The geometry has to be a Point.')
+
+    row = dict(feature.get('properties') or {})
+    row['longitude'], row['latitude'] = geometry['coordinates'][:2]
+    return row
+
+
+def iter_csv(file):
+    """
+    Yields the rows of a CSV file with a header of external_id, name, description, experience,
+    longitude, latitude and is_active columns.
+    """
+    for row in csv.DictReader(file):
+        # Empty cells mean missing values, not empty strings.
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+def iter_ndjson(file):
+    """
+    Yields the rows of a file with a JSON object per line, either a GeoJSON feature or a
+    flat record with longitude and latitude like the export writes them.
+    """
+    for line in file:
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield InvalidRow('Invalid JSON.')
+            continue
+
+        if isinstance(row, dict) and row.get('type') == 'Feature':
+            yield _from_feature(row)
+        elif isinstance(row, dict):
+            yield row
+        else:
+            yield InvalidRow('Expected a JSON object.')
+
+
+def iter_geojson(file):
+    """
+    Yields the rows of a GeoJSON FeatureCollection, decoding one feature at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+
+    while True:
+        index = buffer.find('"features"')
+        start = buffer.find('[', index) if index != -1 else -1
+        if start != -1:
+            position = start + 1
+            break
+
+        chunk = file.read(READ_SIZE)
+        if not chunk:
+            raise ImportFormatError('No features found, the file has to be a GeoJSON FeatureCollection.')
+        buffer += chunk
+
+    while True:
+        position = _whitespace.match(buffer, position).end()
+
+        if buffer.startswith(']', position):
+            return
+
+        try:
+            feature, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The feature is cut off at the end of the buffer.
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise ImportFormatError('The GeoJSON file is truncated or malformed.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield _from_feature(feature)
+
+
+_readers = {
+    PlaceImport.FORMAT_CSV: iter_csv,
+    PlaceImport.FORMAT_GEOJSON: iter_geojson,
+    PlaceImport.FORMAT_NDJSON: iter_ndjson,
+}
+
+
+def import_places(file, input_format, added_by, batch_size=BATCH_SIZE, progress=None):
+    """
+    Imports the places of a binary file and returns a report with the number of created,
+    updated and failed rows and the errors of the first MAX_REPORTED_ERRORS failed rows.
+    `progress` is called with the report after every batch.
+
+    Raises ImportFormatError when the file can not be read at all.
+    """
+    report = {'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    rows = enumerate(_readers[input_format](codecs.getreader('utf-8-sig')(file)), start=1)
+
+    try:
+        while batch := list(islice(rows, batch_size)):
+            _import_batch(batch, added_by, report)
+            if progress is not None:
+                progress(report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(str(e))
+
+    return report
+
+
+def _fail(report, number, errors):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': number, 'errors': errors})
+
+
+def _import_batch(batch, added_by, report):
+    places = {}
+
+    for number, row in batch:
+        if isinstance(row, InvalidRow):
+            _fail(report, number, {'non_field_errors': [row.message]})
+            continue
+
+        serializer = PlaceImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            _fail(report, number, serializer.errors)
+            continue
+
+        data = serializer.validated_data
+        external_id = data.get('external_id') or None
+        key = external_id or ('row', number)
+        if key in places:
+            # ON CONFLICT can not update the same row twice in one statement.
+            _fail(report, places[key][0], {'external_id': [f'Replaced by row {number}.']})
+
+        places[key] = number, Place(external_id=external_id,
+                                    name=data['name'],
+                                    description=data.get('description'),
+                                    experience=data['experience'],
+                                    location=Point(data['longitude'], data['latitude'], srid=4326),
+                                    is_active=data['is_active'],
+                                    added_by=added_by)
+
+    if not places:
+        return
+
+    external_ids = [key for key in places if isinstance(key, str)]
+    existing = set(Place.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True))
+
+    try:
+        with transaction.atomic():
+            Place.objects.bulk_create([place for _, place in places.values()],
+                                      update_conflicts=True,
+                                      unique_fields=['external_id'],
+                                      update_fields=_UPDATE_FIELDS)
+            if existing:
+                # Photos keep a copy of the location of their place and whether it is active
+                # (see place.signals).
+                place = Place.objects.filter(pk=OuterRef('place_id'))
+                location = Subquery(place.values('location'))
+                PlacePhoto.objects.filter(place__external_id__in=existing) \
+                    .update(location=location, geohash=GeoHash(location, precision=12),
+                            place_is_active=Subquery(place.values('is_active')))
+    except DatabaseError as e:
+        for number, _ in places.values():
+            _fail(report, number, {'non_field_errors': [str(e)]})
+        return
+
+    report['updated'] += len(existing)
+    report['created'] += len(places) - len(existing)
+
+    # bulk_create sends no signals, so cached representations of updated places are
+    # invalidated here.
+    if existing:
+        for pk, public_id in Place.objects.filter(external_id__in=existing).values_list('pk', 'public_id'):
+            bump_version('place', public_id)
+            bump_version('place-photos', pk)
+        bump_version('experience', 'all')
+
+
+def run_place_import(place_import, batch_size=BATCH_SIZE):
+    """
+    Imports the file of a PlaceImport, saving the counts after every batch.
+    """
+    place_import.status = PlaceImport.STATUS_RUNNING
+    place_import.started_at = timezone.now()
+    place_import.save(update_fields=['status', 'started_at'])
+
+    def progress(report):
+        place_import.created_count = report['created']
+        place_import.updated_count = report['updated']
+        place_import.failed_count = report['failed']
+        place_import.errors = report['errors']
+        place_import.save(update_fields=['created_count', 'updated_count', 'failed_count', 'errors'])
+
+    try:
+        with default_storage.open(place_import.file.name, 'rb') as file:
+            import_places(file, place_import.input_format, place_import.added_by, batch_size, progress)
+    except ImportFormatError as e:
+        place_import.status = PlaceImport.STATUS_FAILED
+        place_import.error = str(e)
+    else:
+        place_import.status = PlaceImport.STATUS_DONE
+
+    place_import.finished_at = timezone.now()
+    place_import.save(update_fields=['status', 'error', 'finished_at'])
+
+    # bulk_create sends no signals, the neighbours of the imported places are rebuilt at once.
+    if place_import.created_count or place_import.updated_count:
+        enqueue('place.rebuild_neighbours')
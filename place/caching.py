@@ -0,0 +1,248 @@
+"""
+Cache of the serialized place and photo detail responses, and their ETags.
+
+Only the part of a representation that is the same for every client is cached; `distance`
+and `liked` are filled in per request. Every object has a version in the cache that is bumped
+after a transaction changing it commits (see place.signals). Places are versioned by public_id,
+photos, users and the photo lists of places by primary key, and a global `experience` version
+covers the experience of users, which depends on places they took photos of. A cached
+representation stores the versions of everything it was built from and is ignored once any of
+them changed, so nothing has to be deleted on writes. Versions are read before the database,
+so a representation built from data older than a version bump always carries the old version.
+
+ETags are derived from the same versions plus whatever else the response depends on, which
+lets conditional requests be answered without touching the database.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers, patch_cache_control
+from django.utils.http import http_date
+
+from DigitalLurker.db.replicas import use_replica
+from DigitalLurker.fieldsets import ALL
+from .compact import coordinates
+from .models import Place, PlacePhoto, PlacePhotoLike
+from .serializers import PlaceSerializer, PlacePhotoSerializer, get_distance
+
+EXPERIENCE_VERSION = 'version:experience:all'
+
+
+def version_key(kind, key):
+    return f'version:{kind}:{key}'
+
+
+def bump_version(kind, key):
+    key = version_key(kind, key)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _current_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Starting from the clock keeps a version that was evicted from being reused.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def _entry_key(kind, public_id, request):
+    # File fields are serialized as absolute URLs, which depend on the host of the request.
+    return f'object:{kind}:{public_id}:{request.build_absolute_uri("/")}'
+
+
+def _get_fresh(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    versions = cache.get_many(list(entry['versions']))
+    if versions != entry['versions']:
+        return None
+    return entry
+
+
+def _photo_dependencies(public_id):
+    """
+    Returns the primary key, place public_id and owner primary key of a photo, None if it does
+    not exist. They never change, so they are cached to know which versions to read before
+    the photo itself is loaded.
+    """
+    key = f'dependencies:photo:{public_id}'
+    dependencies = cache.get(key)
+    if dependencies is None:
+        with use_replica(False):
+            dependencies = PlacePhoto.objects.filter(public_id=public_id) \
+                .values_list('pk', 'place__public_id', 'owner_id').first()
+        if dependencies is None:
+            return None
+        cache.set(key, dependencies, None)
+    return dependencies
+
+
+def _photo_version_keys(dependencies):
+    photo_pk, place_public_id, owner_pk = dependencies
+    return [version_key('photo', photo_pk),
+            version_key('place', place_public_id),
+            version_key('user', owner_pk),
+            EXPERIENCE_VERSION]
+
+
+def _place_pk(public_id):
+    key = f'pk:place:{public_id}'
+    pk = cache.get(key)
+    if pk is None:
+        with use_replica(False):
+            pk = Place.objects.filter(public_id=public_id).values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        cache.set(key, pk, None)
+    return pk
+
+
+def get_place_data(public_id, request, fieldset=ALL, precision=None):
+    """
+    Returns the representation of PlaceSerializer for the place, limited to `fieldset` and
+    with the location as coordinates rounded to `precision` if given, and the time it was
+    last modified, None if it does not exist.
+    """
+    key = _entry_key('place', public_id, request)
+    entry = _get_fresh(key)
+
+    if entry is None:
+        versions = _current_versions([version_key('place', public_id)])
+        # Built from the primary, a lagging replica could return data older than the versions.
+        with use_replica(False):
+            place = Place.objects.filter(public_id=public_id).first()
+            if place is None:
+                return None
+            data = PlaceSerializer(place, context={'request': request}).data
+
+        entry = {'versions': versions, 'data': dict(data), 'updated_at': place.updated_at}
+        cache.set(key, entry, settings.OBJECT_CACHE_TIMEOUT)
+
+    data = entry['data']
+    if 'distance' in fieldset:
+        data['distance'] = get_distance(data['location'], request)
+    if precision is not None:
+        data['location'] = coordinates(data['location'], precision)
+    return fieldset.select(data), entry['updated_at']
+
+
+def get_place_photo_data(public_id, request, fieldset=ALL, precision=None):
+    """
+    Returns the representation of PlacePhotoSerializer for the photo like get_place_data,
+    None if it does not exist.
+    """
+    key = _entry_key('photo', public_id, request)
+    entry = _get_fresh(key)
+
+    if entry is None:
+        dependencies = _photo_dependencies(public_id)
+        if dependencies is None:
+            return None
+
+        versions = _current_versions(_photo_version_keys(dependencies))
+        with use_replica(False):
+            photo = PlacePhoto.objects.select_related('place', 'owner').filter(public_id=public_id).first()
+            if photo is None:
+                return None
+            data = PlacePhotoSerializer(photo, context={'request': request}).data
+
+        entry = {'versions': versions, 'data': dict(data), 'pk': photo.pk}
+        cache.set(key, entry, settings.OBJECT_CACHE_TIMEOUT)
+
+    data = entry['data']
+    user = request.user
+    if 'liked' in fieldset:
+        data['liked'] = user is not None and user.is_authenticated and \
+            PlacePhotoLike.objects.filter(owner=user, place_photo_id=entry['pk']).exists()
+
+    place = fieldset.nested('place') if 'place' in fieldset else None
+    if place is not None and 'distance' in place:
+        data['place']['distance'] = get_distance(data['place']['location'], request)
+    if place is not None and precision is not None:
+        data['place']['location'] = coordinates(data['place']['location'], precision)
+    return fieldset.select(data)
+
+
+def _etag(version_keys, *parts):
+    versions = _current_versions(version_keys)
+    value = repr([versions[key] for key in version_keys] + list(parts))
+    return '"%s"' % hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def _user_pk(request):
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _output_parameters(request):
+    # Query parameters selecting the fields and format of a representation.
+    return [request.GET.get(name) for name in ('fields', 'expand', 'location', 'precision')]
+
+
+def place_etag(public_id, request):
+    return _etag([version_key('place', public_id)], request.headers.get('Point'), *_output_parameters(request))
+
+
+def place_photo_etag(public_id, request):
+    """
+    Returns the ETag of a photo detail response, None if the photo does not exist.
+    """
+    dependencies = _photo_dependencies(public_id)
+    if dependencies is None:
+        return None
+    return _etag(_photo_version_keys(dependencies),
+                 _user_pk(request),
+                 request.headers.get('Point'),
+                 *_output_parameters(request))
+
+
+def place_photos_etag(place_public_id, request):
+    """
+    Returns the ETag of a page of the photo list of a place, None if the place does not exist.
+    """
+    place_pk = _place_pk(place_public_id)
+    if place_pk is None:
+        return None
+    return _etag([version_key('place-photos', place_pk), EXPERIENCE_VERSION],
+                 _user_pk(request),
+                 request.headers.get('Point'),
+                 request.get_full_path())
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Returns a 304 response if the conditional headers of a GET request match, None otherwise.
+    """
+    if etag is None or request.method != 'GET':
+        return None
+
+    response = get_conditional_response(request,
+                                        etag=etag,
+                                        last_modified=last_modified and int(last_modified.timestamp()))
+    if isinstance(response, HttpResponseNotModified):
+        return set_validators(response, etag, last_modified)
+    return None
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Adds the ETag and Last-Modified headers. Clients have to revalidate before reusing the
+    response, because the versions change without the URL changing.
+    """
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Point'])
+    return response
@@ -0,0 +1,68 @@
+"""
+Compact output of place payloads, selected with query parameters of GET requests.
+
+?location=coordinates returns locations as [longitude, latitude] arrays rounded to
+?precision= decimals (LOCATION_PRECISION by default) instead of EWKT strings.
+?places=table returns photo lists with every embedded place once per page, in a `places`
+list next to the results, which reference them by public_id.
+"""
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+MAX_PRECISION = 15
+
+
+def location_precision(query_params):
+    """
+    Returns the number of decimals of compact locations, None for EWKT strings.
+    """
+    location = query_params.get('location', 'wkt')
+    if location not in ('wkt', 'coordinates'):
+        raise ValidationError({'location': _('Use wkt or coordinates.')})
+    if location == 'wkt':
+        return None
+
+    try:
+        precision = int(query_params.get('precision', settings.LOCATION_PRECISION))
+    except ValueError:
+        precision = -1
+    if not 0 <= precision <= MAX_PRECISION:
+        raise ValidationError({'precision': _('Use a number from 0 to %d.') % MAX_PRECISION})
+    return precision
+
+
+def place_table(query_params):
+    """
+    Returns whether places of photo lists go to a separate `places` list.
+    """
+    places = query_params.get('places', 'embed')
+    if places not in ('embed', 'table'):
+        raise ValidationError({'places': _('Use embed or table.')})
+    return places == 'table'
+
+
+def coordinates(location, precision):
+    """
+    Returns [longitude, latitude] of a point or its EWKT, rounded to `precision` decimals.
+    """
+    if isinstance(location, str):
+        location = GEOSGeometry(location)
+    return [round(location.x, precision), round(location.y, precision)]
+
+
+class CompactOutputMixin:
+    """
+    View mixin passing the location precision of GET requests to the serializer context.
+    """
+    @cached_property
+    def location_precision(self):
+        if self.request.method != 'GET':
+            return None
+        return location_precision(self.request.query_params)
+
+    def get_serializer_context(self):
+        return super().get_serializer_context() | {'location_precision': self.location_precision}
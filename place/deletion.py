@@ -0,0 +1,129 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from place.models import Place, PlacePhoto, PlacePhotoLike, DeletionTask
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def schedule_user_deletion(user):
+    """
+    Deactivates the user immediately and queues the removal of the account and its content.
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        user.is_active = False
+        return _create_task(DeletionTask.TARGET_USER, user.pk)
+
+
+def schedule_place_deletion(place):
+    """
+    Deactivates the place immediately and queues the removal of the place and its photos.
+    """
+    with transaction.atomic():
+        Place.objects.filter(pk=place.pk).update(is_active=False, updated_at=timezone.now())
+        PlacePhoto.objects.filter(place=place).update(place_is_active=False)
+        place.is_active = False
+        enqueue('place.refresh_neighbours', place_id=place.pk)
+        return _create_task(DeletionTask.TARGET_PLACE, place.pk)
+
+
+def _create_task(target_type, target_id):
+    task = DeletionTask.objects.filter(target_type=target_type,
+                                       target_id=target_id,
+                                       status__in=[DeletionTask.STATUS_PENDING, DeletionTask.STATUS_RUNNING]).first()
+    if task is None:
+        task = DeletionTask.objects.create(target_type=target_type, target_id=target_id)
+        enqueue('place.run_deletion_task', task_id=task.pk)
+    return task
+
+
+def run_deletion_task(task, batch_size=BATCH_SIZE):
+    """
+    Removes the target of the task and all dependent rows in batches.
+
+    Every batch is committed separately, so a failed task can simply be run again
+    and continues with whatever is left.
+    """
+    steps = _steps(task)
+
+    task.status = DeletionTask.STATUS_RUNNING
+    task.started_at = timezone.now()
+    task.total_rows = task.deleted_rows + sum(queryset.count() for queryset, _ in steps)
+    task.error = ''
+    task.save(update_fields=['status', 'started_at', 'total_rows', 'error'])
+
+    try:
+        for queryset, file_field in steps:
+            _delete_in_batches(task, queryset, file_field, batch_size)
+    except Exception as e:
+        task.status = DeletionTask.STATUS_FAILED
+        task.error = repr(e)
+        task.save(update_fields=['status', 'error'])
+        raise
+
+    task.status = DeletionTask.STATUS_DONE
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'finished_at'])
+
+
+def _steps(task):
+    """
+    Returns (queryset, file field name) pairs ordered so that every step only
+    removes rows nothing else points at anymore. The querysets do not overlap, so their
+    counts add up to the rows the task deletes.
+    """
+    if task.target_type == DeletionTask.TARGET_PLACE:
+        place_id = task.target_id
+        return [
+            (PlacePhotoLike.objects.filter(place_photo__place_id=place_id), None),
+            (PlacePhoto.objects.filter(place_id=place_id), 'image'),
+            (Place.objects.filter(pk=place_id), 'main_image'),
+        ]
+
+    user_id = task.target_id
+    return [
+        (PlacePhotoLike.objects.filter(owner_id=user_id), None),
+        (PlacePhotoLike.objects.filter(place_photo__owner_id=user_id).exclude(owner_id=user_id), None),
+        (PlacePhotoLike.objects.filter(place_photo__place__added_by_id=user_id)
+         .exclude(owner_id=user_id).exclude(place_photo__owner_id=user_id), None),
+        (PlacePhoto.objects.filter(owner_id=user_id), 'image'),
+        (PlacePhoto.objects.filter(place__added_by_id=user_id).exclude(owner_id=user_id), 'image'),
+        (Place.objects.filter(added_by_id=user_id), 'main_image'),
+        (User.objects.filter(pk=user_id), 'pfp'),
+    ]
+
+
+def _delete_in_batches(task, queryset, file_field, batch_size):
+    model = queryset.model
+    columns = ['pk', file_field] if file_field else ['pk']
+    default = model._meta.get_field(file_field).default if file_field else None
+
+    while True:
+        batch = list(queryset.order_by('pk').values_list(*columns)[:batch_size])
+        if not batch:
+            return
+
+        with transaction.atomic():
+            # Rows removed by cascades, e.g. the contributors of a place, are not counted.
+            deleted = model.objects.filter(pk__in=[row[0] for row in batch]).delete()[1].get(model._meta.label, 0)
+
+            if file_field:
+                names = [row[1] for row in batch if row[1] and row[1] != default]
+                transaction.on_commit(partial(_delete_files, names))
+
+        DeletionTask.objects.filter(pk=task.pk).update(deleted_rows=F('deleted_rows') + deleted)
+        task.deleted_rows += deleted
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
@@ -0,0 +1,114 @@
+"""
+Streaming export of the place catalogue as NDJSON or a GeoJSON FeatureCollection.
+
+Rows are read with a server-side cursor in chunks and written out chunk by chunk, so memory
+use does not depend on the number of places.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.gis.geos import Polygon
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Place
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+}
+
+_FIELDS = ['public_id', 'external_id', 'name', 'description', 'main_image', 'experience', 'is_active',
+           'updated_at', 'added_by__public_id']
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def parse_bbox(value):
+    """
+    Returns the polygon for a "min_lon,min_lat,max_lon,max_lat" string. Raises ValueError.
+    """
+    coordinates = [float(coordinate) for coordinate in value.split(',')]
+    if len(coordinates) != 4:
+        raise ValueError(value)
+
+    polygon = Polygon.from_bbox(coordinates)
+    polygon.srid = 4326
+    return polygon
+
+
+def export_queryset(queryset=None, bbox=None, is_active=None):
+    queryset = Place.objects.all() if queryset is None else queryset
+    if bbox is not None:
+        queryset = queryset.filter(location__within=bbox)
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    return queryset.order_by('id').values(*_FIELDS, 'location')
+
+
+def _records(queryset, chunk_size):
+    for row in queryset.iterator(chunk_size=chunk_size):
+        location = row.pop('location')
+        row['added_by'] = row.pop('added_by__public_id')
+        yield row, [location.x, location.y]
+
+
+def iter_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields one JSON object per place and line, with the location as longitude and latitude.
+    """
+    lines = []
+    for record, (longitude, latitude) in _records(queryset, chunk_size):
+        record['longitude'], record['latitude'] = longitude, latitude
+        lines.append(_encoder.encode(record))
+
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_geojson(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields a GeoJSON FeatureCollection with a Point feature per place.
+    """
+    yield '{"type":"FeatureCollection","features":['
+
+    features = []
+    separator = ''
+    for record, coordinates in _records(queryset, chunk_size):
+        features.append(_encoder.encode({'type': 'Feature',
+                                         'id': record['public_id'],
+                                         'geometry': {'type': 'Point', 'coordinates': coordinates},
+                                         'properties': record}))
+
+        if len(features) == chunk_size:
+            yield separator + ','.join(features)
+            features = []
+            separator = ','
+
+    if features:
+        yield separator + ','.join(features)
+    yield ']}\n'
+
+
+def iter_export(output, queryset, chunk_size=CHUNK_SIZE):
+    if output == 'geojson':
+        return iter_geojson(queryset, chunk_size)
+    return iter_ndjson(queryset, chunk_size)
+
+
+async def aiter_export(output, queryset, chunk_size=CHUNK_SIZE):
+    """
+    iter_export for ASGI requests, Django's ASGI handler reads sync iterators whole before
+    sending them. The chunks are built one at a time in the thread of the sync views, where
+    the cursor stays open.
+    """
+    chunks = iter_export(output, queryset, chunk_size)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,109 @@
+"""
+Geohashes of locations, as stored on photos for the nearby feed (see place.nearby).
+
+A geohash names a cell of a grid by interleaving the bits of the longitude and latitude, so
+all locations in a cell share the prefix of its geohash and the cells of a prefix are close
+to each other. The encoding is the same as PostGIS' ST_GeoHash.
+"""
+from math import cos, hypot, radians
+
+ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_PRECISION = 12
+
+# Meters per degree of latitude, and of longitude at the equator.
+_METERS_PER_DEGREE = 111320
+
+
+def encode(latitude, longitude, precision=MAX_PRECISION):
+    latitudes, longitudes = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(geohash) < precision:
+        interval, value = (longitudes, longitude) if even else (latitudes, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = bits << 1 | 1
+            interval[0] = middle
+        else:
+            bits = bits << 1
+            interval[1] = middle
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """
+    Returns the height and width of the cells of a precision, in degrees.
+    """
+    latitude_bits = 5 * precision // 2
+    return 180 / 2 ** latitude_bits, 360 / 2 ** (5 * precision - latitude_bits)
+
+
+def max_offset(precision, latitude):
+    """
+    Returns the largest distance in meters between a location at `latitude` and the center of
+    its cell of a precision, half the diagonal of the cell.
+    """
+    height, width = cell_size(precision)
+    return hypot(height * _METERS_PER_DEGREE, width * _METERS_PER_DEGREE * cos(radians(latitude))) / 2
+
+
+def bounds(geohash):
+    """
+    Returns the south, north, west and east edges of the cell of a geohash.
+    """
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for char in geohash:
+        bits = ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bit = bits >> shift & 1
+            if even:
+                middle = (west + east) / 2
+                west, east = (middle, east) if bit else (west, middle)
+            else:
+                middle = (south + north) / 2
+                south, north = (middle, north) if bit else (south, middle)
+            even = not even
+    return south, north, west, east
+
+
+def center(geohash):
+    """
+    Returns the latitude and longitude of the center of the cell of a geohash.
+    """
+    south, north, west, east = bounds(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+
+def covering_cells(latitude, longitude, radius):
+    """
+    Returns the geohashes of the cell of a location and its neighbours, at the finest precision
+    whose cells are at least `radius` meters high and wide, so together they cover every
+    location within the radius. Returns None when even the coarsest cells are too small, near
+    the poles.
+    """
+    for precision in range(MAX_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if height * _METERS_PER_DEGREE >= radius and \
+                width * _METERS_PER_DEGREE * cos(radians(latitude)) >= radius:
+            break
+    else:
+        return None
+
+    cells = set()
+    for row in (-1, 0, 1):
+        cell_latitude = latitude + row * height
+        if not -90 <= cell_latitude <= 90:
+            continue
+        for column in (-1, 0, 1):
+            cell_longitude = (longitude + column * width + 180) % 360 - 180
+            cells.add(encode(cell_latitude, cell_longitude, precision))
+    return sorted(cells)
@@ -0,0 +1,36 @@
+from jobs.queue import job
+from place import neighbours, trending
+from place.bulk_import import run_place_import
+from place.deletion import run_deletion_task
+from place.models import DeletionTask, PlaceImport
+
+
+@job('place.run_deletion_task', max_attempts=10, concurrency=2)
+def run_deletion(task_id):
+    task = DeletionTask.objects.filter(pk=task_id).exclude(status=DeletionTask.STATUS_DONE).first()
+    if task is not None:
+        run_deletion_task(task)
+
+
+# Not retried, rows without an external_id would be imported twice.
+@job('place.run_import', max_attempts=1)
+def run_import(place_import_id):
+    place_import = PlaceImport.objects.filter(pk=place_import_id, status=PlaceImport.STATUS_PENDING).first()
+    if place_import is not None:
+        run_place_import(place_import)
+
+
+# One at a time, concurrent refreshes could replace the same lists.
+@job('place.refresh_neighbours', max_attempts=3, concurrency=1)
+def refresh_neighbours(place_id=None, place_ids=()):
+    neighbours.refresh(place_id, place_ids)
+
+
+@job('place.rebuild_neighbours', max_attempts=1, concurrency=1)
+def rebuild_neighbours():
+    neighbours.rebuild()
+
+
+@job('place.rescale_trending', max_attempts=3, concurrency=1)
+def rescale_trending():
+    trending.rescale()
@@ -0,0 +1,129 @@
+import heapq
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models.functions import Collate
+
+
+class Command(BaseCommand):
+    help = ('Deletes files from MEDIA_ROOT that are not referenced by any file field. '
+            'Files and references are both walked in sorted order, so memory usage does not '
+            'depend on the number of files.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report orphaned files, do not delete them.')
+        parser.add_argument('--grace-period', type=int, default=60 * 60,
+                            help='Skip files modified less than this many seconds ago (in-flight uploads).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows fetched per database round trip and files deleted per batch.')
+        parser.add_argument('--sleep', type=float, default=0.5,
+                            help='Seconds to wait between deletion batches.')
+        parser.add_argument('--exclude', action='append', default=['defaults/'],
+                            help='Path prefix that is never collected. Can be given multiple times.')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['grace_period']
+        excluded = tuple(options['exclude'])
+        batch_size = options['batch_size']
+
+        files = iter_media_files(settings.MEDIA_ROOT)
+        referenced = iter_referenced_names(batch_size)
+
+        orphan_count = orphan_bytes = 0
+        batch = []
+
+        for name, stat in iter_orphans(files, referenced):
+            if name.startswith(excluded) or stat.st_mtime > cutoff:
+                continue
+
+            orphan_count += 1
+            orphan_bytes += stat.st_size
+
+            if options['verbosity'] >= 2:
+                self.stdout.write(name)
+
+            if options['dry_run']:
+                continue
+
+            batch.append(name)
+            if len(batch) >= batch_size:
+                self._delete(batch, options['sleep'])
+                batch = []
+
+        if batch:
+            self._delete(batch, 0)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {orphan_count} orphaned files ({orphan_bytes} bytes).'))
+
+    def _delete(self, names, pause):
+        for name in names:
+            default_storage.delete(name)
+
+        if pause:
+            time.sleep(pause)
+
+
+def iter_media_files(root, prefix=''):
+    """
+    Yields (relative name, stat) for every file under root, in the same byte order
+    as ORDER BY ... COLLATE "C" returns storage names.
+    """
+    with os.scandir(root) as entries:
+        entries = sorted(((entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+                          for entry in entries),
+                         key=lambda item: item[0])
+
+    for sort_key, entry in entries:
+        if sort_key.endswith('/'):
+            yield from iter_media_files(entry.path, prefix + sort_key)
+        elif entry.is_file(follow_symlinks=False):
+            yield prefix + entry.name, entry.stat(follow_symlinks=False)
+
+
+def iter_referenced_names(batch_size):
+    """
+    Yields every distinct name stored in a file field of any installed model, in sorted order.
+    """
+    columns = []
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                columns.append(_iter_column(model, field, batch_size))
+
+    last = None
+    for name in heapq.merge(*columns):
+        if name != last:
+            yield name
+            last = name
+
+
+def _iter_column(model, field, batch_size):
+    queryset = (model._base_manager
+                .exclude(**{f'{field.attname}__isnull': True})
+                .exclude(**{field.attname: ''})
+                .annotate(media_name=Collate(field.attname, 'C'))
+                .order_by('media_name')
+                .values_list('media_name', flat=True))
+
+    return queryset.iterator(chunk_size=batch_size)
+
+
+def iter_orphans(files, referenced):
+    """
+    Merge-joins two sorted streams and yields the files that have no reference.
+    """
+    current = next(referenced, None)
+
+    for name, stat in files:
+        while current is not None and current < name:
+            current = next(referenced, None)
+
+        if current != name:
+            yield name, stat
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from place.export import FORMATS, CHUNK_SIZE, parse_bbox, export_queryset, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Writes all places as NDJSON or a GeoJSON FeatureCollection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--file', help='File to write to instead of standard output.')
+        parser.add_argument('--bbox', help='Only places within min_lon,min_lat,max_lon,max_lat.')
+        parser.add_argument('--active', dest='is_active', action='store_true', default=None,
+                            help='Only active places.')
+        parser.add_argument('--inactive', dest='is_active', action='store_false',
+                            help='Only inactive places.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Number of rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        bbox = None
+        if options['bbox']:
+            try:
+                bbox = parse_bbox(options['bbox'])
+            except ValueError:
+                raise CommandError('--bbox has to be min_lon,min_lat,max_lon,max_lat.')
+
+        queryset = export_queryset(bbox=bbox, is_active=options['is_active'])
+        chunks = iter_export(options['output_format'], queryset, options['chunk_size'])
+
+        if options['file']:
+            with open(options['file'], 'w', encoding='utf-8') as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
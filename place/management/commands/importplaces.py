@@ -0,0 +1,46 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from place.bulk_import import import_places, ImportFormatError, BATCH_SIZE
+from place.models import PlaceImport
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports places from a CSV, GeoJSON or NDJSON file, updating places with a known external_id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--added-by', required=True,
+                            help='Username of the user the new places are added by.')
+        parser.add_argument('--input-format', choices=[choice for choice, _ in PlaceImport.FORMAT_CHOICES],
+                            help='Format of the file, guessed from its extension by default.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of rows written per transaction.')
+
+    def handle(self, *args, **options):
+        input_format = options['input_format'] or PlaceImport.format_for_name(options['path'])
+        if input_format is None:
+            raise CommandError('Unknown file type, use --input-format.')
+
+        added_by = User.objects.filter(username=options['added_by']).first()
+        if added_by is None:
+            raise CommandError(f'There is no user {options["added_by"]}.')
+
+        def progress(report):
+            self.stderr.write(f'{report["created"]} created, {report["updated"]} updated, '
+                              f'{report["failed"]} failed')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_places(file, input_format, added_by, options['batch_size'], progress)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f'row {error["row"]}: {json.dumps(error["errors"])}')
+        self.stdout.write(f'{report["created"]} places created, {report["updated"]} updated, '
+                          f'{report["failed"]} rows failed.')
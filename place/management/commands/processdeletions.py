@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from place.deletion import run_deletion_task, BATCH_SIZE
+from place.models import DeletionTask
+
+
+class Command(BaseCommand):
+    help = 'Removes users and places whose deletion was requested, together with their dependent rows and media.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of rows removed per transaction.')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Also run tasks that failed before.')
+
+    def handle(self, *args, **options):
+        statuses = [DeletionTask.STATUS_PENDING]
+        if options['retry_failed']:
+            statuses.append(DeletionTask.STATUS_FAILED)
+
+        for task in DeletionTask.objects.filter(status__in=statuses).order_by('created_at'):
+            try:
+                run_deletion_task(task, batch_size=options['batch_size'])
+            except Exception as e:
+                self.stderr.write(f'{task} failed: {e!r}')
+                continue
+
+            self.stdout.write(f'{task}: removed {task.deleted_rows} rows.')
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from place.models import PlaceTombstone
+
+
+class Command(BaseCommand):
+    help = 'Removes tombstones of deleted places that are older than any sync cursor still accepted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.PLACE_TOMBSTONE_RETENTION_DAYS,
+                            help='Age in days of the tombstones to remove.')
+
+    def handle(self, *args, **options):
+        deleted, _ = PlaceTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=options['days'])).delete()
+        self.stdout.write(f'Removed {deleted} tombstones.')
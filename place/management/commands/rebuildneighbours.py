@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from place.neighbours import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the nearest places stored for every active place.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of places fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['chunk_size'])
+        self.stdout.write(f'Rebuilt the neighbours of {count} places.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from place.summary import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recounts the photos, contributors and top photos of every place and corrects wrong summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of places recounted in one transaction.')
+
+    def handle(self, *args, **options):
+        corrected = reconcile(options['batch_size'])
+        self.stdout.write(f'Corrected the summaries of {corrected} places.')
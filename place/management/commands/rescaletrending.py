@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from place.trending import rescale
+
+
+class Command(BaseCommand):
+    help = 'Moves the landmark of trending scores to now and scales the scores of photos to it.'
+
+    def handle(self, *args, **options):
+        updated = rescale()
+        self.stdout.write(f'Rescaled the trending scores of {updated} photos.')
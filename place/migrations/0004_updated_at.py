@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0003_deletiontask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='placephoto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-19 12:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.UUIDField(unique=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='place_tombstone_deleted_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['updated_at', 'id'], name='place_place_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:05
+
+import DigitalLurker.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('place', '0005_place_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='PlaceImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to=DigitalLurker.utils.uuid_upload_to)),
+                ('input_format', models.CharField(choices=[('csv', 'CSV'), ('geojson', 'GeoJSON'), ('ndjson', 'NDJSON')], max_length=16)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('created_count', models.IntegerField(default=0)),
+                ('updated_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('added_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
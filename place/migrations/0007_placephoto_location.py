@@ -0,0 +1,46 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:10
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0006_place_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placephoto',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='placephoto',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='placephoto',
+            name='geohash',
+            field=models.CharField(blank=True, db_collation='C', default='', max_length=12),
+        ),
+        # Existing photos get their last update as creation time and the location of their place.
+        migrations.RunSQL(
+            sql='UPDATE place_placephoto AS photo '
+                'SET created_at = photo.updated_at, location = place.location, '
+                'geohash = ST_GeoHash(place.location, 12) '
+                'FROM place_place AS place WHERE place.id = photo.place_id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['geohash', '-created_at', '-id'], name='place_photo_geohash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['-created_at', '-id'], name='place_photo_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0007_placephoto_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingLandmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('landmark', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='placephotolike',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='placephoto',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='placephoto',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        # Existing likes count as given now, at the landmark, where every like weighs 1.
+        migrations.RunSQL(
+            sql=['INSERT INTO place_trendinglandmark (id, landmark) VALUES (1, now())',
+                 'UPDATE place_placephoto AS photo SET like_count = likes.count, trending_score = likes.count '
+                 'FROM (SELECT place_photo_id, count(*) AS count FROM place_placephotolike GROUP BY place_photo_id) '
+                 'AS likes WHERE likes.place_photo_id = photo.id'],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['-trending_score', '-id'], name='place_photo_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['place', '-trending_score', '-id'], name='place_photo_place_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('place', '0008_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='photo_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='contributor_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='top_photos',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='PlaceContributor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('photo_count', models.IntegerField(default=0)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='place.place')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('place', 'user'), name='place_contributor_unique')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['place', '-like_count', 'id'], name='place_photo_place_top_idx'),
+        ),
+        migrations.RunSQL(
+            sql=['INSERT INTO place_placecontributor (place_id, user_id, photo_count) '
+                 'SELECT place_id, owner_id, count(*) FROM place_placephoto GROUP BY place_id, owner_id',
+                 'UPDATE place_place AS place SET photo_count = photos.photo_count, '
+                 'contributor_count = photos.contributor_count '
+                 'FROM (SELECT place_id, count(*) AS photo_count, count(DISTINCT owner_id) AS contributor_count '
+                 'FROM place_placephoto GROUP BY place_id) AS photos WHERE photos.place_id = place.id',
+                 "UPDATE place_place AS place SET top_photos = top.photos FROM ("
+                 "SELECT place_id, jsonb_agg(jsonb_build_object('public_id', public_id, 'image', image, "
+                 "'title', title, 'like_count', like_count) ORDER BY like_count DESC, id) AS photos "
+                 "FROM (SELECT *, row_number() OVER (PARTITION BY place_id ORDER BY like_count DESC, id) AS rank "
+                 "FROM place_placephoto) AS ranked WHERE rank <= 3 GROUP BY place_id) AS top "
+                 "WHERE top.place_id = place.id"],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
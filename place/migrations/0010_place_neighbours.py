@@ -0,0 +1,38 @@
+# Generated by Django 4.2.5 on 2026-10-19 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0009_place_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='neighbour_radius',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['neighbour_radius'], name='place_place_neighbour_idx'),
+        ),
+        migrations.CreateModel(
+            name='PlaceNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('distance', models.FloatField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                related_name='neighbour_of', to='place.place')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='neighbours', to='place.place')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('place', 'rank'), name='place_neighbour_unique')],
+            },
+        ),
+    ]
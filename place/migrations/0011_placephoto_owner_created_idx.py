@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-19 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('place', '0010_place_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='placephoto',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='place_photo_owner_created_idx'),
+        ),
+    ]
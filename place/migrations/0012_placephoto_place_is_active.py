@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0011_placephoto_owner_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placephoto',
+            name='place_is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunSQL(
+            sql='UPDATE place_placephoto AS photo SET place_is_active = place.is_active '
+                'FROM place_place AS place WHERE place.id = photo.place_id AND NOT place.is_active',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
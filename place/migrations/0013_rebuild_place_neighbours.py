@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:40
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def enqueue_rebuild(apps, schema_editor):
+    # Places without a neighbour_radius count as affected by every change (see
+    # place.neighbours.reaching), so the lists of existing places are built once by the worker.
+    Place = apps.get_model('place', 'Place')
+    Job = apps.get_model('jobs', 'Job')
+    if Place.objects.filter(is_active=True, neighbour_radius__isnull=True).exists():
+        Job.objects.create(name='place.rebuild_neighbours', payload={}, run_at=timezone.now(), max_attempts=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+        ('place', '0012_placephoto_place_is_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(enqueue_rebuild, migrations.RunPython.noop),
+    ]
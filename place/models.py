@@ -1,14 +1,16 @@
 import uuid
+from math import floor
 
 from django.contrib.auth import get_user_model
 from django.contrib.gis.db import models
+from django.utils import timezone
 
-from DigitalLurker.utils import uuid_upload_to
+from DigitalLurker.utils import uuid_upload_to, MaintainedFieldsMixin
 
 User = get_user_model()
 
 
-class Place(models.Model):
+class Place(MaintainedFieldsMixin, models.Model):
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     name = models.TextField(max_length=64)
     description = models.TextField(max_length=256, null=True)
@@ -20,18 +22,94 @@ class Place(models.Model):
     location = models.PointField(null=False, blank=False)
     is_active = models.BooleanField(default=True)
     experience = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+    # Key of the place in the source it was imported from, used to update it on later imports.
+    external_id = models.CharField(max_length=128, unique=True, null=True, blank=True)
+    # Summary of the photos of the place, kept up to date by place.summary.
+    photo_count = models.IntegerField(default=0)
+    contributor_count = models.IntegerField(default=0)
+    top_photos = models.JSONField(default=list, blank=True)
+    # Distance in meters to the farthest of the stored neighbours (see place.neighbours), null
+    # while the place has fewer than PLACE_NEIGHBOURS of them.
+    neighbour_radius = models.FloatField(null=True, blank=True)
+
+    maintained_fields = ('photo_count', 'contributor_count', 'top_photos', 'neighbour_radius')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='place_place_updated_idx'),
+            models.Index(fields=['neighbour_radius'], name='place_place_neighbour_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class PlacePhoto(models.Model):
+class PlaceNeighbour(models.Model):
+    """
+    One of the nearest active places of a place, `rank` 0 being the nearest.
+    """
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='neighbour_of')
+    rank = models.PositiveSmallIntegerField()
+    # Meters.
+    distance = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['place', 'rank'], name='place_neighbour_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.neighbour.name} near {self.place.name}'
+
+
+class PlaceTombstone(models.Model):
+    """
+    Remembers a deleted place, so clients syncing changes (see place.sync) learn about it.
+    """
+    public_id = models.UUIDField(unique=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='place_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.public_id)
+
+
+class PlacePhoto(MaintainedFieldsMixin, models.Model):
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     place = models.ForeignKey(Place, on_delete=models.CASCADE)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='my_place_photos')
     image = models.ImageField(upload_to=uuid_upload_to('place_photos'))
     title = models.CharField(max_length=64, null=False)
     description = models.CharField(max_length=256, null=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Copies of the location of the place, its geohash and whether it is active, kept up to
+    # date by place.signals, which let the nearby feed (see place.nearby) read photos without
+    # joining places. The C collation lets geohash prefixes use the index.
+    location = models.PointField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_collation='C')
+    place_is_active = models.BooleanField(default=True)
+    # Kept up to date as likes are added and removed (see place.trending).
+    like_count = models.IntegerField(default=0)
+    trending_score = models.FloatField(default=0)
+
+    maintained_fields = ('location', 'geohash', 'place_is_active', 'like_count', 'trending_score')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['geohash', '-created_at', '-id'], name='place_photo_geohash_idx'),
+            models.Index(fields=['-created_at', '-id'], name='place_photo_created_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='place_photo_owner_created_idx'),
+            models.Index(fields=['-trending_score', '-id'], name='place_photo_trending_idx'),
+            models.Index(fields=['place', '-trending_score', '-id'], name='place_photo_place_trending_idx'),
+            models.Index(fields=['place', '-like_count', 'id'], name='place_photo_place_top_idx'),
+        ]
 
     def __str__(self):
         return f'{self.place.name} by {self.owner.username}'
@@ -40,6 +118,137 @@ class PlacePhoto(models.Model):
 class PlacePhotoLike(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     place_photo = models.ForeignKey(PlacePhoto, on_delete=models.CASCADE, related_name='likes')
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f'{self.place_photo.place.name} photo by {self.owner.username}'
+
+
+class PlaceContributor(models.Model):
+    """
+    Counts the photos a user took of a place, so the contributors of places can be counted
+    as photos are added and removed (see place.summary).
+    """
+    place = models.ForeignKey(Place, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    photo_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['place', 'user'], name='place_contributor_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} at {self.place.name}'
+
+
+class TrendingLandmark(models.Model):
+    """
+    The single row holding the time trending scores of photos are relative to (see place.trending).
+    """
+    landmark = models.DateTimeField()
+
+    def __str__(self):
+        return self.landmark.isoformat()
+
+
+class DeletionTask(models.Model):
+    """
+    Tracks the removal of a user or a place together with everything that depends on it.
+
+    The target is deactivated as soon as the task is created and removed later in batches,
+    so deleting heavy contributors does not happen inside a request.
+    """
+    TARGET_USER = 'user'
+    TARGET_PLACE = 'place'
+    TARGET_CHOICES = [
+        (TARGET_USER, 'User'),
+        (TARGET_PLACE, 'Place'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    target_type = models.CharField(max_length=16, choices=TARGET_CHOICES)
+    target_id = models.BigIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    total_rows = models.IntegerField(default=0)
+    deleted_rows = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.target_type} {self.target_id} ({self.status})'
+
+    @property
+    def progress(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        if self.total_rows == 0:
+            return 0
+        return min(100, floor(self.deleted_rows * 100 / self.total_rows))
+
+
+class PlaceImport(models.Model):
+    """
+    A file of places uploaded by an admin and imported in the background (see place.bulk_import).
+    """
+    FORMAT_CSV = 'csv'
+    FORMAT_GEOJSON = 'geojson'
+    FORMAT_NDJSON = 'ndjson'
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, 'CSV'),
+        (FORMAT_GEOJSON, 'GeoJSON'),
+        (FORMAT_NDJSON, 'NDJSON'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    file = models.FileField(upload_to=uuid_upload_to('imports'))
+    input_format = models.CharField(max_length=16, choices=FORMAT_CHOICES)
+    added_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    # Row numbers and validation errors of the first rows that failed.
+    errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.file.name} ({self.status})'
+
+    @classmethod
+    def format_for_name(cls, name):
+        """
+        Guesses the input format from a file name, None if it is not known.
+        """
+        extension = name.rsplit('.', 1)[-1].lower()
+        return {'csv': cls.FORMAT_CSV,
+                'json': cls.FORMAT_GEOJSON,
+                'geojson': cls.FORMAT_GEOJSON,
+                'ndjson': cls.FORMAT_NDJSON,
+                'jsonl': cls.FORMAT_NDJSON,
+                'geojsonl': cls.FORMAT_NDJSON}.get(extension)
@@ -0,0 +1,46 @@
+"""
+The photos of a user, newest first, for their profile.
+
+Pages continue with a keyset query on the (owner, created_at, id) index from an opaque cursor
+of the same kind as the nearby feed, so a page costs the same however many photos the user
+has. ?view=grid returns only what the profile grid shows, the public_id, image and like count
+of every photo, which are read from the photo table alone.
+"""
+from django.conf import settings
+from django.db.models import Q
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+from DigitalLurker.fieldsets import Fieldset
+from .models import PlacePhoto
+from .nearby import encode_cursor, decode_cursor
+
+GRID = Fieldset({'public_id': None, 'image': None, 'like_count': None})
+
+
+def grid_view(query_params):
+    """
+    Returns whether the compact grid representation is requested.
+    """
+    view = query_params.get('view', 'full')
+    if view not in ('full', 'grid'):
+        raise ValidationError({'view': _('Use full or grid.')})
+    return view == 'grid'
+
+
+def get_page(user, cursor=None, limit=None):
+    """
+    Returns the primary keys of a page of the photos of a user, newest first, and the cursor of
+    the next page, None after the last one.
+
+    Raises InvalidCursor for malformed cursors.
+    """
+    limit = limit or settings.MY_PHOTOS_PAGE_SIZE
+    queryset = PlacePhoto.objects.filter(owner=user).order_by('-created_at', '-id')
+    if cursor is not None:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    positions = list(queryset.values_list('created_at', 'id')[:limit + 1])
+    next_cursor = encode_cursor(positions[limit - 1]) if len(positions) > limit else None
+    return [pk for created_at, pk in positions[:limit]], next_cursor
@@ -0,0 +1,108 @@
+"""
+Feed of the newest photos taken near a location.
+
+Photos carry the location, geohash and active flag of their place and their creation time,
+so the feed is read from the photo table alone: the geohash prefixes of the cells around the
+location narrow the photos down on the (geohash, created_at, id) index, the exact distance is
+checked on the remaining ones, and pages continue with a keyset query on (created_at, id)
+from an opaque cursor.
+
+Locations are snapped to the center of their geohash cell of NEARBY_PHOTOS_BUCKET_PRECISION
+characters, so everyone in a cell gets the same feed, and the photo ids of its pages are
+cached for NEARBY_PHOTOS_CACHE_TIMEOUT seconds. New photos can take that long to show up.
+For small radii the cells are finer, so snapping moves a location by at most MAX_SNAP of the
+radius.
+"""
+import base64
+import binascii
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import Distance
+from django.core.cache import cache
+from django.db.models import Q
+
+from . import geohash
+from .models import PlacePhoto
+
+# Share of the radius a location may be moved by when it is snapped to the center of its cell.
+MAX_SNAP = 0.05
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position):
+    created_at, pk = position
+    value = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = value.split('|')
+        position = datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+    if position[0].tzinfo is None:
+        raise InvalidCursor(cursor)
+    return position
+
+
+def bucket(location, radius):
+    """
+    Returns the geohash of the cell a Point falls in, whose center the feed is computed for.
+    Cells have NEARBY_PHOTOS_BUCKET_PRECISION characters, or more for small radii, so the
+    center is never farther from the Point than MAX_SNAP of the radius.
+    """
+    precision = settings.NEARBY_PHOTOS_BUCKET_PRECISION
+    while precision < geohash.MAX_PRECISION and geohash.max_offset(precision, location.y) > radius * MAX_SNAP:
+        precision += 1
+    return geohash.encode(location.y, location.x, precision)
+
+
+def nearby_photos(location, radius):
+    """
+    Returns the photos of active places within `radius` meters of a Point, newest first.
+    """
+    queryset = PlacePhoto.objects.filter(place_is_active=True,
+                                         location__distance_lte=(location, Distance(m=radius)))
+
+    cells = geohash.covering_cells(location.y, location.x, radius)
+    if cells is not None:
+        queryset = queryset.filter(reduce(or_, (Q(geohash__startswith=cell) for cell in cells)))
+    return queryset.order_by('-created_at', '-id')
+
+
+def get_page(location, radius, cursor=None, limit=None):
+    """
+    Returns the primary keys of a page of the feed of the bucket of a Point, newest first,
+    and the cursor of the next page, None after the last one.
+
+    Raises InvalidCursor for malformed cursors.
+    """
+    limit = limit or settings.NEARBY_PHOTOS_PAGE_SIZE
+    position = decode_cursor(cursor) if cursor is not None else None
+    cell = bucket(location, radius)
+    key = f'nearby:{cell}:{radius}:{limit}:{cursor or ""}'
+    page = cache.get(key)
+    if page is not None:
+        return page
+
+    latitude, longitude = geohash.center(cell)
+    queryset = nearby_photos(Point(longitude, latitude, srid=4326), radius)
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    positions = list(queryset.values_list('created_at', 'id')[:limit + 1])
+    next_cursor = encode_cursor(positions[limit - 1]) if len(positions) > limit else None
+    page = [pk for _, pk in positions[:limit]], next_cursor
+    cache.set(key, page, settings.NEARBY_PHOTOS_CACHE_TIMEOUT)
+    return page
@@ -0,0 +1,131 @@
+"""
+Precomputed lists of the PLACE_NEIGHBOURS nearest active places of every active place.
+
+A list is computed with a KNN query on the spatial index: the places nearest in degrees are
+taken as candidates, PLACE_NEIGHBOUR_CANDIDATES times as many as needed, and ranked by their
+distance on the sphere. The distance of the farthest neighbour is kept on the place as its
+neighbour_radius, so when a place is added or moved, the places whose lists can change are
+the ones with a radius reaching its location, plus those with incomplete lists. They are
+found through a bounding box around the location and the largest radius.
+
+Lists are refreshed in the background (see place.signals and place.jobs) for the places a
+change affects, and rebuilt entirely with `manage.py rebuildneighbours`.
+"""
+from math import cos, degrees, radians
+
+from django.conf import settings
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Polygon
+from django.db import transaction
+from django.db.models import F, FloatField, Func, Max, Value
+
+from .models import Place, PlaceNeighbour
+
+EARTH_RADIUS = 6371008.8
+
+
+class PlanarDistance(Func):
+    """
+    PostGIS' <-> operator, the distance in degrees, which the spatial index can order by.
+    """
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = FloatField()
+
+
+def _point(location):
+    return Value(location, output_field=PointField(srid=4326))
+
+
+def nearest(location, exclude_pk=None, limit=None):
+    """
+    Returns the primary keys and distances in meters of the active places nearest to a
+    location, nearest first.
+    """
+    limit = limit or settings.PLACE_NEIGHBOURS
+    candidates = Place.objects.filter(is_active=True).exclude(pk=exclude_pk) \
+        .order_by(PlanarDistance('location', _point(location))) \
+        .values('pk')[:limit * settings.PLACE_NEIGHBOUR_CANDIDATES]
+    return [(pk, distance.m) for pk, distance in Place.objects.filter(pk__in=candidates)
+            .annotate(distance=Distance('location', location))
+            .order_by('distance', 'id')
+            .values_list('pk', 'distance')[:limit]]
+
+
+def compute(place):
+    """
+    Replaces the stored neighbours of a place, or removes them if it is not active.
+    """
+    neighbours = nearest(place.location, place.pk) if place.is_active else []
+    complete = len(neighbours) == settings.PLACE_NEIGHBOURS
+
+    with transaction.atomic():
+        PlaceNeighbour.objects.filter(place=place).delete()
+        PlaceNeighbour.objects.bulk_create([PlaceNeighbour(place=place, neighbour_id=pk, rank=rank, distance=distance)
+                                            for rank, (pk, distance) in enumerate(neighbours)])
+        Place.objects.filter(pk=place.pk).update(neighbour_radius=neighbours[-1][1] if complete else None)
+
+
+def _bbox(location, radius):
+    """
+    Returns a polygon around every location within `radius` meters of a location.
+    """
+    south = location.y - degrees(radius / EARTH_RADIUS)
+    north = location.y + degrees(radius / EARTH_RADIUS)
+    if south <= -90 or north >= 90:
+        return Polygon.from_bbox((-180, max(south, -90), 180, min(north, 90)))
+
+    width = degrees(radius / (EARTH_RADIUS * cos(radians(max(abs(south), abs(north))))))
+    west, east = location.x - width, location.x + width
+    if west < -180 or east > 180:
+        west, east = -180, 180
+    return Polygon.from_bbox((west, south, east, north))
+
+
+def reaching(location, exclude_pk=None):
+    """
+    Returns the primary keys of the active places whose neighbours could change if a place
+    was at `location`.
+    """
+    places = Place.objects.filter(is_active=True).exclude(pk=exclude_pk)
+    affected = set(places.filter(neighbour_radius__isnull=True).values_list('pk', flat=True))
+
+    radius = places.aggregate(radius=Max('neighbour_radius'))['radius']
+    if radius is not None:
+        bbox = _bbox(location, radius)
+        bbox.srid = 4326
+        affected.update(places.filter(location__intersects=bbox)
+                        .annotate(distance=Distance('location', location))
+                        .filter(neighbour_radius__gte=F('distance'))
+                        .values_list('pk', flat=True))
+    return affected
+
+
+def refresh(place_id=None, place_ids=()):
+    """
+    Recomputes the neighbours of a place that was added, moved or (de)activated and of the
+    places it affects, and of `place_ids`.
+    """
+    affected = set(place_ids)
+    place = Place.objects.filter(pk=place_id).first() if place_id is not None else None
+    if place is not None:
+        affected.add(place.pk)
+        affected.update(PlaceNeighbour.objects.filter(neighbour=place).values_list('place_id', flat=True))
+        if place.is_active:
+            affected.update(reaching(place.location, place.pk))
+
+    for affected_place in Place.objects.filter(pk__in=affected).only('pk', 'location', 'is_active'):
+        compute(affected_place)
+
+
+def rebuild(chunk_size=1000):
+    """
+    Recomputes the neighbours of every place. Returns the number of places.
+    """
+    PlaceNeighbour.objects.filter(place__is_active=False).delete()
+    count = 0
+    for place in Place.objects.filter(is_active=True).only('pk', 'location', 'is_active').iterator(chunk_size):
+        compute(place)
+        count += 1
+    return count
@@ -0,0 +1,225 @@
+"""
+In-process fan-out of like count changes to clients connected over Server-Sent Events or WebSocket.
+
+Changes are coalesced: whatever happens to a photo during LIKE_STREAM_INTERVAL is delivered
+as a single update with the latest count. Every connection is one coroutine waiting on an
+asyncio.Event, so idle clients cost next to nothing.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+from uuid import UUID
+
+from django.conf import settings
+
+
+class Subscription:
+    def __init__(self, topics):
+        self.topics = set(topics)
+        self.pending = {}
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, update):
+        self.pending[update['photo']] = update
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def wait(self):
+        """
+        Waits for updates and returns them, one per photo.
+        """
+        await self._ready.wait()
+        self._ready.clear()
+        updates, self.pending = list(self.pending.values()), {}
+        return updates
+
+
+class LikeBroker:
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.loop = None
+        self.subscribers = {}
+        self.staged = {}
+        self.flusher = None
+
+    def subscribe(self, topics):
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(topics)
+        for topic in subscription.topics:
+            self.subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription, topics=None):
+        for topic in list(topics if topics is not None else subscription.topics):
+            subscription.topics.discard(topic)
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    def add_topics(self, subscription, topics):
+        for topic in topics:
+            subscription.topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(subscription)
+
+    def has_subscribers(self, *topics):
+        return self.loop is not None and any(topic in self.subscribers for topic in topics)
+
+    def publish(self, photo, place, like_count):
+        """
+        Stages a like count update. Safe to call from any thread, does nothing when no
+        event loop serves subscribers in this process (e.g. under WSGI).
+        """
+        if self.loop is None or self.loop.is_closed():
+            return
+
+        update = {'photo': str(photo), 'place': str(place), 'like_count': like_count}
+        self.loop.call_soon_threadsafe(self._stage, update)
+
+    def _stage(self, update):
+        self.staged[update['photo']] = update
+        if self.flusher is None or self.flusher.done():
+            self.flusher = self.loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval if self.interval is not None else settings.LIKE_STREAM_INTERVAL)
+        self.flush()
+
+    def flush(self):
+        staged, self.staged = self.staged, {}
+        for update in staged.values():
+            for topic in (update['photo'], update['place']):
+                for subscription in self.subscribers.get(topic, ()):
+                    subscription.push(update)
+
+
+broker = LikeBroker()
+
+
+def publish_like_count(place_photo):
+    """
+    Publishes the current like count of the photo if anybody in this process listens for it.
+    """
+    photo, place = str(place_photo.public_id), str(place_photo.place.public_id)
+    if broker.has_subscribers(photo, place):
+        broker.publish(photo, place, place_photo.likes.count())
+
+
+def parse_topics(values):
+    topics = set()
+    for value in values:
+        for item in value.split(','):
+            if item:
+                topics.add(str(UUID(item)))
+    return topics
+
+
+def _query_topics(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    return parse_topics(query.get('photos', []) + query.get('places', []))
+
+
+async def like_stream(scope, receive, send):
+    """
+    ASGI application streaming like counts for ?photos=<public_id>,...&places=<public_id>,...
+    as Server-Sent Events, or over a WebSocket which also accepts
+    {"subscribe": [...]} and {"unsubscribe": [...]} messages.
+    """
+    if scope['type'] == 'websocket':
+        await _websocket_stream(scope, receive, send)
+    else:
+        await _sse_stream(scope, receive, send)
+
+
+async def _sse_stream(scope, receive, send):
+    try:
+        topics = _query_topics(scope)
+    except ValueError:
+        topics = set()
+
+    if not topics or len(topics) > settings.LIKE_STREAM_MAX_TOPICS:
+        await send({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Pass up to %d photo or place public_ids.'
+                                                          % settings.LIKE_STREAM_MAX_TOPICS})
+        return
+
+    await send({'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'),
+                            (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]})
+
+    subscription = broker.subscribe(topics)
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        while not subscription.closed:
+            try:
+                updates = await asyncio.wait_for(subscription.wait(), settings.LIKE_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                continue
+
+            body = b''.join(b'event: like_count\ndata: %s\n\n' % json.dumps(update).encode() for update in updates)
+            if body:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        watcher.cancel()
+        broker.unsubscribe(subscription)
+
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _websocket_stream(scope, receive, send):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    try:
+        topics = _query_topics(scope)
+    except ValueError:
+        topics = None
+
+    if topics is None or len(topics) > settings.LIKE_STREAM_MAX_TOPICS:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = broker.subscribe(topics)
+
+    async def handle_messages():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+
+            try:
+                data = json.loads(message.get('text') or message.get('bytes') or '{}')
+                subscribe = parse_topics(data.get('subscribe', []))
+                unsubscribe = parse_topics(data.get('unsubscribe', []))
+            except (ValueError, AttributeError, TypeError):
+                continue
+
+            broker.unsubscribe(subscription, unsubscribe)
+            room = settings.LIKE_STREAM_MAX_TOPICS - len(subscription.topics)
+            broker.add_topics(subscription, list(subscribe - subscription.topics)[:max(room, 0)])
+        subscription.close()
+
+    handler = asyncio.ensure_future(handle_messages())
+    try:
+        while not subscription.closed:
+            updates = await subscription.wait()
+            for update in updates:
+                await send({'type': 'websocket.send', 'text': json.dumps(update)})
+    finally:
+        handler.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,264 @@
+"""
+Fast read path for the place search and photo lists.
+
+Builds the same representations as PlaceSerializer and PlacePhotoSerializer from values()
+rows instead of model instances and serializer fields. Only the columns of the selected
+fields (see DigitalLurker.fieldsets) are queried, and the likes of the user and owner
+experience of a whole page are loaded with one query each, if they are selected at all,
+instead of one query per row. Any change to the output of the serializers has to be mirrored
+here; the tests compare both byte for byte.
+
+Locations are returned as [longitude, latitude] with a `precision`, and photo lists can move
+their places to a separate table, see place.compact.
+"""
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
+from django.utils.translation import gettext as _
+from geopy.distance import distance
+from math import floor
+from rest_framework.exceptions import ValidationError
+
+from DigitalLurker.fieldsets import ALL
+from DigitalLurker.timing import timed
+from user.serializers import experience_level
+from .compact import coordinates
+from .models import Place, PlacePhotoLike
+
+# The columns every field of a representation is built from, in the order of the serializers.
+PLACE_COLUMNS = {
+    'public_id': ['public_id'],
+    'name': ['name'],
+    'main_image': ['main_image'],
+    'location': ['location'],
+    'distance': ['location'],
+    'experience': ['experience'],
+    'description': ['description'],
+    'photo_count': ['photo_count'],
+    'contributor_count': ['contributor_count'],
+    'top_photos': ['top_photos'],
+}
+
+OWNER_COLUMNS = {
+    'public_id': ['public_id'],
+    'username': ['username'],
+    'email': ['email'],
+    'first_name': ['first_name'],
+    'last_name': ['last_name'],
+    'date_of_birth': ['date_of_birth'],
+    'pfp': ['pfp'],
+    'total_experience': [],
+    'experience_level': [],
+    'photo_count': ['photo_count'],
+    'visited_place_count': ['visited_place_count'],
+    'received_like_count': ['received_like_count'],
+}
+
+PHOTO_COLUMNS = {
+    'public_id': ['public_id'],
+    'owner': [],
+    'place': [],
+    'image': ['image'],
+    'title': ['title'],
+    'liked': [],
+    'like_count': ['like_count'],
+    'description': ['description'],
+}
+
+
+def _file_url(request):
+    url = default_storage.url
+
+    def file_url(name):
+        if not name:
+            return None
+        return request.build_absolute_uri(url(name))
+
+    return file_url
+
+
+def _distance(request):
+    """
+    Returns a function computing the distance to the Point header like get_distance,
+    parsing the header only once.
+    """
+    point = request.headers.get('Point')
+    point_location = None
+
+    def distance_to(location):
+        nonlocal point_location
+        if point is None:
+            return 0
+
+        if point_location is None:
+            try:
+                point_location = GEOSGeometry(point)
+            except GEOSException:
+                raise ValidationError(_('Wrong localization format. Use POINT(x y). '))
+
+        return floor(distance(location, point_location).meters)
+
+    return distance_to
+
+
+def _columns(available, fieldset, prefix=''):
+    return {f'{prefix}{column}' for name, columns in available.items() if name in fieldset for column in columns}
+
+
+def _select(available, accessors, fieldset):
+    return [(name, accessors[name]) for name in available if name in fieldset]
+
+
+def _build(accessors):
+    return lambda row: {name: get(row) for name, get in accessors}
+
+
+def _place_accessors(prefix, fieldset, file_url, distance_to, precision):
+    public_id, name, main_image, location, experience, description, photo_count, contributor_count, top_photos = \
+        (f'{prefix}{column}' for column in ['public_id', 'name', 'main_image', 'location', 'experience',
+                                            'description', 'photo_count', 'contributor_count', 'top_photos'])
+
+    def top_photo_data(row):
+        return [{'public_id': photo['public_id'],
+                 'image': file_url(photo['image']),
+                 'title': photo['title'],
+                 'like_count': photo['like_count']} for photo in row[top_photos]]
+
+    return _select(PLACE_COLUMNS, {
+        'public_id': lambda row: str(row[public_id]),
+        'name': lambda row: row[name],
+        'main_image': lambda row: file_url(row[main_image]),
+        'location': (lambda row: str(row[location])) if precision is None else
+        (lambda row: coordinates(row[location], precision)),
+        'distance': lambda row: distance_to(row[location]),
+        'experience': lambda row: row[experience],
+        'description': lambda row: row[description],
+        'photo_count': lambda row: row[photo_count],
+        'contributor_count': lambda row: row[contributor_count],
+        'top_photos': top_photo_data,
+    }, fieldset)
+
+
+def _owner_accessors(fieldset, experience, file_url):
+    def date_of_birth(row):
+        value = row['owner__date_of_birth']
+        return value.isoformat() if value is not None else None
+
+    return _select(OWNER_COLUMNS, {
+        'public_id': lambda row: str(row['owner__public_id']),
+        'username': lambda row: row['owner__username'],
+        'email': lambda row: row['owner__email'],
+        'first_name': lambda row: row['owner__first_name'],
+        'last_name': lambda row: row['owner__last_name'],
+        'date_of_birth': date_of_birth,
+        'pfp': lambda row: file_url(row['owner__pfp']),
+        'total_experience': lambda row: experience[row['owner_id']],
+        'experience_level': lambda row: experience_level(experience[row['owner_id']]),
+        'photo_count': lambda row: row['owner__photo_count'],
+        'visited_place_count': lambda row: row['owner__visited_place_count'],
+        'received_like_count': lambda row: row['owner__received_like_count'],
+    }, fieldset)
+
+
+def place_rows(queryset, fieldset=ALL):
+    return queryset.values(*sorted(_columns(PLACE_COLUMNS, fieldset)))
+
+
+@timed('serialize')
+def place_data(rows, request, fieldset=ALL, precision=None):
+    """
+    Returns the PlaceSerializer representation of rows from place_rows.
+    """
+    build = _build(_place_accessors('', fieldset, _file_url(request), _distance(request), precision))
+    return [build(row) for row in rows]
+
+
+def _place_table(build_place, places):
+    def place_public_id(row):
+        public_id = str(row['place__public_id'])
+        if public_id not in places:
+            places[public_id] = {'public_id': public_id, **build_place(row)}
+        return public_id
+
+    return place_public_id
+
+
+def _owner_experience(fieldset):
+    owner = fieldset.nested('owner') if 'owner' in fieldset else None
+    return owner is not None and ('total_experience' in owner or 'experience_level' in owner)
+
+
+def place_photo_rows(queryset, fieldset=ALL):
+    columns = {'id'} | _columns(PHOTO_COLUMNS, fieldset)
+
+    for relation, available in [('owner', OWNER_COLUMNS), ('place', PLACE_COLUMNS)]:
+        if relation not in fieldset:
+            continue
+
+        nested = fieldset.nested(relation)
+        if nested is None:
+            columns.add(f'{relation}__public_id')
+        else:
+            columns |= _columns(available, nested, f'{relation}__')
+
+    if 'place' in fieldset:
+        # Also the key of the table of places.
+        columns.add('place__public_id')
+    if _owner_experience(fieldset):
+        columns.add('owner_id')
+    return queryset.values(*sorted(columns))
+
+
+@timed('serialize')
+def place_photo_data(rows, request, fieldset=ALL, precision=None, places=None):
+    """
+    Returns the PlacePhotoSerializer representation of rows from place_photo_rows. With a
+    `places` dict, embedded places are replaced by their public_id and added to the dict
+    once, by public_id, each with its public_id.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    file_url = _file_url(request)
+    photo_ids = [row['id'] for row in rows]
+
+    liked = set()
+    user = request.user
+    if 'liked' in fieldset and user is not None and user.is_authenticated:
+        liked = set(PlacePhotoLike.objects.filter(owner=user, place_photo_id__in=photo_ids)
+                    .values_list('place_photo_id', flat=True))
+
+    # Same as UserSerializer.get_total_experience: the experience of every place the owner
+    # took a photo of, counted once.
+    experience = defaultdict(int)
+    if _owner_experience(fieldset):
+        owner_ids = {row['owner_id'] for row in rows}
+        for owner_id, place_id, place_experience in Place.objects.filter(placephoto__owner_id__in=owner_ids) \
+                .values_list('placephoto__owner_id', 'pk', 'experience').distinct():
+            experience[owner_id] += place_experience
+
+    relations = {}
+    if 'owner' in fieldset:
+        owner = fieldset.nested('owner')
+        relations['owner'] = (lambda row: str(row['owner__public_id'])) if owner is None else \
+            _build(_owner_accessors(owner, experience, file_url))
+    if 'place' in fieldset:
+        place = fieldset.nested('place')
+        if place is None:
+            relations['place'] = lambda row: str(row['place__public_id'])
+        else:
+            build_place = _build(_place_accessors('place__', place, file_url, _distance(request), precision))
+            relations['place'] = build_place if places is None else _place_table(build_place, places)
+
+    build = _build(_select(PHOTO_COLUMNS, {
+        'public_id': lambda row: str(row['public_id']),
+        'image': lambda row: file_url(row['image']),
+        'title': lambda row: row['title'],
+        'liked': lambda row: row['id'] in liked,
+        'like_count': lambda row: row['like_count'],
+        'description': lambda row: row['description'],
+        **relations,
+    }, fieldset))
+    return [build(row) for row in rows]
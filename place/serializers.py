@@ -2,19 +2,52 @@ from math import floor
 
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import GEOSGeometry, GEOSException
+from django.core.files.storage import default_storage
 from geopy.distance import distance
 from django.utils.translation import gettext as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from place.models import Place, PlacePhoto, PlacePhotoLike
+from DigitalLurker.fieldsets import SparseFieldsetMixin
+from DigitalLurker.timing import TimedSerializerMixin
+from place.compact import coordinates
+from place.models import Place, PlacePhoto, PlacePhotoLike, PlaceImport
 from user.serializers import UserSerializer
 
 User = get_user_model()
 
 
-class PlaceSerializer(serializers.ModelSerializer):
+def get_distance(location, request):
+    """
+    Returns the distance in meters between the location and the Point header of the request.
+    """
+    point = request.headers.get('Point')
+    if point is None:
+        return 0
+
+    try:
+        point_location = GEOSGeometry(point)
+    except GEOSException:
+        raise ValidationError(_('Wrong localization format. Use POINT(x y). '))
+
+    if isinstance(location, str):
+        location = GEOSGeometry(location)
+    return floor(distance(location, point_location).meters)
+
+
+def top_photo_data(top_photos, request):
+    """
+    Returns the top photos stored on a place (see place.summary) with absolute image URLs.
+    """
+    return [{'public_id': photo['public_id'],
+             'image': request.build_absolute_uri(default_storage.url(photo['image'])) if photo['image'] else None,
+             'title': photo['title'],
+             'like_count': photo['like_count']} for photo in top_photos]
+
+
+class PlaceSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     distance = serializers.SerializerMethodField()
+    top_photos = serializers.SerializerMethodField()
 
     class Meta:
         model = Place
@@ -25,28 +58,33 @@ class PlaceSerializer(serializers.ModelSerializer):
                   'added_by',
                   'distance',
                   'experience',
-                  'description']
+                  'description',
+                  'photo_count',
+                  'contributor_count',
+                  'top_photos']
         extra_kwargs = {'added_by': {'write_only': True}}
+        read_only_fields = ['photo_count', 'contributor_count']
 
     def get_distance(self, obj):
-        point = self.context['request'].headers.get('Point')
-        if point is None:
-            return 0
+        return get_distance(obj.location, self.context['request'])
 
-        try:
-            point_location = GEOSGeometry(point)
-        except GEOSException:
-            raise ValidationError(_('Wrong localization format. Use POINT(x y). '))
+    def get_top_photos(self, obj):
+        return top_photo_data(obj.top_photos, self.context['request'])
 
-        return floor(distance(obj.location, point_location).meters)
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        precision = self.context.get('location_precision')
+        if precision is not None and 'location' in data:
+            data['location'] = coordinates(instance.location, precision)
+        return data
 
 
-class PlacePhotoSerializer(serializers.ModelSerializer):
+class PlacePhotoSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     place = PlaceSerializer(read_only=True)
 
     liked = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = PlacePhoto
@@ -60,13 +98,10 @@ class PlacePhotoSerializer(serializers.ModelSerializer):
                   'description']
         extra_kwargs = {'image': {'read_only': True}}
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
-
     def get_liked(self, obj):
         request = self.context.get('request')
 
-        if request.user is not None:
+        if request.user is not None and request.user.is_authenticated:
             return PlacePhotoLike.objects.filter(owner=request.user, place_photo=obj).exists()
         return False
 
@@ -103,3 +138,41 @@ class PlacePhotoLikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = PlacePhotoLike
         fields = ['owner_pk', 'place_photo_pk']
+
+
+class PlaceImportRowSerializer(serializers.Serializer):
+    external_id = serializers.CharField(max_length=128, required=False, allow_null=True, allow_blank=True)
+    name = serializers.CharField(max_length=64)
+    description = serializers.CharField(max_length=256, required=False, allow_null=True, allow_blank=True)
+    experience = serializers.IntegerField()
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    is_active = serializers.BooleanField(default=True)
+
+
+class PlaceImportSerializer(serializers.ModelSerializer):
+    input_format = serializers.ChoiceField(choices=PlaceImport.FORMAT_CHOICES, required=False)
+
+    class Meta:
+        model = PlaceImport
+        fields = ['id',
+                  'file',
+                  'input_format',
+                  'status',
+                  'created_count',
+                  'updated_count',
+                  'failed_count',
+                  'errors',
+                  'error',
+                  'created_at',
+                  'finished_at']
+        read_only_fields = ['status', 'created_count', 'updated_count', 'failed_count', 'errors', 'error',
+                            'created_at', 'finished_at']
+        extra_kwargs = {'file': {'write_only': True}}
+
+    def validate(self, attrs):
+        if attrs.get('input_format') is None:
+            attrs['input_format'] = PlaceImport.format_for_name(attrs['file'].name)
+            if attrs['input_format'] is None:
+                raise ValidationError({'input_format': _('Unknown file type, set the input format.')})
+        return attrs
@@ -0,0 +1,165 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from user import stats
+
+from . import geohash, summary, trending
+from .caching import bump_version
+from .models import Place, PlacePhoto, PlacePhotoLike, PlaceTombstone, PlaceNeighbour
+
+User = get_user_model()
+
+
+def _bump_on_commit(kind, key):
+    transaction.on_commit(partial(bump_version, kind, key))
+
+
+def _bump_photo_lists_of(user_id):
+    # Photo lists show the experience of the owners, which changes with their photos and profile.
+    for place_id in PlacePhoto.objects.filter(owner_id=user_id).values_list('place_id', flat=True).distinct():
+        _bump_on_commit('place-photos', place_id)
+
+
+@receiver(pre_save, sender=Place)
+def remember_place_experience(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is not None and (update_fields is None or 'experience' in update_fields):
+        instance._saved_experience = Place.objects.filter(pk=instance.pk) \
+            .values_list('experience', flat=True).first()
+
+
+@receiver(pre_save, sender=Place)
+def remember_place_location(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is not None and (update_fields is None or {'location', 'is_active'} & set(update_fields)):
+        saved = Place.objects.filter(pk=instance.pk).values_list('location', 'is_active').first()
+        if saved is not None:
+            instance._saved_location, instance._saved_is_active = saved
+
+
+@receiver(post_save, sender=Place)
+def update_photo_locations(sender, instance, created, **kwargs):
+    changes = {}
+    if getattr(instance, '_saved_location', instance.location) != instance.location:
+        changes.update(location=instance.location, geohash=geohash.encode(instance.location.y, instance.location.x))
+    if getattr(instance, '_saved_is_active', instance.is_active) != instance.is_active:
+        changes['place_is_active'] = instance.is_active
+    if not created and changes:
+        PlacePhoto.objects.filter(place=instance).update(**changes)
+
+
+@receiver(post_save, sender=Place)
+def refresh_place_neighbours(sender, instance, created, **kwargs):
+    moved = getattr(instance, '_saved_location', instance.location) != instance.location
+    if created or moved or getattr(instance, '_saved_is_active', instance.is_active) != instance.is_active:
+        enqueue('place.refresh_neighbours', place_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Place)
+def remember_place_neighbourhood(sender, instance, **kwargs):
+    instance._neighbour_of = list(PlaceNeighbour.objects.filter(neighbour=instance).values_list('place_id', flat=True))
+
+
+@receiver(post_delete, sender=Place)
+def refresh_former_neighbours(sender, instance, **kwargs):
+    if instance._neighbour_of:
+        enqueue('place.refresh_neighbours', place_ids=instance._neighbour_of)
+
+
+@receiver([post_save, post_delete], sender=Place)
+def invalidate_place(sender, instance, **kwargs):
+    _bump_on_commit('place', instance.public_id)
+    _bump_on_commit('place-photos', instance.pk)
+
+    # The experience of every user who took photos of the place depends on it.
+    if getattr(instance, '_saved_experience', instance.experience) != instance.experience:
+        _bump_on_commit('experience', 'all')
+
+
+@receiver(post_delete, sender=Place)
+def record_place_tombstone(sender, instance, **kwargs):
+    PlaceTombstone.objects.create(public_id=instance.public_id)
+
+
+@receiver(pre_save, sender=PlacePhoto)
+def copy_place_location(sender, instance, **kwargs):
+    if instance.location is None:
+        location = instance.place.location
+        instance.location = location
+        instance.geohash = geohash.encode(location.y, location.x)
+        instance.place_is_active = instance.place.is_active
+
+
+@receiver([post_save, post_delete], sender=PlacePhoto)
+def invalidate_place_photo(sender, instance, **kwargs):
+    _bump_on_commit('photo', instance.pk)
+    _bump_on_commit('place-photos', instance.place_id)
+    _bump_on_commit('user', instance.owner_id)
+    _bump_photo_lists_of(instance.owner_id)
+
+
+@receiver(post_save, sender=PlacePhoto)
+def summarize_saved_photo(sender, instance, created, **kwargs):
+    if created:
+        with transaction.atomic():
+            first = summary.add_photo(instance)
+            stats.change(instance.owner_id, photo_count=1, visited_place_count=int(first))
+    else:
+        summary.update_top_photos(instance.pk)
+
+
+@receiver(pre_delete, sender=Place)
+def uncount_visited_place(sender, instance, **kwargs):
+    # Deleting a place deletes its contributors before its photos, whose signals then can not
+    # tell the last photo of a user.
+    stats.change_contributors(instance.pk, visited_place_count=-1)
+
+
+@receiver(post_delete, sender=PlacePhoto)
+def summarize_deleted_photo(sender, instance, **kwargs):
+    with transaction.atomic():
+        last = summary.remove_photo(instance)
+        stats.change(instance.owner_id, photo_count=-1, visited_place_count=-int(last))
+
+
+@receiver(post_save, sender=PlacePhotoLike)
+def count_like(sender, instance, created, **kwargs):
+    if created:
+        with transaction.atomic():
+            trending.record_like(instance)
+            stats.change_photo_owner(instance.place_photo_id, received_like_count=1)
+        summary.update_top_photos(instance.place_photo_id)
+
+
+@receiver(post_delete, sender=PlacePhotoLike)
+def uncount_like(sender, instance, **kwargs):
+    with transaction.atomic():
+        trending.remove_like(instance)
+        stats.change_photo_owner(instance.place_photo_id, received_like_count=-1)
+    summary.update_top_photos(instance.place_photo_id)
+
+
+@receiver([post_save, post_delete], sender=PlacePhotoLike)
+def invalidate_place_photo_like(sender, instance, **kwargs):
+    _bump_on_commit('photo', instance.place_photo_id)
+
+    if PlacePhotoLike.place_photo.is_cached(instance):
+        place_id, owner_id = instance.place_photo.place_id, instance.place_photo.owner_id
+    else:
+        place_id, owner_id = PlacePhoto.objects.filter(pk=instance.place_photo_id) \
+            .values_list('place_id', 'owner_id').first() or (None, None)
+    _bump_on_commit('place-photos', place_id)
+
+    # The likes the owner received are part of their representation.
+    if owner_id is not None:
+        _bump_on_commit('user', owner_id)
+        _bump_photo_lists_of(owner_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    _bump_on_commit('user', instance.pk)
+    _bump_photo_lists_of(instance.pk)
@@ -0,0 +1,163 @@
+"""
+Summary of the photos of places: photo count, number of contributors and top photos.
+
+The summary is stored on the place, so place details stay a single-row read. Adding or
+removing a photo changes the counts with one update, and the contributors are counted
+through PlaceContributor, which knows how many photos each user took of a place. The top
+photos, the most liked first, are only read again from the (place, like_count, id) index when
+a change can affect them. Changes lock the row of the place, so concurrent changes to the
+same place are applied one after another, and set its updated_at, so they reach sync clients
+and the Last-Modified of place details. The lock is FOR NO KEY UPDATE, which does not conflict
+with the KEY SHARE lock every photo INSERT takes on its place, so concurrent uploads wait for
+each other instead of deadlocking.
+
+`manage.py reconcileplacesummaries` recounts the summaries in batches, for summaries that
+drifted, e.g. after photos were created or deleted in bulk, which sends no signals.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .caching import bump_version
+from .models import Place, PlacePhoto, PlaceContributor
+
+TOP_PHOTOS = 3
+
+
+def _lock(place_id):
+    return Place.objects.select_for_update(no_key=True).filter(pk=place_id).values('public_id', 'top_photos').first()
+
+
+def _top_photos(place_id):
+    return [{'public_id': str(photo['public_id']),
+             'image': photo['image'],
+             'title': photo['title'],
+             'like_count': photo['like_count']}
+            for photo in PlacePhoto.objects.filter(place_id=place_id)
+            .order_by('-like_count', 'id')
+            .values('public_id', 'image', 'title', 'like_count')[:TOP_PHOTOS]]
+
+
+def _is_top(place, public_id):
+    return any(photo['public_id'] == str(public_id) for photo in place['top_photos'])
+
+
+def _changed(place):
+    transaction.on_commit(partial(bump_version, 'place', place['public_id']))
+
+
+def add_photo(photo):
+    """
+    Counts a new photo. Returns whether it is the first photo of its owner of the place.
+    """
+    with transaction.atomic():
+        place = _lock(photo.place_id)
+        contributor, created = PlaceContributor.objects.select_for_update() \
+            .get_or_create(place_id=photo.place_id, user_id=photo.owner_id)
+        PlaceContributor.objects.filter(pk=contributor.pk).update(photo_count=F('photo_count') + 1)
+
+        changes = {'photo_count': F('photo_count') + 1, 'updated_at': timezone.now()}
+        if created:
+            changes['contributor_count'] = F('contributor_count') + 1
+        if len(place['top_photos']) < TOP_PHOTOS:
+            changes['top_photos'] = _top_photos(photo.place_id)
+        Place.objects.filter(pk=photo.place_id).update(**changes)
+        _changed(place)
+    return created
+
+
+def remove_photo(photo):
+    """
+    Uncounts a removed photo. Returns whether it was the last photo of its owner of the place.
+    """
+    with transaction.atomic():
+        place = _lock(photo.place_id)
+        if place is None:
+            # Deleted together with the place.
+            return False
+
+        changes = {'photo_count': F('photo_count') - 1, 'updated_at': timezone.now()}
+        contributor = PlaceContributor.objects.select_for_update() \
+            .filter(place_id=photo.place_id, user_id=photo.owner_id).first()
+        last = contributor is not None and contributor.photo_count <= 1
+        if last:
+            contributor.delete()
+            changes['contributor_count'] = F('contributor_count') - 1
+        elif contributor is not None:
+            PlaceContributor.objects.filter(pk=contributor.pk).update(photo_count=F('photo_count') - 1)
+
+        if _is_top(place, photo.public_id):
+            changes['top_photos'] = _top_photos(photo.place_id)
+        Place.objects.filter(pk=photo.place_id).update(**changes)
+        _changed(place)
+    return last
+
+
+def update_top_photos(photo_id):
+    """
+    Updates the top photos of the place of a photo whose title, image or likes changed, if
+    the photo is or may now be one of them.
+    """
+    photo = PlacePhoto.objects.filter(pk=photo_id).values('place_id', 'public_id', 'like_count').first()
+    if photo is None:
+        return
+
+    with transaction.atomic():
+        place = _lock(photo['place_id'])
+        top_photos = place['top_photos'] if place is not None else []
+        if place is None or not (_is_top(place, photo['public_id']) or len(top_photos) < TOP_PHOTOS or
+                                 photo['like_count'] >= top_photos[-1]['like_count']):
+            return
+
+        top = _top_photos(photo['place_id'])
+        if top != top_photos:
+            Place.objects.filter(pk=photo['place_id']).update(top_photos=top, updated_at=timezone.now())
+            _changed(place)
+
+
+def reconcile(batch_size=1000):
+    """
+    Recounts the photos, contributors and top photos of all places, `batch_size` places per
+    transaction, and corrects the wrong ones. Returns the number of places corrected.
+    """
+    corrected = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            places = list(Place.objects.select_for_update(no_key=True).filter(pk__gt=last_pk).order_by('pk')
+                          .values('pk', 'public_id', 'photo_count', 'contributor_count', 'top_photos')[:batch_size])
+            if not places:
+                return corrected
+            last_pk = places[-1]['pk']
+            pks = [place['pk'] for place in places]
+
+            actual, stored = defaultdict(dict), defaultdict(dict)
+            for row in PlacePhoto.objects.filter(place_id__in=pks).order_by() \
+                    .values('place_id', 'owner_id').annotate(count=Count('id')):
+                actual[row['place_id']][row['owner_id']] = row['count']
+            for contributor in PlaceContributor.objects.filter(place_id__in=pks):
+                stored[contributor.place_id][contributor.user_id] = contributor.photo_count
+
+            for place in places:
+                photo_counts = actual[place['pk']]
+                if photo_counts != stored[place['pk']]:
+                    PlaceContributor.objects.filter(place_id=place['pk']).delete()
+                    PlaceContributor.objects.bulk_create(
+                        PlaceContributor(place_id=place['pk'], user_id=user_id, photo_count=count)
+                        for user_id, count in photo_counts.items())
+
+                changes = {}
+                if place['photo_count'] != sum(photo_counts.values()):
+                    changes['photo_count'] = sum(photo_counts.values())
+                if place['contributor_count'] != len(photo_counts):
+                    changes['contributor_count'] = len(photo_counts)
+                top = _top_photos(place['pk'])
+                if top != place['top_photos']:
+                    changes['top_photos'] = top
+                if changes:
+                    Place.objects.filter(pk=place['pk']).update(**changes, updated_at=timezone.now())
+                    _changed(place)
+                    corrected += 1
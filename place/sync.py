@@ -0,0 +1,111 @@
+"""
+Incremental sync of the place catalogue.
+
+Changes are ordered by (time, kind, id), where time is the updated_at of a place or the
+deleted_at of a tombstone and kind puts places before tombstones of the same instant. The
+position after the last change a client received is handed out as an opaque cursor, and the
+next page continues with a keyset query on the (updated_at, id) and (deleted_at, id) indexes.
+
+Rows are timestamped before their transaction commits, so changes younger than
+PLACE_SYNC_DELAY seconds are held back until every transaction that could still commit with
+an older timestamp is done.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Place, PlaceTombstone
+
+PLACE = 0
+TOMBSTONE = 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(ValueError):
+    pass
+
+
+def encode_cursor(position):
+    changed_at, kind, pk = position
+    value = f'{changed_at.isoformat()}|{kind}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        changed_at, kind, pk = value.split('|')
+        position = datetime.fromisoformat(changed_at), int(kind), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+    if position[0].tzinfo is None or position[1] not in (PLACE, TOMBSTONE):
+        raise InvalidCursor(cursor)
+    return position
+
+
+def _after(kind, time_field, position):
+    """
+    Returns the filter for rows of `kind` that come after the position.
+    """
+    changed_at, position_kind, pk = position
+    later = Q(**{f'{time_field}__gt': changed_at})
+    if kind > position_kind:
+        return later | Q(**{time_field: changed_at})
+    if kind == position_kind:
+        return later | Q(**{time_field: changed_at, 'pk__gt': pk})
+    return later
+
+
+def get_changes(cursor=None, limit=None):
+    """
+    Returns the changed places, the public_ids of removed ones, the cursor to continue from
+    and whether there may be more changes, at most `limit` changes in total. Without a cursor
+    only active places are returned, which is everything a client syncing for the first time
+    needs.
+
+    Raises InvalidCursor for malformed cursors and ExpiredCursor for positions older than
+    the tombstones that are kept, in which case the client has to sync from scratch.
+    """
+    limit = limit or settings.PLACE_SYNC_PAGE_SIZE
+    until = timezone.now() - timedelta(seconds=settings.PLACE_SYNC_DELAY)
+
+    places = Place.objects.filter(updated_at__lte=until).order_by('updated_at', 'id')
+    if cursor is None:
+        position = None
+        places = places.filter(is_active=True)
+    else:
+        position = decode_cursor(cursor)
+        if position[0] < timezone.now() - timedelta(days=settings.PLACE_TOMBSTONE_RETENTION_DAYS):
+            raise ExpiredCursor(cursor)
+        places = places.filter(_after(PLACE, 'updated_at', position))
+
+    changes = [((place.updated_at, PLACE, place.pk), place) for place in places[:limit]]
+
+    if position is not None:
+        tombstones = PlaceTombstone.objects.filter(_after(TOMBSTONE, 'deleted_at', position),
+                                                   deleted_at__lte=until).order_by('deleted_at', 'id')
+        changes += [((tombstone.deleted_at, TOMBSTONE, tombstone.pk), tombstone)
+                    for tombstone in tombstones[:limit]]
+        changes.sort(key=lambda change: change[0])
+        changes = changes[:limit]
+
+    changed, removed = [], []
+    for (_, kind, _), row in changes:
+        if kind == PLACE and row.is_active:
+            changed.append(row)
+        else:
+            removed.append(row.public_id)
+
+    if changes:
+        cursor = encode_cursor(changes[-1][0])
+    elif cursor is None:
+        cursor = encode_cursor((until, TOMBSTONE, 0))
+    return changed, removed, cursor, len(changes) == limit
@@ -1,8 +1,43 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, AsyncRequestFactory, override_settings
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
-from .models import Place, PlacePhoto, PlacePhotoLike
+from rest_framework_simplejwt.tokens import AccessToken
+
+from DigitalLurker.asyncviews import ErrorResponse
+from DigitalLurker.db import replicas
+from DigitalLurker.fieldsets import parse_fieldset
+from jobs.models import Job
+from . import async_views, realtime, summary, trending, views
+from .deletion import schedule_user_deletion, schedule_place_deletion
+from .models import Place, PlacePhoto, PlacePhotoLike, PlaceContributor, PlaceNeighbour, DeletionTask, \
+    TrendingLandmark
+from .nearby import nearby_photos
+from .realtime import LikeBroker, like_stream
+from .representations import place_rows, place_data, place_photo_rows, place_photo_data
+from .serializers import PlaceSerializer, PlacePhotoSerializer
 
 User = get_user_model()
 
@@ -77,7 +112,11 @@ class PlaceViewSetTestCase(TestCase):
 
         response = self.client.delete(f'/places/{place.public_id}/', format='json', redirect=True)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Place.objects.get().is_active)
+
+        call_command('processdeletions', stdout=StringIO())
         self.assertEqual(Place.objects.all().count(), 0)
+        self.assertEqual(DeletionTask.objects.get().status, DeletionTask.STATUS_DONE)
 
 
 class PlacePhotoTestCase(TestCase):
@@ -209,3 +248,1148 @@ class PlacePhotoLikeTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(PlacePhotoLike.objects.all().count(), 0)
         self.assertEqual(place_photo.likes.all().count(), 0)
+
+
+class DeleteOrphanMediaTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_superuser(email='admin@admin.com',
+                                                  username='testuser',
+                                                  password='testpass',
+                                                  date_of_birth='2001-01-01')
+        place = Place.objects.create(name='Test Place',
+                                     location='POINT(1.234 5.678)',
+                                     added_by=self.user,
+                                     experience=40)
+        PlacePhoto.objects.create(owner=self.user,
+                                  place=place,
+                                  title='title',
+                                  image='place_photos/kept.png')
+
+        two_hours_ago = time.time() - 2 * 60 * 60
+        for name, modified in [('place_photos/kept.png', two_hours_ago),
+                               ('place_photos/orphan.png', two_hours_ago),
+                               ('place_photos/uploading.png', None),
+                               ('defaults/places/default.png', two_hours_ago)]:
+            path = os.path.join(self.media_root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'image')
+            if modified is not None:
+                os.utime(path, (modified, modified))
+
+    def remaining_files(self):
+        return sorted(os.path.relpath(os.path.join(directory, name), self.media_root.name)
+                      for directory, _, names in os.walk(self.media_root.name)
+                      for name in names)
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('deleteorphanmedia', dry_run=True, sleep=0, stdout=out)
+        self.assertIn('Would delete 1 orphaned files', out.getvalue())
+        self.assertEqual(len(self.remaining_files()), 4)
+
+    def test_delete_orphans(self):
+        call_command('deleteorphanmedia', sleep=0, stdout=StringIO())
+        self.assertEqual(self.remaining_files(), ['defaults/places/default.png',
+                                                  'place_photos/kept.png',
+                                                  'place_photos/uploading.png'])
+
+
+class DeletionTaskTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.other_user = User.objects.create_user(email='other@user.com',
+                                                   username='otheruser',
+                                                   password='testpass',
+                                                   date_of_birth='2001-01-01')
+
+        own_place = Place.objects.create(name='Own Place',
+                                         location='POINT(1.234 5.678)',
+                                         added_by=self.user,
+                                         experience=40)
+        other_place = Place.objects.create(name='Other Place',
+                                           location='POINT(1.234 5.678)',
+                                           added_by=self.other_user,
+                                           experience=40)
+
+        for place in [own_place, other_place]:
+            for owner in [self.user, self.other_user]:
+                photo = PlacePhoto.objects.create(owner=owner, place=place, title='title')
+                PlacePhotoLike.objects.create(owner=self.user, place_photo=photo)
+                PlacePhotoLike.objects.create(owner=self.other_user, place_photo=photo)
+
+    def test_user_deletion(self):
+        task = schedule_user_deletion(self.user)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(task.status, DeletionTask.STATUS_PENDING)
+
+        call_command('processdeletions', batch_size=2, stdout=StringIO())
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.STATUS_DONE)
+        self.assertEqual(task.progress, 100)
+        self.assertEqual((task.deleted_rows, task.total_rows), (12, 12))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(Place.objects.values_list('name', flat=True)), ['Other Place'])
+        self.assertEqual(PlacePhoto.objects.count(), 1)
+        self.assertEqual(PlacePhotoLike.objects.count(), 1)
+
+
+@override_settings(LIKE_STREAM_INTERVAL=0.01, LIKE_STREAM_HEARTBEAT=5, LIKE_STREAM_MAX_TOPICS=10)
+class LikeStreamTestCase(SimpleTestCase):
+    photo = str(uuid.uuid4())
+    place = str(uuid.uuid4())
+
+    async def test_updates_are_coalesced(self):
+        broker = LikeBroker()
+        subscription = broker.subscribe([self.photo])
+
+        for like_count in [1, 2, 3]:
+            broker.publish(self.photo, self.place, like_count)
+
+        updates = await asyncio.wait_for(subscription.wait(), 1)
+        self.assertEqual(updates, [{'photo': self.photo, 'place': self.place, 'like_count': 3}])
+
+    async def test_place_subscription(self):
+        broker = LikeBroker()
+        subscription = broker.subscribe([self.place])
+        other = broker.subscribe([str(uuid.uuid4())])
+
+        broker.publish(self.photo, self.place, 7)
+
+        updates = await asyncio.wait_for(subscription.wait(), 1)
+        self.assertEqual(updates[0]['like_count'], 7)
+        self.assertEqual(other.pending, {})
+
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other)
+        self.assertEqual(broker.subscribers, {})
+
+    async def test_server_sent_events(self):
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message.get('more_body'):
+                disconnect.set()
+
+        scope = {'type': 'http', 'path': '/stream/likes/', 'query_string': f'photos={self.photo}'.encode()}
+        stream = asyncio.ensure_future(like_stream(scope, receive, send))
+        while not realtime.broker.has_subscribers(self.photo):
+            await asyncio.sleep(0)
+
+        realtime.broker.publish(self.photo, self.place, 5)
+        await asyncio.wait_for(stream, 1)
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn('"like_count": 5'.encode(), sent[1]['body'])
+        self.assertTrue(sent[1]['body'].startswith(b'event: like_count\n'))
+        self.assertFalse(realtime.broker.has_subscribers(self.photo))
+
+    async def test_server_sent_events_without_topics(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await like_stream({'type': 'http', 'path': '/stream/likes/', 'query_string': b'photos=nope'}, None, send)
+        self.assertEqual(sent[0]['status'], 400)
+
+
+class AsyncReadViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@admin.com',
+                                                  username='testuser',
+                                                  password='testpass',
+                                                  date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.234 5.678)',
+                                          added_by=self.user,
+                                          experience=40)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.photo)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.factory = AsyncRequestFactory()
+        self.token = f'Bearer {AccessToken.for_user(self.user)}'
+
+    def assertSameResponse(self, async_response, sync_response):
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+    async def test_place_retrieve(self):
+        url = f'/places/{self.place.public_id}/'
+        sync_response = await sync_to_async(self.client.get)(url, HTTP_POINT='POINT(1 5)')
+        async_response = await async_views.place_retrieve(self.factory.get(url, HTTP_POINT='POINT(1 5)'),
+                                                          self.place.public_id)
+        self.assertSameResponse(async_response, sync_response)
+
+    async def test_place_list(self):
+        sync_response = await sync_to_async(self.client.get)('/places/search/?q=test')
+        async_response = await async_views.place_list(
+            self.factory.get('/places/search/?q=test', HTTP_AUTHORIZATION=self.token))
+        self.assertSameResponse(async_response, sync_response)
+
+        async_response = await async_views.place_list(self.factory.get('/places/search/'))
+        self.assertEqual(async_response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_place_photo_list(self):
+        url = f'/places/{self.place.public_id}/photos/'
+        sync_response = await sync_to_async(self.client.get)(url)
+        async_response = await async_views.place_photo_list(self.factory.get(url, HTTP_AUTHORIZATION=self.token),
+                                                            self.place.public_id)
+        self.assertSameResponse(async_response, sync_response)
+
+        with self.assertRaises(ErrorResponse):
+            await async_views.place_photo_list(self.factory.get(f'{url}?page=2'), self.place.public_id)
+
+    async def test_place_photo_like_retrieve(self):
+        url = f'/places/{self.place.public_id}/photos/{self.photo.public_id}/likes/'
+        sync_response = await sync_to_async(self.client.get)(url)
+        async_response = await async_views.place_photo_like_retrieve(
+            self.factory.get(url, HTTP_AUTHORIZATION=self.token), self.place.public_id, self.photo.public_id)
+        self.assertSameResponse(async_response, sync_response)
+        self.assertTrue(json.loads(async_response.content)['exists'])
+
+
+class ObjectCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.234 5.678)',
+                                          added_by=self.user,
+                                          experience=40)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+
+    def test_place_is_cached(self):
+        url = f'/places/{self.place.public_id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.data['distance'], 0)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_POINT='POINT(1 5)')
+        self.assertEqual(response.data['name'], 'Test Place')
+        self.assertGreater(response.data['distance'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place.name = 'Updated Place'
+            self.place.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Updated Place')
+
+    def test_photo_merges_user_fields(self):
+        url = f'/places/{self.place.public_id}/photos/{self.photo.public_id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.data['like_count'], 0)
+        self.assertFalse(response.data['liked'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlacePhotoLike.objects.create(owner=self.user, place_photo=self.photo)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertTrue(response.data['liked'])
+
+        self.client.force_authenticate(user=None)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertFalse(response.data['liked'])
+
+    def test_owner_changes_invalidate_photo(self):
+        url = f'/places/{self.place.public_id}/photos/{self.photo.public_id}/'
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Name'
+            self.user.save()
+        self.assertEqual(self.client.get(url).data['owner']['first_name'], 'Name')
+
+    def test_missing_objects(self):
+        self.assertEqual(self.client.get(f'/places/{uuid.uuid4()}/').status_code, status.HTTP_404_NOT_FOUND)
+
+        url = f'/places/{self.place.public_id}/photos/{self.photo.public_id}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photo.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.234 5.678)',
+                                          added_by=self.user,
+                                          experience=40)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+
+    def test_place(self):
+        url = f'/places/{self.place.public_id}/'
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_POINT='POINT(1 5)')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place.name = 'Updated Place'
+            self.place.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Updated Place')
+
+    def test_place_photo(self):
+        url = f'/places/{self.place.public_id}/photos/{self.photo.public_id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # The response of an authenticated user includes whether they liked the photo.
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_place_photo_list(self):
+        url = f'/places/{self.place.public_id}/photos/'
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlacePhotoLike.objects.create(owner=self.user, place_photo=self.photo)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['like_count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(PLACE_SYNC_DELAY=0, PLACE_SYNC_PAGE_SIZE=2)
+class PlaceSyncTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.places = [Place.objects.create(name=f'Place {index}',
+                                            location='POINT(1.234 5.678)',
+                                            added_by=self.user,
+                                            experience=40) for index in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, since=None):
+        changed, removed = [], []
+        url = '/places/sync/' + (f'?since={since}' if since else '')
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            changed += [place['public_id'] for place in response.data['changed']]
+            removed += response.data['removed']
+            url, since = response.data['next'], response.data['since']
+        return changed, removed, since
+
+    def test_initial_sync(self):
+        self.places[0].is_active = False
+        self.places[0].save()
+
+        changed, removed, _ = self.sync()
+        self.assertEqual(changed, [str(place.public_id) for place in self.places[1:]])
+        self.assertEqual(removed, [])
+
+    def test_incremental_sync(self):
+        _, _, since = self.sync()
+        self.assertEqual(self.sync(since), ([], [], since))
+
+        self.places[1].name = 'Updated'
+        self.places[1].save()
+        schedule_place_deletion(self.places[2])
+        deleted_public_id = self.places[0].public_id
+        self.places[0].delete()
+
+        changed, removed, since = self.sync(since)
+        self.assertEqual(changed, [str(self.places[1].public_id)])
+        self.assertEqual(removed, [self.places[2].public_id, deleted_public_id])
+        self.assertEqual(self.sync(since)[:2], ([], []))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/places/sync/?since=nonsense')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(PLACE_TOMBSTONE_RETENTION_DAYS=0):
+            _, _, since = self.sync()
+            response = self.client.get(f'/places/sync/?since={since}')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_reads_from_primary(self):
+        read_from_replica = []
+
+        def get_changes(since):
+            read_from_replica.append(replicas.reads_from_replica())
+            return [], [], 'cursor', False
+
+        with mock.patch.object(replicas, 'replica_aliases', return_value=['replica_1']), \
+                mock.patch.object(views, 'get_changes', get_changes):
+            response = self.client.get('/places/sync/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_from_replica, [False])
+
+
+class ExportPlacesTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@admin.com',
+                                                  username='testuser',
+                                                  password='testpass',
+                                                  date_of_birth='2001-01-01')
+        self.inside = Place.objects.create(name='Inside',
+                                           location='POINT(1.5 5.5)',
+                                           added_by=self.user,
+                                           experience=40)
+        self.outside = Place.objects.create(name='Outside',
+                                            location='POINT(20 20)',
+                                            added_by=self.user,
+                                            experience=40,
+                                            is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_ndjson(self):
+        response = self.client.get('/places/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['name'] for record in records], ['Inside', 'Outside'])
+        self.assertEqual((records[0]['longitude'], records[0]['latitude']), (1.5, 5.5))
+        self.assertEqual(records[0]['added_by'], str(self.user.public_id))
+
+        response = self.client.get('/places/export/?bbox=1,5,2,6')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    def test_geojson(self):
+        response = self.client.get('/places/export/?output=geojson&is_active=false')
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 1)
+        self.assertEqual(collection['features'][0]['id'], str(self.outside.public_id))
+        self.assertEqual(collection['features'][0]['geometry'], {'type': 'Point', 'coordinates': [20, 20]})
+
+    def test_asgi(self):
+        request = AsyncRequestFactory().get('/places/export/')
+        force_authenticate(request, user=self.user)
+        response = views.PlaceViewSet.as_view({'get': 'export'})(request)
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        records = [json.loads(line) for line in async_to_sync(read)().decode().splitlines()]
+        self.assertEqual([record['name'] for record in records], ['Inside', 'Outside'])
+
+    def test_not_admin(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='user@user.com',
+                                                                     username='user',
+                                                                     password='testpass',
+                                                                     date_of_birth='2001-01-01'))
+        self.assertEqual(self.client.get('/places/export/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('exportplaces', '--output-format', 'geojson', '--active', '--chunk-size', '1', stdout=stdout)
+        collection = json.loads(stdout.getvalue())
+        self.assertEqual([feature['properties']['name'] for feature in collection['features']], ['Inside'])
+
+
+class BulkImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@admin.com',
+                                                  username='testuser',
+                                                  password='testpass',
+                                                  date_of_birth='2001-01-01')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        settings_override = override_settings(MEDIA_ROOT=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_csv_upsert(self):
+        path = self.write('places.csv', 'external_id,name,experience,longitude,latitude\n'
+                                        'a,First,10,1.5,5.5\n'
+                                        'b,Second,wrong,1.5,5.5\n'
+                                        ',Third,30,200,5.5\n'
+                                        ',Fourth,40,1,2\n')
+        stdout, stderr = StringIO(), StringIO()
+        call_command('importplaces', path, '--added-by', 'testuser', '--batch-size', '2', stdout=stdout, stderr=stderr)
+
+        self.assertIn('2 places created, 0 updated, 2 rows failed.', stdout.getvalue())
+        self.assertIn('row 2: {"experience"', stderr.getvalue())
+        self.assertIn('row 3: {"longitude"', stderr.getvalue())
+        self.assertEqual(sorted(Place.objects.values_list('name', flat=True)), ['First', 'Fourth'])
+
+        path = self.write('update.csv', 'external_id,name,experience,longitude,latitude,is_active\n'
+                                        'a,Renamed,10,1.5,5.5,false\n')
+        call_command('importplaces', path, '--added-by', 'testuser', stdout=stdout, stderr=stderr)
+        place = Place.objects.get(external_id='a')
+        self.assertEqual(place.name, 'Renamed')
+        self.assertFalse(place.is_active)
+        self.assertEqual(Place.objects.count(), 2)
+
+    def test_geojson_endpoint(self):
+        collection = {'type': 'FeatureCollection',
+                      'features': [{'type': 'Feature',
+                                    'geometry': {'type': 'Point', 'coordinates': [index, 5]},
+                                    'properties': {'external_id': f'id-{index}', 'name': f'Place {index}',
+                                                   'experience': 20}}
+                                   for index in range(3)]}
+        collection['features'].append({'type': 'Feature', 'geometry': None, 'properties': {}})
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with open(self.write('places.geojson', json.dumps(collection)), 'rb') as file:
+            response = client.post('/places/import/', {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['input_format'], 'geojson')
+
+        call_command('runjobs', '--once', stdout=StringIO())
+
+        response = client.get(f'/places/import/{response.data["id"]}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['created_count'], 3)
+        self.assertEqual(response.data['failed_count'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        self.assertEqual(Place.objects.get(external_id='id-2').location.x, 2)
+
+    def test_export_round_trip(self):
+        Place.objects.create(name='Exported', location='POINT(1 2)', added_by=self.user, experience=5,
+                             external_id='exported')
+        path = os.path.join(self.directory.name, 'places.ndjson')
+        call_command('exportplaces', '--file', path)
+
+        Place.objects.all().delete()
+        call_command('importplaces', path, '--added-by', 'testuser', stdout=StringIO(), stderr=StringIO())
+        place = Place.objects.get()
+        self.assertEqual((place.name, place.external_id, place.location.y), ('Exported', 'exported', 2))
+
+
+class RepresentationsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01',
+                                             first_name='Zoë')
+        self.other = User.objects.create_user(email='other@user.com',
+                                              username='otheruser',
+                                              password='testpass',
+                                              date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.234 5.678)',
+                                          added_by=self.user,
+                                          experience=40,
+                                          description='Ünïcode')
+        other_place = Place.objects.create(name='Other Place',
+                                           location='POINT(-3 4)',
+                                           added_by=self.user,
+                                           experience=25)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title', image='photo.jpg')
+        PlacePhoto.objects.create(owner=self.user, place=self.place, title='second', description='second')
+        PlacePhoto.objects.create(owner=self.user, place=other_place, title='other')
+        PlacePhoto.objects.create(owner=self.other, place=self.place, title='by other')
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.photo)
+        PlacePhotoLike.objects.create(owner=self.other, place_photo=self.photo)
+        self.factory = APIRequestFactory()
+
+    def request(self, user=None, **headers):
+        request = Request(self.factory.get('/places/search/', **headers))
+        request.user = user or AnonymousUser()
+        return request
+
+    def assertSameJSON(self, first, second):
+        self.assertEqual(JSONRenderer().render(first), JSONRenderer().render(second))
+
+    def test_places_match_serializer(self):
+        for request in (self.request(), self.request(HTTP_POINT='POINT(1 5)')):
+            queryset = Place.objects.order_by('id')
+            self.assertSameJSON(place_data(place_rows(queryset), request),
+                                PlaceSerializer(queryset, many=True, context={'request': request}).data)
+
+    def test_photos_match_serializer(self):
+        for request in (self.request(), self.request(self.user, HTTP_POINT='POINT(1 5)')):
+            queryset = PlacePhoto.objects.order_by('id')
+            self.assertSameJSON(place_photo_data(place_photo_rows(queryset), request),
+                                PlacePhotoSerializer(queryset, many=True, context={'request': request}).data)
+
+    def test_photo_queries_do_not_grow_with_rows(self):
+        request = self.request(self.user)
+        with self.assertNumQueries(3):
+            place_photo_data(place_photo_rows(PlacePhoto.objects.order_by('id')), request)
+
+    def test_invalid_point(self):
+        with self.assertRaises(ValidationError):
+            place_data(place_rows(Place.objects.all()), self.request(HTTP_POINT='nowhere'))
+
+    def test_list_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser(email='admin@admin.com',
+                                                                     username='admin',
+                                                                     password='testpass',
+                                                                     date_of_birth='2001-01-01'))
+        response = client.get('/places/search/', {'q': 'test'})
+        self.assertEqual([place['name'] for place in response.data['results']], ['Test Place'])
+
+        response = client.get(f'/places/{self.place.public_id}/photos/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'][0]['like_count'], 2)
+        self.assertEqual(response.data['results'][0]['owner']['total_experience'], 65)
+
+    def test_sparse_fieldsets_match_serializer(self):
+        request = self.request(self.user, HTTP_POINT='POINT(1 5)')
+        queryset = PlacePhoto.objects.order_by('id')
+        for query in [{'fields': 'image,like_count'},
+                      {'fields': 'title,owner,place'},
+                      {'fields': 'liked,owner.username,place.distance'},
+                      {'fields': 'public_id', 'expand': 'owner'}]:
+            fieldset = parse_fieldset(query)
+            self.assertSameJSON(place_photo_data(place_photo_rows(queryset, fieldset), request, fieldset),
+                                PlacePhotoSerializer(queryset, many=True, fieldset=fieldset,
+                                                     context={'request': request}).data)
+
+    def test_unselected_fields_are_not_queried(self):
+        fieldset = parse_fieldset({'fields': 'image,title,owner.username'})
+        rows = list(place_photo_rows(PlacePhoto.objects.order_by('id'), fieldset))
+        self.assertEqual(set(rows[0]), {'id', 'image', 'title', 'owner__username'})
+
+        with self.assertNumQueries(0):
+            place_photo_data(rows, self.request(self.user), fieldset)
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.234 5.678)',
+                                          added_by=self.user,
+                                          experience=40)
+        self.photo = PlacePhoto.objects.create(owner=self.user, place=self.place, title='title')
+        self.client = APIClient()
+
+    def test_photo_list(self):
+        url = f'/places/{self.place.public_id}/photos/'
+        response = self.client.get(url, {'fields': 'title,like_count'})
+        self.assertEqual(response.data['results'], [{'title': 'title', 'like_count': 0}])
+
+        response = self.client.get(url, {'fields': 'place', 'expand': 'owner'})
+        self.assertEqual(response.data['results'][0]['place'], str(self.place.public_id))
+        self.assertEqual(response.data['results'][0]['owner']['total_experience'], 40)
+
+        response = self.client.get(url, {'fields': 'owner.password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_details(self):
+        response = self.client.get(f'/places/{self.place.public_id}/', {'fields': 'name'})
+        self.assertEqual(response.data, {'name': 'Test Place'})
+        etag = response['ETag']
+
+        # The selection is part of the ETag.
+        response = self.client.get(f'/places/{self.place.public_id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('distance', response.data)
+
+        response = self.client.get(f'/places/{self.place.public_id}/photos/{self.photo.public_id}/',
+                                   {'fields': 'title,owner,place.name'})
+        self.assertEqual(response.data, {'owner': str(self.user.public_id),
+                                         'place': {'name': 'Test Place'},
+                                         'title': 'title'})
+
+
+class CompactOutputTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place',
+                                          location='POINT(1.23456789 5.67891234)',
+                                          added_by=self.user,
+                                          experience=40)
+        for index in range(3):
+            PlacePhoto.objects.create(owner=self.user, place=self.place, title=f'photo {index}')
+        self.client = APIClient()
+
+    def test_coordinates(self):
+        url = f'/places/{self.place.public_id}/'
+        self.assertTrue(self.client.get(url).data['location'].startswith('SRID=4326;POINT'))
+        self.assertEqual(self.client.get(url, {'location': 'coordinates'}).data['location'], [1.234568, 5.678912])
+        self.assertEqual(self.client.get(url, {'location': 'coordinates', 'precision': 2}).data['location'],
+                         [1.23, 5.68])
+        self.assertEqual(self.client.get(url, {'location': 'coordinates', 'precision': 99}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_coordinates_match_serializer(self):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = AnonymousUser()
+        queryset = PlacePhoto.objects.order_by('id')
+        self.assertEqual(
+            JSONRenderer().render(place_photo_data(place_photo_rows(queryset), request, precision=3)),
+            JSONRenderer().render(PlacePhotoSerializer(queryset, many=True,
+                                                       context={'request': request, 'location_precision': 3}).data))
+
+    def test_place_table(self):
+        response = self.client.get(f'/places/{self.place.public_id}/photos/',
+                                   {'places': 'table', 'location': 'coordinates', 'precision': 1})
+        self.assertEqual({photo['place'] for photo in response.data['results']}, {str(self.place.public_id)})
+        self.assertEqual(len(response.data['places']), 1)
+        self.assertEqual(response.data['places'][0]['public_id'], str(self.place.public_id))
+        self.assertEqual(response.data['places'][0]['location'], [1.2, 5.7])
+
+        response = self.client.get(f'/places/{self.place.public_id}/photos/',
+                                   {'places': 'table', 'fields': 'title,place.name'})
+        self.assertEqual(response.data['places'], [{'public_id': str(self.place.public_id), 'name': 'Test Place'}])
+
+
+class NearbyPhotosTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.near = Place.objects.create(name='Near', location='POINT(21.01 52.2)', added_by=self.user, experience=5)
+        self.far = Place.objects.create(name='Far', location='POINT(21.5 52.2)', added_by=self.user, experience=5)
+        self.inactive = Place.objects.create(name='Inactive', location='POINT(21.01 52.2)', added_by=self.user,
+                                             experience=5, is_active=False)
+        self.photos = [PlacePhoto.objects.create(owner=self.user, place=self.near, title=f'photo {index}')
+                       for index in range(3)]
+        PlacePhoto.objects.create(owner=self.user, place=self.far, title='far')
+        PlacePhoto.objects.create(owner=self.user, place=self.inactive, title='inactive')
+        self.client = APIClient()
+
+    def feed(self, url='/places/photos/nearby/', **params):
+        titles = []
+        while url:
+            response = self.client.get(url, params, HTTP_POINT='POINT(21 52.2)')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [photo['title'] for photo in response.data['results']]
+            url, params = response.data['next'], {}
+        return titles
+
+    def test_feed(self):
+        self.assertEqual(PlacePhoto.objects.get(title='far').geohash, 'u3r2cnxz433b')
+
+        with override_settings(NEARBY_PHOTOS_PAGE_SIZE=2):
+            self.assertEqual(self.feed(), ['photo 2', 'photo 1', 'photo 0'])
+        cache.clear()
+        self.assertEqual(self.feed(radius=50000), ['far', 'photo 2', 'photo 1', 'photo 0'])
+
+        # Read from the photo table alone.
+        self.assertNotIn('place_place', str(nearby_photos(Point(21, 52.2, srid=4326), 5000).query))
+
+    def test_place_deactivated(self):
+        self.near.is_active = False
+        self.near.save()
+        self.assertFalse(PlacePhoto.objects.get(pk=self.photos[0].pk).place_is_active)
+        self.assertEqual(self.feed(), [])
+
+        self.near.is_active = True
+        self.near.save()
+        cache.clear()
+        self.assertEqual(self.feed(), ['photo 2', 'photo 1', 'photo 0'])
+
+        schedule_place_deletion(self.near)
+        cache.clear()
+        self.assertEqual(self.feed(), [])
+
+    def test_place_moved(self):
+        self.near.location = 'POINT(30 52.2)'
+        self.near.save()
+        self.assertEqual(PlacePhoto.objects.get(pk=self.photos[0].pk).geohash[:4], 'u9m2')
+        self.assertEqual(str(PlacePhoto.objects.get(pk=self.photos[0].pk).location), str(self.near.location))
+        self.assertEqual(self.feed(), [])
+
+    def test_small_radius(self):
+        # The point is 137 m north of the center of its cell of 6 characters.
+        north = Place.objects.create(name='North', location='POINT(21 52.20036)', added_by=self.user, experience=5)
+        south = Place.objects.create(name='South', location='POINT(21 52.19865)', added_by=self.user, experience=5)
+        PlacePhoto.objects.create(owner=self.user, place=north, title='40 m north')
+        PlacePhoto.objects.create(owner=self.user, place=south, title='150 m south')
+        self.assertEqual(self.feed(radius=100), ['40 m north'])
+        self.assertEqual(self.feed(radius=200), ['150 m south', '40 m north'])
+
+    def test_cached_per_bucket(self):
+        self.assertEqual(self.feed(), ['photo 2', 'photo 1', 'photo 0'])
+        PlacePhoto.objects.create(owner=self.user, place=self.near, title='new')
+        self.assertEqual(self.feed(), ['photo 2', 'photo 1', 'photo 0'])
+        cache.clear()
+        self.assertEqual(self.feed(), ['new', 'photo 2', 'photo 1', 'photo 0'])
+
+    def test_invalid_parameters(self):
+        url = '/places/photos/nearby/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        for params in [{'radius': 0}, {'radius': 10 ** 9}, {'cursor': 'nonsense'}]:
+            response = self.client.get(url, params, HTTP_POINT='POINT(21 52.2)')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MyPhotosTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.other = User.objects.create_user(email='other@user.com',
+                                              username='other',
+                                              password='testpass',
+                                              date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Place', location='POINT(21 52.2)', added_by=self.user, experience=5)
+        self.photos = [PlacePhoto.objects.create(owner=self.user, place=self.place, title=f'photo {index}')
+                       for index in range(5)]
+        PlacePhoto.objects.create(owner=self.other, place=self.place, title='other')
+        PlacePhotoLike.objects.create(owner=self.other, place_photo=self.photos[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, **params):
+        pages, url = [], '/places/photos/mine/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['results'])
+            url, params = response.data['next'], {}
+        return pages
+
+    def test_pages(self):
+        with override_settings(MY_PHOTOS_PAGE_SIZE=2):
+            pages = self.pages()
+        self.assertEqual([[photo['title'] for photo in page] for page in pages],
+                         [['photo 4', 'photo 3'], ['photo 2', 'photo 1'], ['photo 0']])
+        self.assertEqual(pages[2][0]['like_count'], 1)
+        self.assertEqual(pages[2][0]['place']['name'], 'Place')
+
+    def test_grid(self):
+        page, = self.pages(view='grid')
+        self.assertEqual(page[-1], {'public_id': str(self.photos[0].public_id),
+                                    'image': page[-1]['image'],
+                                    'like_count': 1})
+        self.assertEqual(len(page), 5)
+
+    def test_constant_queries(self):
+        PlacePhoto.objects.bulk_create([PlacePhoto(owner=self.user, place=self.place, title='more',
+                                                   location=self.place.location)
+                                        for _ in range(100)])
+        with self.assertNumQueries(2):
+            self.client.get('/places/photos/mine/', {'view': 'grid'})
+        with self.assertNumQueries(4):
+            self.client.get('/places/photos/mine/')
+
+    def test_invalid_parameters(self):
+        for params in [{'view': 'list'}, {'cursor': 'nonsense'}]:
+            response = self.client.get('/places/photos/mine/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/places/photos/mine/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TrendingPhotosTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.others = [User.objects.create_user(email=f'other{index}@user.com',
+                                                username=f'other{index}',
+                                                password='testpass',
+                                                date_of_birth='2001-01-01') for index in range(3)]
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.user, experience=5)
+        self.old, self.new, self.unliked = [PlacePhoto.objects.create(owner=self.user, place=self.place, title=title)
+                                            for title in ['old', 'new', 'unliked']]
+        two_half_lives_ago = timezone.now() - timedelta(seconds=2 * settings.TRENDING_HALF_LIFE)
+        for owner in self.others[:3]:
+            PlacePhotoLike.objects.create(owner=owner, place_photo=self.old, created_at=two_half_lives_ago)
+        self.client = APIClient()
+
+    def titles(self, url='/places/photos/trending/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [photo['title'] for photo in response.data['results']]
+
+    def test_recent_likes_rank_first(self):
+        self.assertEqual(self.titles(), ['old'])
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f'/places/{self.place.public_id}/photos/{self.new.public_id}/likes/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Three likes of two half-lives ago weigh 0.75, one like of now 1.
+        self.assertEqual(self.titles(), ['new', 'old'])
+        self.assertEqual(self.titles(f'/places/{self.place.public_id}/photos/trending/'), ['new', 'old'])
+        self.assertEqual(PlacePhoto.objects.get(pk=self.old.pk).like_count, 3)
+
+        self.client.delete(f'/places/{self.place.public_id}/photos/{self.new.public_id}/likes/')
+        self.assertEqual(self.titles(), ['old'])
+        self.assertEqual(PlacePhoto.objects.get(pk=self.new.pk).like_count, 0)
+
+    def test_inactive_places_are_left_out(self):
+        self.place.is_active = False
+        self.place.save()
+        self.assertEqual(self.titles(), [])
+        self.assertEqual(self.titles(f'/places/{self.place.public_id}/photos/trending/'), ['old'])
+
+    def test_rescale(self):
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.new)
+        scores = dict(PlacePhoto.objects.values_list('title', 'trending_score'))
+        landmark = trending.get_landmark()
+
+        trending.rescale(landmark + timedelta(seconds=settings.TRENDING_HALF_LIFE))
+        self.assertEqual(trending.get_landmark(), landmark + timedelta(seconds=settings.TRENDING_HALF_LIFE))
+        for title, score in PlacePhoto.objects.values_list('title', 'trending_score'):
+            self.assertAlmostEqual(score, scores[title] / 2)
+        self.assertEqual(self.titles(), ['new', 'old'])
+
+        trending.rescale(landmark + timedelta(days=365))
+        self.assertEqual(set(PlacePhoto.objects.values_list('trending_score', flat=True)), {0})
+
+    def test_rescale_scheduled(self):
+        TrendingLandmark.objects.update(landmark=timezone.now() - timedelta(days=400))
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.new)
+        PlacePhotoLike.objects.create(owner=self.others[0], place_photo=self.new)
+        self.assertEqual(Job.objects.filter(name='place.rescale_trending').count(), 1)
+
+        call_command('runjobs', '--once', stdout=StringIO())
+        self.assertLess(timezone.now() - trending.get_landmark(), timedelta(minutes=1))
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.unliked)
+        self.assertAlmostEqual(PlacePhoto.objects.get(pk=self.unliked.pk).trending_score, 1, places=2)
+        self.assertEqual(Job.objects.filter(name='place.rescale_trending').count(), 1)
+
+
+class PlaceSummaryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.other = User.objects.create_user(email='other@user.com',
+                                              username='otheruser',
+                                              password='testpass',
+                                              date_of_birth='2001-01-01')
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.user, experience=5)
+        self.photos = [PlacePhoto.objects.create(owner=self.user, place=self.place, title=f'photo {index}',
+                                                 image=f'photo{index}.jpg') for index in range(4)]
+        self.other_photo = PlacePhoto.objects.create(owner=self.other, place=self.place, title='other')
+        self.client = APIClient()
+
+    def summary(self):
+        cache.clear()
+        response = self.client.get(f'/places/{self.place.public_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return (response.data['photo_count'], response.data['contributor_count'],
+                [photo['title'] for photo in response.data['top_photos']])
+
+    def test_counts(self):
+        self.assertEqual(self.summary(), (5, 2, ['photo 0', 'photo 1', 'photo 2']))
+
+        updated_at = Place.objects.get(pk=self.place.pk).updated_at
+        PlacePhoto.objects.create(owner=self.other, place=self.place, title='new')
+        self.assertGreater(Place.objects.get(pk=self.place.pk).updated_at, updated_at)
+        self.assertEqual(self.summary(), (6, 2, ['photo 0', 'photo 1', 'photo 2']))
+        PlacePhoto.objects.get(title='new').delete()
+
+        self.other_photo.delete()
+        self.assertEqual(self.summary(), (4, 1, ['photo 0', 'photo 1', 'photo 2']))
+
+        self.photos[0].delete()
+        self.assertEqual(self.summary(), (3, 1, ['photo 1', 'photo 2', 'photo 3']))
+
+    def test_top_photos_follow_likes(self):
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.other_photo)
+        PlacePhotoLike.objects.create(owner=self.other, place_photo=self.other_photo)
+        PlacePhotoLike.objects.create(owner=self.user, place_photo=self.photos[3])
+        self.assertEqual(self.summary(), (5, 2, ['other', 'photo 3', 'photo 0']))
+
+        cache.clear()
+        response = self.client.get(f'/places/{self.place.public_id}/')
+        self.assertEqual(response.data['top_photos'][0],
+                         {'public_id': str(self.other_photo.public_id), 'image': None, 'title': 'other',
+                          'like_count': 2})
+        self.assertEqual(response.data['top_photos'][1]['image'], 'http://testserver/media/photo3.jpg')
+
+        PlacePhotoLike.objects.filter(place_photo=self.other_photo).delete()
+        self.assertEqual(self.summary(), (5, 2, ['photo 3', 'photo 0', 'photo 1']))
+
+        self.photos[3].title = 'renamed'
+        self.photos[3].save()
+        self.assertEqual(self.summary()[2], ['renamed', 'photo 0', 'photo 1'])
+
+    def test_saving_a_loaded_place_keeps_the_summary(self):
+        place = Place.objects.get(pk=self.place.pk)
+        PlacePhoto.objects.create(owner=self.other, place=self.place, title='new')
+        place.name = 'Renamed'
+        place.save()
+        self.assertEqual(Place.objects.get(pk=self.place.pk).photo_count, 6)
+
+    def test_reconcile(self):
+        # Bulk creates and queryset updates send no signals.
+        PlacePhoto.objects.bulk_create([PlacePhoto(owner=self.other, place=self.place, title='bulk')])
+        PlaceContributor.objects.filter(user=self.user).delete()
+        Place.objects.filter(pk=self.place.pk).update(top_photos=[])
+
+        stdout = StringIO()
+        call_command('reconcileplacesummaries', '--batch-size', '1', stdout=stdout)
+        self.assertEqual(stdout.getvalue(), 'Corrected the summaries of 1 places.\n')
+        self.assertEqual(self.summary(), (6, 2, ['photo 0', 'photo 1', 'photo 2']))
+        self.assertEqual(dict(PlaceContributor.objects.filter(place=self.place).values_list('user', 'photo_count')),
+                         {self.user.pk: 4, self.other.pk: 2})
+
+        # Adding and removing photos goes on from the corrected contributors.
+        self.photos[0].delete()
+        self.assertEqual(self.summary(), (5, 2, ['photo 1', 'photo 2', 'photo 3']))
+
+    def test_detail_is_a_single_row_read(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/places/{self.place.public_id}/')
+        self.assertEqual(response.data['photo_count'], 5)
+
+
+class ConcurrentUploadsTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(email=f'user{index}@user.com',
+                                               username=f'user{index}',
+                                               password='testpass',
+                                               date_of_birth='2001-01-01') for index in range(2)]
+        self.place = Place.objects.create(name='Test Place', location='POINT(1 2)', added_by=self.users[0],
+                                          experience=5)
+
+    def test_concurrent_uploads(self):
+        barrier = threading.Barrier(2, timeout=5)
+        add_photo = summary.add_photo
+
+        def add_photo_together(photo):
+            # Both photos are inserted, and hold KEY SHARE locks on the place, before either is counted.
+            barrier.wait()
+            return add_photo(photo)
+
+        errors = []
+
+        def upload(user):
+            try:
+                # The transaction CountedWritesMixin creates photos in.
+                with transaction.atomic():
+                    PlacePhoto.objects.create(owner=user, place=self.place, title=user.username)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(summary, 'add_photo', add_photo_together):
+            threads = [threading.Thread(target=upload, args=(user,)) for user in self.users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        place = Place.objects.get(pk=self.place.pk)
+        self.assertEqual((place.photo_count, place.contributor_count, len(place.top_photos)), (2, 2, 2))
+        self.assertEqual(list(User.objects.order_by('pk').values_list('photo_count', 'visited_place_count')),
+                         [(1, 1), (1, 1)])
+
+
+@override_settings(PLACE_NEIGHBOURS=2)
+class PlaceNeighboursTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@user.com',
+                                             username='testuser',
+                                             password='testpass',
+                                             date_of_birth='2001-01-01')
+        self.places = {name: self.create(name, location) for name, location in [('a', 'POINT(0 0)'),
+                                                                               ('b', 'POINT(0.01 0)'),
+                                                                               ('c', 'POINT(0.03 0)'),
+                                                                               ('d', 'POINT(1 0)')]}
+        self.run_jobs()
+        self.client = APIClient()
+
+    def create(self, name, location):
+        return Place.objects.create(name=name, location=location, added_by=self.user, experience=5)
+
+    def run_jobs(self):
+        call_command('runjobs', '--once', stdout=StringIO())
+
+    def neighbours(self, name):
+        response = self.client.get(f'/places/{self.places[name].public_id}/neighbours/', {'fields': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return ''.join(place['name'] for place in response.data)
+
+    def test_neighbours(self):
+        self.assertEqual([self.neighbours(name) for name in 'abcd'], ['bc', 'ac', 'ba', 'cb'])
+        with self.assertNumQueries(1):
+            self.client.get(f'/places/{self.places["a"].public_id}/neighbours/')
+
+        response = self.client.get(f'/places/{uuid.uuid4()}/neighbours/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_refreshed_incrementally(self):
+        self.places['e'] = self.create('e', 'POINT(0.99 0)')
+        self.run_jobs()
+        self.assertEqual([self.neighbours(name) for name in 'abcde'], ['bc', 'ac', 'ba', 'ec', 'dc'])
+
+        self.places['c'].location = 'POINT(5 5)'
+        self.places['c'].save()
+        self.run_jobs()
+        self.assertEqual([self.neighbours(name) for name in 'abde'], ['be', 'ae', 'eb', 'db'])
+
+        schedule_place_deletion(self.places['b'])
+        self.run_jobs()
+        self.assertEqual([self.neighbours(name) for name in 'ade'], ['ed', 'ea', 'da'])
+        response = self.client.get(f'/places/{self.places["b"].public_id}/neighbours/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild(self):
+        PlaceNeighbour.objects.all().delete()
+        call_command('rebuildneighbours', stdout=StringIO())
+        self.assertEqual([self.neighbours(name) for name in 'abcd'], ['bc', 'ac', 'ba', 'cb'])
@@ -0,0 +1,119 @@
+"""
+Trending photos, ranked by likes that lose half their weight every TRENDING_HALF_LIFE seconds.
+
+Scores use forward decay: a like given at time t adds exp((t - L) / tau) to the score of its
+photo, where L is a landmark shared by all photos. Decaying every score at read time would
+multiply all of them by the same factor, so ranking by the stored score gives the same order
+and the trending_score index can serve it directly. Likes only ever add to or subtract
+from one row.
+
+The weights of new likes grow with the distance to the landmark, so rescale() moves the
+landmark to the present and scales every score down accordingly. This keeps the scores in a
+range where floats stay exact, and clears scores that decayed to nothing. The first like
+given more than TRENDING_RESCALE_INTERVAL seconds after the landmark queues a rescale job.
+Weights are capped, so likes never overflow even when the job did not run for a long time. Likes
+hold a shared advisory lock while they read the landmark and update a score, and rescaling
+holds it exclusively, so no like is weighted against a landmark that is being replaced.
+"""
+from math import exp, log
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Case, When, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import enqueue
+
+from .models import PlacePhoto, TrendingLandmark
+
+_LOCK = 'place:trending'
+# Scores below this fraction of the weight of a like given at the landmark are dropped.
+_NEGLIGIBLE = 1e-12
+# Largest exponent of a weight, exp(600) leaves room to add up many likes in a double.
+_MAX_EXPONENT = 600
+
+
+def _lock(shared):
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(hashtext(%s))', [_LOCK])
+
+
+def _tau():
+    return settings.TRENDING_HALF_LIFE / log(2)
+
+
+def get_landmark():
+    landmark, _ = TrendingLandmark.objects.get_or_create(pk=1, defaults={'landmark': timezone.now()})
+    return landmark.landmark
+
+
+def weight(liked_at, landmark):
+    """
+    Returns what a like given at `liked_at` adds to the score of its photo.
+    """
+    return exp(min((liked_at - landmark).total_seconds() / _tau(), _MAX_EXPONENT))
+
+
+def _schedule_rescale(liked_at, landmark):
+    if (liked_at - landmark).total_seconds() <= settings.TRENDING_RESCALE_INTERVAL:
+        return
+    if not Job.objects.filter(name='place.rescale_trending',
+                              status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING]).exists():
+        enqueue('place.rescale_trending')
+
+
+def record_like(like):
+    with transaction.atomic():
+        _lock(shared=True)
+        landmark = get_landmark()
+        PlacePhoto.objects.filter(pk=like.place_photo_id).update(
+            like_count=F('like_count') + 1,
+            trending_score=F('trending_score') + weight(like.created_at, landmark))
+        _schedule_rescale(like.created_at, landmark)
+
+
+def remove_like(like):
+    with transaction.atomic():
+        _lock(shared=True)
+        PlacePhoto.objects.filter(pk=like.place_photo_id).update(
+            like_count=Greatest(F('like_count') - 1, 0),
+            trending_score=Greatest(F('trending_score') - weight(like.created_at, get_landmark()), 0.0))
+
+
+def rescale(now=None):
+    """
+    Moves the landmark to `now` and scales the scores to it. Returns the number of photos
+    whose score changed.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        _lock(shared=False)
+        landmark = TrendingLandmark.objects.select_for_update().get_or_create(pk=1, defaults={'landmark': now})[0]
+        factor = exp(min(0.0, (landmark.landmark - now).total_seconds() / _tau()))
+
+        scores = PlacePhoto.objects.filter(trending_score__gt=0)
+        if factor == 0:
+            updated = scores.update(trending_score=0)
+        else:
+            updated = scores.update(trending_score=Case(
+                When(trending_score__lt=_NEGLIGIBLE / factor, then=Value(0.0)),
+                default=F('trending_score') * factor))
+
+        landmark.landmark = now
+        landmark.save(update_fields=['landmark'])
+    return updated
+
+
+def trending_photos(place=None):
+    """
+    Returns the photos with likes of active places, or of `place`, trending first.
+    """
+    queryset = PlacePhoto.objects.filter(trending_score__gt=0)
+    if place is None:
+        queryset = queryset.filter(place__is_active=True)
+    else:
+        queryset = queryset.filter(place=place)
+    return queryset.order_by('-trending_score', '-id')
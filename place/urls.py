@@ -1,25 +1,38 @@
 from django.urls import path
 
-from .views import PlaceViewSet, PlacePhotoViewSet, PlacePhotoLikeViewSet
+from DigitalLurker.asyncviews import async_reads
+from . import async_views
+from .views import PlaceViewSet, PlaceImportViewSet, PlacePhotoViewSet, PlacePhotoLikeViewSet
 
 urlpatterns = [
     path('', PlaceViewSet.as_view({'post': 'create'})),
 
-    path('search/', PlaceViewSet.as_view({'get': 'list'})),
-    path('<uuid:public_id>/', PlaceViewSet.as_view({
+    path('sync/', PlaceViewSet.as_view({'get': 'sync'})),
+    path('export/', PlaceViewSet.as_view({'get': 'export'})),
+    path('import/', PlaceImportViewSet.as_view({'post': 'create'})),
+    path('import/<int:pk>/', PlaceImportViewSet.as_view({'get': 'retrieve'})),
+    path('search/', async_reads(PlaceViewSet.as_view({'get': 'list'}), async_views.place_list)),
+    path('photos/nearby/', PlacePhotoViewSet.as_view({'get': 'nearby'})),
+    path('photos/mine/', PlacePhotoViewSet.as_view({'get': 'mine'})),
+    path('photos/trending/', PlacePhotoViewSet.as_view({'get': 'trending'})),
+    path('<uuid:public_id>/', async_reads(PlaceViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
         'patch': 'partial_update',
-        'delete': 'destroy'})),
+        'delete': 'destroy'}), async_views.place_retrieve)),
 
-    path('<uuid:place_public_id>/photos/', PlacePhotoViewSet.as_view({'get': 'list',
-                                                                      'post': 'create'})),
+    path('<uuid:public_id>/neighbours/', PlaceViewSet.as_view({'get': 'neighbours'})),
+    path('<uuid:place_public_id>/photos/', async_reads(PlacePhotoViewSet.as_view({'get': 'list',
+                                                                                  'post': 'create'}),
+                                                       async_views.place_photo_list)),
+    path('<uuid:place_public_id>/photos/trending/', PlacePhotoViewSet.as_view({'get': 'trending'})),
     path('<uuid:place_public_id>/photos/<uuid:public_id>/', PlacePhotoViewSet.as_view({'get': 'retrieve',
                                                                                        'patch': 'partial_update',
                                                                                        'delete': 'destroy'})),
 
     path('<uuid:place_public_id>/photos/<uuid:photo_public_id>/likes/',
-         PlacePhotoLikeViewSet.as_view({'post': 'create',
-                                        'get': 'retrieve',
-                                        'delete': 'destroy'}))
+         async_reads(PlacePhotoLikeViewSet.as_view({'post': 'create',
+                                                    'get': 'retrieve',
+                                                    'delete': 'destroy'}),
+                     async_views.place_photo_like_retrieve))
 ]
@@ -1,21 +1,59 @@
-from django.contrib.gis.geos import GEOSGeometry
+from functools import partial
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
 from django.contrib.gis.measure import Distance
 from django.utils.translation import gettext as _
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction, router
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, mixins
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import get_user_model
 
-from .models import Place, PlacePhoto, PlacePhotoLike
-from .serializers import PlaceSerializer, PlacePhotoSerializer, PlacePhotoLikeSerializer, CreatePlacePhotoSerializer
+from DigitalLurker.db.replicas import ReplicaReadMixin, use_replica
+from DigitalLurker.fieldsets import SparseFieldsetViewMixin
+from jobs.queue import enqueue
+
+from .caching import get_place_data, get_place_photo_data, place_etag, place_photo_etag, place_photos_etag, \
+    not_modified, set_validators
+from .compact import CompactOutputMixin, place_table
+from .deletion import schedule_place_deletion
+from .export import FORMATS, parse_bbox, export_queryset, iter_export, aiter_export
+from .models import Place, PlacePhoto, PlacePhotoLike, PlaceImport
+from .my_photos import GRID, grid_view, get_page as get_my_photos_page
+from .nearby import get_page, InvalidCursor as InvalidNearbyCursor
+from .realtime import publish_like_count
+from .representations import place_rows, place_data, place_photo_rows, place_photo_data
+from .trending import trending_photos
+from .serializers import PlaceSerializer, PlacePhotoSerializer, PlacePhotoLikeSerializer, CreatePlacePhotoSerializer, \
+    PlaceImportSerializer
+from .sync import get_changes, InvalidCursor, ExpiredCursor
 
 User = get_user_model()
 
 
-class PlaceViewSet(viewsets.ModelViewSet):
+class CountedWritesMixin:
+    """
+    View mixin creating and deleting objects in one transaction with the counters that
+    place.signals updates for them.
+    """
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+
+class PlaceViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, CompactOutputMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = Place.objects.all().order_by('id')
     serializer_class = PlaceSerializer
@@ -35,6 +73,20 @@ class PlaceViewSet(viewsets.ModelViewSet):
         """
         Retrieves information for a place specified by public_id.
         """
+        fieldset, precision = self.fieldset, self.location_precision
+        if 'range' not in request.query_params and api_settings.SEARCH_PARAM not in request.query_params:
+            etag = place_etag(self.kwargs['public_id'], request)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+            result = get_place_data(self.kwargs['public_id'], request, fieldset, precision)
+            if result is None:
+                raise Http404
+
+            data, updated_at = result
+            return not_modified(request, etag, updated_at) or set_validators(Response(data), etag, updated_at)
+
         user = self.get_object()
 
         if user is None:
@@ -47,7 +99,13 @@ class PlaceViewSet(viewsets.ModelViewSet):
         """
         Lists places information.
         """
-        return super().list(request, *args, **kwargs)
+        fieldset, precision = self.fieldset, self.location_precision
+        queryset = place_rows(self.filter_queryset(self.get_queryset()), fieldset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(place_data(page, request, fieldset, precision))
+        return Response(place_data(queryset, request, fieldset, precision))
 
     def update(self, request, *args, **kwargs):
         """
@@ -80,9 +138,82 @@ class PlaceViewSet(viewsets.ModelViewSet):
         self.perform_destroy(place)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        schedule_place_deletion(instance)
+
+    @action(detail=True, methods=['GET'])
+    def neighbours(self, request, *args, **kwargs):
+        """
+        Lists the nearest active places of a place, nearest first.
+        """
+        fieldset, precision = self.fieldset, self.location_precision
+        queryset = Place.objects.filter(neighbour_of__place__public_id=self.kwargs['public_id'], is_active=True) \
+            .order_by('neighbour_of__rank')
+        data = place_data(place_rows(queryset, fieldset), request, fieldset, precision)
+
+        if not data and not Place.objects.filter(public_id=self.kwargs['public_id']).exists():
+            raise Http404
+        return Response(data)
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request, *args, **kwargs):
+        """
+        Streams all places, filtered by ?bbox=min_lon,min_lat,max_lon,max_lat and ?is_active=,
+        as NDJSON or, with ?output=geojson, as a GeoJSON FeatureCollection.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in FORMATS:
+            raise ValidationError({'output': _('Use one of: %s.') % ', '.join(FORMATS)})
+
+        bbox = request.query_params.get('bbox')
+        if bbox is not None:
+            try:
+                bbox = parse_bbox(bbox)
+            except ValueError:
+                raise ValidationError({'bbox': _('Use min_lon,min_lat,max_lon,max_lat.')})
+
+        is_active = request.query_params.get('is_active')
+        if is_active is not None:
+            is_active = is_active.lower() in ('true', '1', 't')
+
+        # The rows are read while the response streams, after the view returned, so the
+        # database is chosen now.
+        queryset = Place.objects.using(router.db_for_read(Place))
+        export = aiter_export if isinstance(request._request, ASGIRequest) else iter_export
+        response = StreamingHttpResponse(export(output, export_queryset(queryset, bbox, is_active)),
+                                         content_type=FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="places.{output}"'
+        return response
+
+    @action(detail=False, methods=['GET'])
+    def sync(self, request, *args, **kwargs):
+        """
+        Returns places changed and removed since the `since` cursor of a previous sync.
+
+        Reads from the primary: a replica lagging more than PLACE_SYNC_DELAY behind would let
+        the cursor pass rows it has not received yet, and clients would never see them.
+        """
+        with use_replica(False):
+            try:
+                changed, removed, cursor, more = get_changes(request.query_params.get('since'))
+            except InvalidCursor:
+                raise ValidationError({'since': _('Invalid cursor.')})
+            except ExpiredCursor:
+                return Response({'detail': _('The cursor expired, sync from scratch.')},
+                                status=status.HTTP_410_GONE)
+
+            return Response({
+                'next': replace_query_param(request.build_absolute_uri(), 'since', cursor) if more else None,
+                'since': cursor,
+                'changed': self.get_serializer(changed, many=True).data,
+                'removed': removed,
+            })
+
     def get_permissions(self):
-        if self.action == 'retrieve':
+        if self.action in ['retrieve', 'neighbours']:
             permission_classes = [AllowAny]
+        elif self.action == 'sync':
+            permission_classes = [IsAuthenticated]
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
@@ -102,7 +233,28 @@ class PlaceViewSet(viewsets.ModelViewSet):
         return super().filter_queryset(queryset)
 
 
-class PlacePhotoViewSet(viewsets.ModelViewSet):
+class PlaceImportViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = PlaceImport.objects.all()
+    serializer_class = PlaceImportSerializer
+    permission_classes = [IsAdminUser]
+
+    def create(self, request, *args, **kwargs):
+        """
+        Uploads a CSV, GeoJSON or NDJSON file of places and queues its import.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            place_import = serializer.save(added_by=self.request.user)
+            enqueue('place.run_import', place_import_id=place_import.pk)
+
+
+class PlacePhotoViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, CompactOutputMixin, CountedWritesMixin,
+                        viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = PlacePhoto.objects.all().order_by('id')
     filter_backends = [filters.SearchFilter]
@@ -136,6 +288,18 @@ class PlacePhotoViewSet(viewsets.ModelViewSet):
         """
         Retrieves a place photo.
         """
+        fieldset, precision = self.fieldset, self.location_precision
+        if api_settings.SEARCH_PARAM not in request.query_params:
+            etag = place_photo_etag(self.kwargs['public_id'], request)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+            data = get_place_photo_data(self.kwargs['public_id'], request, fieldset, precision)
+            if data is None:
+                raise Http404
+            return set_validators(Response(data), etag)
+
         photo = self.get_object()
 
         if photo is None:
@@ -144,13 +308,32 @@ class PlacePhotoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(photo)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['GET'])
-    def retrieve_mine(self, request, *args, **kwargs):
+    @action(detail=False, methods=['GET'])
+    def mine(self, request, *args, **kwargs):
         """
-        Retrieves information of a place of a user.
+        Lists the photos of the user, newest first, or with ?view=grid only their public_id,
+        image and like count.
         """
-        serializer = self.get_serializer(request.user.my_place_photos)
-        return Response(serializer.data)
+        fieldset = GRID if grid_view(request.query_params) else self.fieldset
+        precision = self.location_precision
+        places = {} if place_table(request.query_params) and 'place' in fieldset else None
+
+        try:
+            ids, cursor = get_my_photos_page(request.user, request.query_params.get('cursor'))
+        except InvalidNearbyCursor:
+            raise ValidationError({'cursor': _('Invalid cursor.')})
+
+        rows = {row['id']: row for row in place_photo_rows(PlacePhoto.objects.filter(pk__in=ids), fieldset)} \
+            if ids else {}
+        results = place_photo_data([rows[pk] for pk in ids if pk in rows], request, fieldset, precision, places)
+
+        data = {
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', cursor) if cursor else None,
+            'results': results,
+        }
+        if places is not None:
+            data['places'] = list(places.values())
+        return Response(data)
 
     def partial_update(self, request, *args, **kwargs):
         """
@@ -166,16 +349,94 @@ class PlacePhotoViewSet(viewsets.ModelViewSet):
         """
         Lists photos of a place.
         """
+        fieldset, precision = self.fieldset, self.location_precision
+        places = {} if place_table(request.query_params) else None
+        etag = place_photos_etag(self.kwargs.get('place_public_id'), request)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         place = get_object_or_404(Place, public_id=self.kwargs.get('place_public_id'))
-        queryset = self.filter_queryset(self.get_queryset()).filter(place__id=place.id)
+        queryset = place_photo_rows(self.filter_queryset(self.get_queryset()).filter(place__id=place.id), fieldset)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            response = self.get_paginated_response(place_photo_data(page, request, fieldset, precision, places))
+        else:
+            response = Response(place_photo_data(queryset, request, fieldset, precision, places))
+            if places is not None:
+                response.data = {'results': response.data}
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        if places is not None:
+            response.data['places'] = list(places.values())
+        return set_validators(response, etag)
+
+    @action(detail=False, methods=['GET'])
+    def nearby(self, request, *args, **kwargs):
+        """
+        Lists the newest photos of places within `radius` meters of the Point header.
+        """
+        fieldset, precision = self.fieldset, self.location_precision
+        places = {} if place_table(request.query_params) else None
+
+        point = request.headers.get('Point')
+        if point is None:
+            raise ValidationError({'msg': 'Point header is missing.'})
+        try:
+            location = GEOSGeometry(point)
+        except (GEOSException, ValueError):
+            location = None
+        if location is None or location.geom_type != 'Point':
+            raise ValidationError(_('Wrong localization format. Use POINT(x y). '))
+
+        try:
+            radius = int(request.query_params.get('radius', settings.NEARBY_PHOTOS_RADIUS))
+        except ValueError:
+            radius = 0
+        if not 0 < radius <= settings.NEARBY_PHOTOS_MAX_RADIUS:
+            raise ValidationError({'radius': _('Use a number of meters from 1 to %d.')
+                                             % settings.NEARBY_PHOTOS_MAX_RADIUS})
+
+        try:
+            ids, cursor = get_page(location, radius, request.query_params.get('cursor'))
+        except InvalidNearbyCursor:
+            raise ValidationError({'cursor': _('Invalid cursor.')})
+
+        rows = {row['id']: row for row in place_photo_rows(PlacePhoto.objects.filter(pk__in=ids), fieldset)}
+        results = place_photo_data([rows[pk] for pk in ids if pk in rows], request, fieldset, precision, places)
+
+        data = {
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', cursor) if cursor else None,
+            'results': results,
+        }
+        if places is not None:
+            data['places'] = list(places.values())
+        return Response(data)
+
+    @action(detail=False, methods=['GET'])
+    def trending(self, request, *args, **kwargs):
+        """
+        Lists the photos with the most recent likes, of all places or of one.
+        """
+        fieldset, precision = self.fieldset, self.location_precision
+        places = {} if place_table(request.query_params) else None
+
+        place = None
+        if self.kwargs.get('place_public_id') is not None:
+            place = get_object_or_404(Place, public_id=self.kwargs['place_public_id'])
+        queryset = place_photo_rows(trending_photos(place), fieldset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(place_photo_data(page, request, fieldset, precision, places))
+        else:
+            response = Response(place_photo_data(queryset, request, fieldset, precision, places))
+            if places is not None:
+                response.data = {'results': response.data}
+
+        if places is not None:
+            response.data['places'] = list(places.values())
+        return response
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -190,7 +451,7 @@ class PlacePhotoViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_permissions(self):
-        if self.action in ['retrieve', 'list']:
+        if self.action in ['retrieve', 'list', 'nearby', 'trending']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAuthenticated]
@@ -202,7 +463,7 @@ class PlacePhotoViewSet(viewsets.ModelViewSet):
         return PlacePhotoSerializer
 
 
-class PlacePhotoLikeViewSet(viewsets.ModelViewSet):
+class PlacePhotoLikeViewSet(ReplicaReadMixin, CountedWritesMixin, viewsets.ModelViewSet):
     queryset = PlacePhotoLike.objects.all().order_by('id')
     serializer_class = PlacePhotoLikeSerializer
 
@@ -210,7 +471,8 @@ class PlacePhotoLikeViewSet(viewsets.ModelViewSet):
         """
         Handles the creation of a new place.
         """
-        place_photo = get_object_or_404(PlacePhoto, public_id=self.kwargs.get('photo_public_id'))
+        place_photo = get_object_or_404(PlacePhoto.objects.select_related('place'),
+                                        public_id=self.kwargs.get('photo_public_id'))
 
         if self.get_queryset().filter(owner=request.user, place_photo=place_photo).exists():
             return Response(_('You can not like the same photo twice. '), status=status.HTTP_400_BAD_REQUEST)
@@ -218,13 +480,16 @@ class PlacePhotoLikeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data={'owner_pk': request.user.id, 'place_photo_pk': place_photo.pk})
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
+        transaction.on_commit(partial(publish_like_count, place_photo))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieves a place photo like.
         """
-        return Response({'exists': self.get_queryset().filter(owner=request.user).exists()})
+        exists = self.get_queryset().filter(owner=request.user,
+                                            place_photo__public_id=self.kwargs.get('photo_public_id')).exists()
+        return Response({'exists': exists})
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -237,6 +502,12 @@ class PlacePhotoLikeViewSet(viewsets.ModelViewSet):
             return Response('You have to like the photo first. ', status=status.HTTP_400_BAD_REQUEST)
 
         self.perform_destroy(like)
+
+        place_photo = PlacePhoto.objects.select_related('place').filter(
+            public_id=self.kwargs.get('photo_public_id')).first()
+        if place_photo is not None:
+            transaction.on_commit(partial(publish_like_count, place_photo))
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_object(self):
@@ -0,0 +1,18 @@
+from PIL import Image
+from django.contrib.auth import get_user_model
+
+from jobs.queue import job
+
+User = get_user_model()
+
+
+@job('user.resize_pfp', concurrency=4)
+def resize_pfp(user_id, name):
+    user = User.objects.filter(pk=user_id, pfp=name).first()
+    if user is None:
+        # The user is gone or uploaded another picture in the meantime.
+        return
+
+    image = Image.open(user.pfp)
+    resized_image = image.resize((256, 256), Image.LANCZOS)
+    resized_image.save(user.pfp.path)
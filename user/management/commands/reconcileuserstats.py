@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from user.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recounts the photos, visited places and received likes of every user and corrects wrong counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of users recounted in one transaction.')
+
+    def handle(self, *args, **options):
+        corrected = reconcile(options['batch_size'])
+        self.stdout.write(f'Corrected the counters of {corrected} users.')
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+        ('place', '0011_placephoto_owner_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='photo_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='visited_place_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='received_like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=['UPDATE user_user AS u SET photo_count = photos.photo_count, '
+                 'visited_place_count = photos.visited_place_count '
+                 'FROM (SELECT owner_id, count(*) AS photo_count, count(DISTINCT place_id) AS visited_place_count '
+                 'FROM place_placephoto GROUP BY owner_id) AS photos WHERE photos.owner_id = u.id',
+                 'UPDATE user_user AS u SET received_like_count = likes.received_like_count '
+                 'FROM (SELECT photo.owner_id, count(*) AS received_like_count FROM place_placephotolike AS "like" '
+                 'JOIN place_placephoto AS photo ON photo.id = "like".place_photo_id GROUP BY photo.owner_id) AS likes '
+                 'WHERE likes.owner_id = u.id'],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
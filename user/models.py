@@ -4,11 +4,11 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
-from DigitalLurker.utils import uuid_upload_to
+from DigitalLurker.utils import MaintainedFieldsMixin, uuid_upload_to
 from user.managers import CustomUserManager
 
 
-class User(AbstractUser):
+class User(MaintainedFieldsMixin, AbstractUser):
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     date_of_birth = models.DateField(blank=False)
     email = models.EmailField(unique=True, editable=False)
@@ -19,6 +19,12 @@ class User(AbstractUser):
                                 unique=True,
                                 editable=False,
                                 validators=[UnicodeUsernameValidator()])
+    # Kept up to date as photos and likes are added and removed (see user.stats).
+    photo_count = models.IntegerField(default=0)
+    visited_place_count = models.IntegerField(default=0)
+    received_like_count = models.IntegerField(default=0)
+
+    maintained_fields = ('photo_count', 'visited_place_count', 'received_like_count')
 
     objects = CustomUserManager()
 
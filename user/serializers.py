@@ -1,7 +1,6 @@
 import datetime
 from uuid import uuid4
 
-from PIL import Image
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db.models import Sum, F
 from rest_framework import serializers
@@ -11,12 +10,23 @@ from django.contrib.auth.password_validation import validate_password
 from django.utils.translation import gettext as _
 from rest_framework.validators import UniqueValidator
 
+from DigitalLurker.fieldsets import SparseFieldsetMixin
+from DigitalLurker.timing import TimedSerializerMixin
+from jobs.queue import enqueue
 from place.models import Place, PlacePhoto
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def experience_level(experience):
+    level = 1
+    while experience >= 30:
+        experience = experience / 1.3
+        level += 1
+    return level
+
+
+class UserSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     total_experience = serializers.SerializerMethodField()
     experience_level = serializers.SerializerMethodField()
 
@@ -31,16 +41,18 @@ class UserSerializer(serializers.ModelSerializer):
                   'pfp',
                   'total_experience',
                   'experience_level',
+                  'photo_count',
+                  'visited_place_count',
+                  'received_like_count',
                   'password']
+        read_only_fields = ('photo_count', 'visited_place_count', 'received_like_count')
         extra_kwargs = {'password': {'write_only': True}}
 
     def save(self, **kwargs):
         user = super().save(**kwargs)
 
-        if user.pfp.name != user.pfp.field.default:
-            image = Image.open(user.pfp)
-            resized_image = image.resize((256, 256), Image.ANTIALIAS)
-            resized_image.save(user.pfp.path)
+        if self.validated_data.get('pfp') is not None and user.pfp.name != user.pfp.field.default:
+            enqueue('user.resize_pfp', user_id=user.pk, name=user.pfp.name)
 
         return user
 
@@ -71,12 +83,7 @@ class UserSerializer(serializers.ModelSerializer):
         return exp
 
     def get_experience_level(self, obj):
-        experience = self.get_total_experience(obj)
-        level = 1
-        while experience >= 30:
-            experience = experience / 1.3
-            level += 1
-        return level
+        return experience_level(self.get_total_experience(obj))
 
 
 class CreateUserSerializer(UserSerializer):
@@ -101,8 +108,10 @@ class CreateUserSerializer(UserSerializer):
         }
 
 
-class FriendSerializer(serializers.ModelSerializer):
+class FriendSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['public_id', 'username', 'first_name', 'last_name', 'date_of_birth', 'pfp']
-        read_only_fields = ('public_id', 'first_name', 'last_name', 'date_of_birth', 'pfp')
+        fields = ['public_id', 'username', 'first_name', 'last_name', 'date_of_birth', 'pfp',
+                  'photo_count', 'visited_place_count', 'received_like_count']
+        read_only_fields = ('public_id', 'first_name', 'last_name', 'date_of_birth', 'pfp',
+                            'photo_count', 'visited_place_count', 'received_like_count')
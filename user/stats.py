@@ -0,0 +1,81 @@
+"""
+Activity counters of users: the photos they uploaded, the places they took photos of and the
+likes their photos received.
+
+The counters are stored on the user, so profiles are read from the user row alone. They are
+changed with one update in the transaction that adds or removes the photo or like (see
+place.signals), and `manage.py reconcileuserstats` recounts them in batches, for counters that
+drifted, e.g. after rows were changed with queryset updates, which send no signals.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from place.models import PlacePhoto, PlacePhotoLike
+
+User = get_user_model()
+
+COUNTERS = ('photo_count', 'visited_place_count', 'received_like_count')
+
+
+def _changes(deltas):
+    return {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+
+
+def change(user_id, **deltas):
+    """
+    Adds the deltas, keyword arguments named after COUNTERS, to the counters of a user.
+    """
+    changes = _changes(deltas)
+    if changes:
+        User.objects.filter(pk=user_id).update(**changes)
+
+
+def change_photo_owner(photo_id, **deltas):
+    """
+    Adds the deltas to the counters of the owner of a photo.
+    """
+    changes = _changes(deltas)
+    if changes:
+        User.objects.filter(my_place_photos=photo_id).update(**changes)
+
+
+def change_contributors(place_id, **deltas):
+    """
+    Adds the deltas to the counters of the users who took photos of a place.
+    """
+    changes = _changes(deltas)
+    if changes:
+        User.objects.filter(placecontributor__place=place_id).update(**changes)
+
+
+def _counts():
+    photos = PlacePhoto.objects.filter(owner=OuterRef('pk')).order_by().values('owner')
+    likes = PlacePhotoLike.objects.filter(place_photo__owner=OuterRef('pk')).order_by().values('place_photo__owner')
+    return {
+        'photo_count': photos.annotate(count=Count('id')).values('count'),
+        'visited_place_count': photos.annotate(count=Count('place', distinct=True)).values('count'),
+        'received_like_count': likes.annotate(count=Count('id')).values('count'),
+    }
+
+
+def reconcile(batch_size=1000):
+    """
+    Recounts the counters of all users, `batch_size` users per transaction, and corrects the
+    wrong ones. Returns the number of users whose counters were corrected.
+    """
+    counts = {field: Coalesce(Subquery(count), 0) for field, count in _counts().items()}
+    corrected = 0
+    last_pk = 0
+    while True:
+        pks = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return corrected
+        last_pk = pks[-1]
+
+        with transaction.atomic():
+            wrong = User.objects.filter(pk__in=pks) \
+                .annotate(**{f'actual_{field}': count for field, count in counts.items()}) \
+                .exclude(**{field: F(f'actual_{field}') for field in COUNTERS})
+            corrected += User.objects.filter(pk__in=wrong.values('pk')).update(**counts)
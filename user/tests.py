@@ -1,9 +1,13 @@
 import datetime
+from io import StringIO
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from place.models import Place, PlacePhoto, PlacePhotoLike
+
 User = get_user_model()
 
 
@@ -166,6 +170,28 @@ class UserTests(APITestCase):
         self.assertEqual(response.data['results'][0]['username'], user2.username)
         self.assertEqual(response.data['results'][1]['username'], user3.username)
 
+    def test_sparse_fieldset(self):
+        User.objects.create_user(email='email@email.com',
+                                 username='username',
+                                 password='Password1234$!',
+                                 date_of_birth=datetime.date(2000, 1, 1))
+
+        jwt = self.client.post('/auth/token/',
+                               {'email': 'email@email.com', 'password': 'Password1234$!'},
+                               format='json').data['access']
+
+        # total_experience and experience_level are not computed
+        with self.assertNumQueries(1):
+            response = self.client.get('/users/?fields=username,pfp', HTTP_AUTHORIZATION=f'Bearer {jwt}')
+        self.assertEqual(list(response.data), ['username', 'pfp'])
+
+        response = self.client.get('/users/search/?q=user&fields=experience_level',
+                                   HTTP_AUTHORIZATION=f'Bearer {jwt}')
+        self.assertEqual(response.data['results'], [{'experience_level': 1}])
+
+        response = self.client.get('/users/?fields=password', HTTP_AUTHORIZATION=f'Bearer {jwt}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_destroy_user(self):
         User.objects.create_user(email='email@email.com',
                                  username='username',
@@ -180,4 +206,51 @@ class UserTests(APITestCase):
 
         response = self.client.delete(url, format='json', HTTP_AUTHORIZATION=f'Bearer {jwt}')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(User.objects.count(), 0)
\ No newline at end of file
+        self.assertFalse(User.objects.get(email='email@email.com').is_active)
+
+        call_command('processdeletions', stdout=StringIO())
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_stats(self):
+        user = User.objects.create_user(email='email@email.com',
+                                        username='username',
+                                        password='Password1234$!',
+                                        date_of_birth=datetime.date(2000, 1, 1))
+        fan = User.objects.create_user(email='fan@email.com',
+                                       username='fan',
+                                       password='Password1234$!',
+                                       date_of_birth=datetime.date(2000, 1, 1))
+        places = [Place.objects.create(name=f'Place {index}', location='POINT(1 1)', added_by=user, experience=5)
+                  for index in range(2)]
+        photos = [PlacePhoto.objects.create(owner=user, place=place, title='photo')
+                  for place in [places[0], places[0], places[1]]]
+        for photo in photos[:2]:
+            PlacePhotoLike.objects.create(owner=fan, place_photo=photo)
+
+        url = f'/users/{user.public_id}/'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual([response.data['photo_count'],
+                          response.data['visited_place_count'],
+                          response.data['received_like_count']], [3, 2, 2])
+
+        photos[0].delete()
+        photos[2].delete()
+        response = self.client.get(url, {'fields': 'photo_count,visited_place_count,received_like_count'})
+        self.assertEqual(response.data, {'photo_count': 1, 'visited_place_count': 1, 'received_like_count': 1})
+
+        # Saving a loaded user does not overwrite the counters.
+        user.first_name = 'Name'
+        user.save()
+        self.assertEqual(User.objects.get(pk=user.pk).photo_count, 1)
+
+        User.objects.update(photo_count=10, visited_place_count=0, received_like_count=0)
+        call_command('reconcileuserstats', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(User.objects.order_by('pk').values_list('photo_count', 'visited_place_count',
+                                                                      'received_like_count')),
+                         [(1, 1, 1), (0, 0, 0)])
+
+        # The contributors of a deleted place are deleted before its photos.
+        places[0].delete()
+        self.assertEqual(User.objects.values_list('photo_count', 'visited_place_count', 'received_like_count')
+                         .get(pk=user.pk), (0, 0, 0))
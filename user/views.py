@@ -4,12 +4,15 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
 
+from DigitalLurker.db.replicas import ReplicaReadMixin
+from DigitalLurker.fieldsets import SparseFieldsetViewMixin
+from place.deletion import schedule_user_deletion
 from .serializers import UserSerializer, CreateUserSerializer, FriendSerializer
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     lookup_field = 'public_id'
     queryset = User.objects.all().order_by('id')
     filter_backends = [filters.SearchFilter]
@@ -75,6 +78,9 @@ class UserViewSet(viewsets.ModelViewSet):
         self.perform_destroy(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        schedule_user_deletion(instance)
+
     def get_permissions(self):
         if self.action == 'create' or self.action == 'retrieve_other':
             permission_classes = [AllowAny]